@@ -1,26 +1,39 @@
 """Main execution file."""
+import startup
+
+profiler = startup.ImportProfiler()
+profiler.start()
+# Record the cost of each import during launch.
+
 import log
-import gui_windows as gu
 import gui_startscreen as sc
-import spacy as sp
 
 log.log_setup()
 # Start logging.
 
-print('test')
-
 sph = sc.StartScreen(None)
 sph.title('Loading...')
 sph.iconbitmap(r'icons//clay_icon.ico')
 sph.start_grid_config()
 sph.update()
+profiler.mark('splash screen shown')
+# Show the splash screen before any heavy imports.
 
 import gui_windows as gu
 sph.update()
 #sph.after(3000, start_mainscreen)
 
-core = sp.load("en_core_web_md")
-# Load in the medium sized dataset (may take a moment).
+import analysis_server as asv
+core = asv.connect(start=True)
+# Use the shared analysis server, starting it if needed without waiting
+# for it to load its models.
+if core is None:
+    import models as mm
+    core = mm.ModelManager()
+    core.pipeline('tagging')
+    # Load the tagging model in-process until the server is up; the vector
+    # model is only loaded if its vector table has not been exported yet.
+profiler.mark('language model loaded')
 
 sph.destroy()
 
@@ -33,4 +46,19 @@ app.iconbitmap(r'icons//clay_icon.ico')
 app.grid_config()
 # Set up a text object widget in the grid.
 app.menu()
-app.mainloop()
\ No newline at end of file
+app.restore_session()
+# Reopen the tabs of the last session.
+if asv.available() and not isinstance(core, asv.RemoteModel):
+    app.after(app.server_attach_interval, app.attach_server,
+              app.server_attach_tries)
+    # Switch to the analysis server once it has started.
+del core
+# Only the window holds the models, so local ones can be released when it
+# switches to the server.
+
+profiler.mark('main window ready')
+profiler.stop()
+profiler.report()
+# Log the launch profile.
+
+app.mainloop()
@@ -0,0 +1,488 @@
+"""
+Local analysis server, keeping the language models loaded for every Clay
+window on the machine.
+
+Run with `python analysis_server.py`, or let Clay start it on launch.
+Requests and responses are framed as a 1 byte code and a 4 byte length
+(network order) followed by the payload:
+
+    TOKENISE   text -> (start, end) offset of each token, as uint32 pairs
+    TAG        text -> spaCy Doc.to_bytes() of the parsed text
+    VECTOR     text -> uint32 size, then the float32 mean word vector
+    SENTIMENT  text -> float64 polarity and subjectivity
+    STORE      ''   -> path of the shared vector table ('' if none)
+    REPORT     ''   -> model report, one line per model
+
+Responses use status OK or ERROR (with a UTF-8 message) as their code.
+"""
+
+import argparse
+import errno
+import os
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+from array import array
+import logging
+import log
+import startup
+
+TOKENISE, TAG, VECTOR, SENTIMENT, STORE, REPORT = range(1, 7)
+OK, ERROR = 0, 1
+header = struct.Struct('!BI')
+max_payload = 256*1024*1024
+# Largest message accepted, to stop a bad frame allocating memory.
+
+
+def default_path():
+    """
+    Location of the server socket (~/.clay/analysis.sock).
+    """
+    return os.path.join(os.path.expanduser('~'), '.clay', 'analysis.sock')
+
+
+def available():
+    """
+    True if the platform has Unix domain sockets.
+    """
+    return hasattr(socket, 'AF_UNIX')
+
+
+def _file_id(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+def lock_server(path):
+    """
+    Take the lock held by the one server starting or running on a socket
+    (a .lock file beside it), so servers started together don't both load
+    their models.
+
+    Returns
+    -------
+    lock : file object
+        Open lock file, to keep open while serving, or None if another
+        server holds the lock.
+    """
+    import fcntl
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock = open(os.path.splitext(path)[0]+'.lock', 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def _recv_exact(sock, n):
+    chunks = []
+    while n:
+        chunk = sock.recv(min(n, 1 << 20))
+        if not chunk:
+            raise ConnectionError('Analysis server connection closed.')
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+
+def send_frame(sock, code, payload=b''):
+    """
+    Send one framed message.
+    """
+    sock.sendall(header.pack(code, len(payload))+payload)
+
+
+def recv_frame(sock):
+    """
+    Receive one framed message.
+
+    Returns
+    -------
+    code, payload : int, bytes
+    """
+    code, length = header.unpack(_recv_exact(sock, header.size))
+    if length > max_payload:
+        raise ConnectionError('Analysis message too large.')
+    return code, _recv_exact(sock, length)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                code, payload = recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            server.last_request = time.time()
+            try:
+                with server.lock:
+                    response = server.respond(code, payload.decode('utf-8'))
+                send_frame(self.request, OK, response)
+            except (ConnectionError, BrokenPipeError):
+                return
+            except Exception as e:
+                server.logger.exception('Analysis request failed: {}'.format(
+                    e))
+                send_frame(self.request, ERROR, str(e).encode('utf-8'))
+
+
+class AnalysisServer(socketserver.ThreadingMixIn,
+                     socketserver.UnixStreamServer):
+    """
+    Serves analysis requests from a ModelManager over a Unix domain socket.
+    Each connection has its own thread; requests are run one at a time, as
+    spaCy pipelines are not thread safe.
+
+    Public attributes
+    -----------------
+    models : ModelManager object
+        Models used to answer requests.
+    idle_exit : float
+        Seconds without requests before the server shuts itself down.
+
+    Class methods
+    -----------------
+    respond
+        Answer one request.
+    run
+        Serve until idle for idle_exit seconds.
+    remove_socket
+        Remove the socket file, if it is still this server's.
+
+    """
+    daemon_threads = True
+
+    def __init__(self, path, models, idle_exit=3600):
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except OSError:
+                os.remove(path)
+                # Left behind by a server that did not shut down cleanly.
+            else:
+                raise OSError(errno.EADDRINUSE,
+                              'Analysis server already running', path)
+            finally:
+                probe.close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        os.chmod(path, 0o600)
+        # Only the user's own processes may connect.
+        self._socket_id = _file_id(path)
+
+        self.path = path
+        self.models = models
+        self.idle_exit = idle_exit
+        self.last_request = time.time()
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger("debug-tracking")
+
+    def respond(self, code, text):
+        """
+        Answer one request.
+        """
+        if code == TOKENISE:
+            doc = self.models.make_doc(text)
+            return array('I', [o for t in doc
+                               for o in (t.idx, t.idx+len(t.text))]).tobytes()
+        if code == TAG:
+            return self.models(text).to_bytes(exclude=['tensor',
+                                                       'user_data'])
+        if code == VECTOR:
+            store = self.models.vector_store()
+            if store is None:
+                return struct.pack('!I', 0)
+            vector = store.doc_vector(self.models.make_doc(text))
+            return struct.pack('!I', len(vector))+vector.astype(
+                '<f4').tobytes()
+        if code == SENTIMENT:
+            sentiment = startup.textblob().TextBlob(text).sentiment
+            return struct.pack('!dd', sentiment.polarity,
+                               sentiment.subjectivity)
+        if code == STORE:
+            store = self.models.vector_store()
+            return (store.path if store is not None else '').encode('utf-8')
+        if code == REPORT:
+            return '\n'.join(self.models.report()).encode('utf-8')
+        raise ValueError('Unknown analysis request {}'.format(code))
+
+    def run(self):
+        """
+        Serve requests until none have arrived for idle_exit seconds.
+        """
+        def watch():
+            while time.time()-self.last_request < self.idle_exit:
+                time.sleep(min(60, self.idle_exit))
+            self.shutdown()
+            # Models stay loaded until then, rather than idling out.
+
+        threading.Thread(target=watch, daemon=True).start()
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+            self.remove_socket()
+
+    def remove_socket(self):
+        """
+        Remove the socket file, unless it has since been replaced by
+        another server's.
+        """
+        if _file_id(self.path) == self._socket_id:
+            os.remove(self.path)
+
+
+class RemoteModel(object):
+    """
+    Client of an AnalysisServer, used in place of a ModelManager.
+
+    Parsed documents are rebuilt from the server's binary Doc on a blank
+    vocabulary, and word vectors are read from the server's shared table.
+    If the server goes away, analysis falls back to an in-process
+    ModelManager.
+
+    Public attributes
+    -----------------
+    path : str
+        Server socket.
+    local : ModelManager object
+        In-process models, once the server has been lost.
+    timings : dict
+        Request code -> [requests, total seconds].
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = None
+        self.timings = {}
+        self._blank = None
+        self._store = None
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(path)
+        except OSError:
+            self._sock.close()
+            raise
+
+    def _fallback(self, error):
+        import models as mm
+        logging.getLogger("debug-tracking").info(
+            'Analysis server lost ({}); loading models locally.'.format(error))
+        self.local = mm.ModelManager()
+        self._sock.close()
+        return self.local
+
+    def request(self, code, text=''):
+        """
+        Send a request and return the response payload.
+
+        Raises
+        ------
+        ConnectionError
+            If the server can't be reached.
+        RuntimeError
+            If the server could not answer the request.
+        """
+        start = time.time()
+        with self._lock:
+            send_frame(self._sock, code, text.encode('utf-8'))
+            status, payload = recv_frame(self._sock)
+        timing = self.timings.setdefault(code, [0, 0.0])
+        timing[0] += 1
+        timing[1] += time.time()-start
+
+        if status != OK:
+            raise RuntimeError(payload.decode('utf-8'))
+        return payload
+
+    @property
+    def vocab(self):
+        """
+        Blank vocabulary used to rebuild documents (string hashes are the
+        same in every pipeline).
+        """
+        if self.local is not None:
+            return self.local.vocab
+        if self._blank is None:
+            self._blank = startup.spacy().blank('en')
+        return self._blank.vocab
+
+    def __call__(self, text):
+        """
+        Parse a text on the server.
+        """
+        if self.local is None:
+            try:
+                data = self.request(TAG, text)
+                return startup.spacy().tokens.Doc(self.vocab).from_bytes(data)
+            except (ConnectionError, OSError) as e:
+                self._fallback(e)
+        return self.local(text)
+
+    def make_doc(self, text):
+        """
+        Tokenise a text locally with a blank English tokenizer.
+        """
+        if self.local is not None:
+            return self.local.make_doc(text)
+        if self._blank is None:
+            self._blank = startup.spacy().blank('en')
+        return self._blank.make_doc(text)
+
+    def vector_store(self):
+        """
+        Open the vector table shared by the server.
+        """
+        import vector_store as vs
+        if self.local is not None:
+            return self.local.vector_store()
+        if self._store is None:
+            try:
+                path = self.request(STORE).decode('utf-8')
+            except (ConnectionError, OSError) as e:
+                return self._fallback(e).vector_store()
+            self._store = vs.open_store(path) if path else None
+        return self._store
+
+    def vector(self, text):
+        """
+        Mean word vector of a text, computed by the server.
+        """
+        import numpy as np
+        if self.local is None:
+            try:
+                payload = self.request(VECTOR, text)
+                size, = struct.unpack('!I', payload[:4])
+                return np.frombuffer(payload[4:4+4*size], dtype='<f4')
+            except (ConnectionError, OSError) as e:
+                self._fallback(e)
+        store = self.local.vector_store()
+        if store is None:
+            return np.zeros(0, dtype='<f4')
+        return store.doc_vector(self.local.make_doc(text))
+
+    def sentiment(self, text):
+        """
+        Polarity and subjectivity of a text, computed by the server.
+        """
+        if self.local is None:
+            try:
+                return struct.unpack('!dd', self.request(SENTIMENT, text))
+            except (ConnectionError, OSError) as e:
+                self._fallback(e)
+        sentiment = startup.textblob().TextBlob(text).sentiment
+        return sentiment.polarity, sentiment.subjectivity
+
+    def unload_idle(self):
+        """
+        Unload idle in-process models (the server unloads its own).
+        """
+        if self.local is not None:
+            return self.local.unload_idle()
+        return []
+
+    def report(self):
+        """
+        Lines describing the server's models and the request latency.
+        """
+        if self.local is not None:
+            return self.local.report()
+        try:
+            lines = self.request(REPORT).decode('utf-8').split('\n')
+        except (ConnectionError, OSError) as e:
+            return self._fallback(e).report()
+        lines = ['Analysis server: {}'.format(self.path), '']+lines+['']
+        names = {TOKENISE: 'tokenise', TAG: 'tag', VECTOR: 'vector',
+                 SENTIMENT: 'sentiment', STORE: 'store', REPORT: 'report'}
+        for code, (count, total) in sorted(self.timings.items()):
+            lines.append('{:<10} {:>6} requests {:>8.1f}ms mean'.format(
+                names[code], count, 1000*total/count))
+        return lines
+
+
+@log.log_function
+def start_server(path=None):
+    """
+    Start the analysis server in the background, without waiting for it
+    to load its models.
+    """
+    subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                      '--socket', path or default_path()],
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+
+
+@log.log_function
+def connect(path=None, start=False, wait=0):
+    """
+    Connect to the analysis server.
+
+    Parameters
+    ----------
+    path : str
+        Server socket (default ~/.clay/analysis.sock).
+    start : bool
+        Start the server in the background if it is not running.
+    wait : float
+        Seconds to wait for a new server. By default connect returns at
+        once, so the caller can use in-process models and connect again
+        once the server is up.
+
+    Returns
+    -------
+    model : RemoteModel object
+        Client, or None if the platform has no Unix domain sockets or the
+        server can't be reached (so models should be loaded in-process).
+    """
+    if not available():
+        return None
+    path = path or default_path()
+
+    try:
+        return RemoteModel(path)
+    except OSError:
+        if not start:
+            return None
+
+    start_server(path)
+    deadline = time.time()+wait
+    while time.time() < deadline:
+        time.sleep(0.2)
+        try:
+            return RemoteModel(path)
+        except OSError:
+            continue
+    return None
+
+if __name__ == '__main__':
+    import models as mm
+
+    parser = argparse.ArgumentParser(
+        description='Serve Clay analysis requests from loaded models.')
+    parser.add_argument('--socket', default=default_path())
+    parser.add_argument('--idle-exit', type=float, default=3600,
+                        help='Seconds without requests before exiting.')
+    args = parser.parse_args()
+
+    lock = lock_server(args.socket)
+    if lock is None:
+        sys.exit(0)
+        # Another server is starting or running on this socket.
+    manager = mm.ModelManager()
+    manager.pipeline('tagging')
+    manager.vector_store()
+    # Load before listening, so clients only connect once models are ready.
+    AnalysisServer(args.socket, manager, args.idle_exit).run()
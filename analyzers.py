@@ -0,0 +1,343 @@
+"""
+Registry of text analyzers and the intermediate products they share.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import log
+import startup
+import highlight_dictionary as hd
+import modifier_density as mo
+import echoes as ec
+import revision_diff as rd
+import vector_store as vs
+
+
+class Registry(object):
+    """
+    Named functions that compute products of a text (tokens, tags,
+    vectors...), each declaring the products it needs.
+
+    Analyzers are registered the same way; they differ only in also
+    taking options (e.g. a window size), so their outputs are cached per
+    set of options.
+
+    Public attributes
+    -----------------
+    entries : dict
+        Name -> (function, names required, is an analyzer).
+
+    Class methods
+    -----------------
+    product
+        Decorator to register a product.
+    analyzer
+        Decorator to register an analyzer.
+    levels
+        Group the steps needed for some names into dependency levels.
+
+    """
+
+    def __init__(self):
+        self.entries = {'text': (None, (), False), 'nlp': (None, (), False)}
+        # The text and model are supplied by each DocumentAnalysis.
+
+    def product(self, name, requires=()):
+        """
+        Register a function computing a product from the products it
+        requires, passed as keyword arguments.
+        """
+        def register(fun):
+            self.entries[name] = (fun, tuple(requires), False)
+            return fun
+        return register
+
+    def analyzer(self, name, requires=()):
+        """
+        Register a function computing an analysis from the products it
+        requires, plus any options, passed as keyword arguments.
+        """
+        def register(fun):
+            self.entries[name] = (fun, tuple(requires), True)
+            return fun
+        return register
+
+    def levels(self, names):
+        """
+        Steps needed to compute some names, grouped so that each step only
+        depends on steps in earlier levels.
+
+        Raises
+        ------
+        KeyError
+            If a name is not registered.
+        ValueError
+            If the requirements form a cycle.
+        """
+        depth = {}
+        visiting = set()
+
+        def visit(name):
+            if name in depth:
+                return depth[name]
+            if name in visiting:
+                raise ValueError('Analysis requirements form a cycle at '
+                                 '{}'.format(name))
+            visiting.add(name)
+            requires = self.entries[name][1]
+            depth[name] = 1+max([visit(r) for r in requires], default=-1)
+            visiting.discard(name)
+            return depth[name]
+
+        for name in names:
+            visit(name)
+
+        levels = [[] for d in range(max(depth.values(), default=-1)+1)]
+        for name, d in depth.items():
+            levels[d].append(name)
+        return levels
+
+
+registry = Registry()
+product = registry.product
+analyzer = registry.analyzer
+# Register new analyzers with @analyzer(name, requires=(...)).
+
+
+class DocumentAnalysis(object):
+    """
+    Products and analyses of one version of a text.
+
+    Each product is computed at most once, however many analyzers need it.
+    When several names are requested together, steps that do not depend
+    on each other are run in parallel.
+
+    Public attributes
+    -----------------
+    text : str
+        Text analysed.
+    nlp : spaCy Language object
+        Model used for parsing.
+    cache : dict
+        Products computed so far, by name, and analyses by (name, options).
+    registry : Registry object
+        Products and analyzers available.
+    workers : int
+        Threads used to run independent steps (1 runs every step in the
+        calling thread).
+
+    Class methods
+    -----------------
+    get
+        Get a product, computing it and its requirements if needed.
+    run
+        Run one or more analyzers.
+
+    """
+
+    def __init__(self, text, nlp, products=None, registry=registry,
+                 workers=4):
+        self.text = text
+        self.nlp = nlp
+        self.registry = registry
+        self.workers = workers
+        self._pool = None
+        # Created the first time independent steps are run together.
+        self.cache = {'text': text, 'nlp': nlp}
+        if products:
+            self.cache.update(products)
+            # Products already computed elsewhere (e.g. a cached WordSet).
+
+    def _compute(self, name, options):
+        fun, requires, is_analyzer = self.registry.entries[name]
+        key = (name, options) if is_analyzer else name
+        if key not in self.cache:
+            inputs = {r: self.cache[r] for r in requires}
+            if is_analyzer:
+                inputs.update(options)
+            self.cache[key] = fun(**inputs)
+        return self.cache[key]
+
+    def get(self, name):
+        """
+        Get a product, computing it and its requirements if needed.
+        """
+        for level in self.registry.levels([name]):
+            for step in level:
+                self._compute(step, ())
+        return self.cache[name]
+
+    @log.log_function
+    def run(self, *names, **options):
+        """
+        Run analyzers, sharing the products they need.
+
+        Parameters
+        -----------
+        names : str
+            Analyzers to run.
+        options : dict
+            Analyzer name -> dict of keyword options for it.
+
+        Returns
+        -------
+        results : dict or object
+            Output of each analyzer, by name, or the output itself if only
+            one name was given.
+        """
+        keys = {n: tuple(sorted(options.get(n, {}).items())) for n in names}
+
+        for level in self.registry.levels(names):
+            steps = [s for s in level if s not in self.cache and
+                     (s, keys.get(s, ())) not in self.cache]
+            if self.workers > 1 and len(steps) > 1:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self.workers)
+                list(self._pool.map(
+                    lambda s: self._compute(s, keys.get(s, ())), steps))
+            else:
+                for step in steps:
+                    self._compute(step, keys.get(step, ()))
+            # Cached steps are skipped, and a lone step runs in this thread.
+
+        results = {n: self.cache[(n, keys[n])] for n in names}
+        return results[names[0]] if len(names) == 1 else results
+
+
+@product('wordset', requires=('text', 'nlp'))
+def wordset(text, nlp):
+    import words_analysis_classes as wd
+    return wd.WordSet(text, nlp)
+
+
+@product('tokens', requires=('wordset',))
+def tokens(wordset):
+    return wordset.token
+
+
+@product('tags', requires=('wordset',))
+def tags(wordset):
+    return [t for w, t in wordset.pos]
+
+
+@product('offsets', requires=('wordset',))
+def offsets(wordset):
+    return wordset.offsets
+
+
+@product('surface', requires=('wordset',))
+def surface(wordset):
+    return rd.surface_tokens(wordset.doc)
+
+
+@product('lemmas', requires=('wordset',))
+def lemmas(wordset):
+    return wordset.lemmas
+
+
+@product('sentences', requires=('wordset',))
+def sentences(wordset):
+    return [(s.start_char, s.end_char) for s in wordset.sentences]
+
+
+@product('entities', requires=('wordset',))
+def entities(wordset):
+    return wordset.entities
+
+
+@product('vectors', requires=('wordset', 'nlp'))
+def vectors(wordset, nlp):
+    store = vs.shared_store(nlp)
+    keys = [t.orth for t in wordset.doc if not (t.is_punct or t.is_space)]
+    if store is None:
+        return np.array([nlp.vocab[k].vector for k in keys])
+    return store.lookup(keys)
+
+
+@product('sentiment', requires=('text', 'sentences'))
+def sentiment(text, sentences):
+    values = []
+    for s, e in sentences:
+        blob = startup.textblob().TextBlob(text[s:e])
+        values.append((blob.sentiment.polarity, blob.sentiment.subjectivity))
+    return np.array(values).reshape(-1, 2)
+
+
+@product('lemma_ids', requires=('lemmas',))
+def lemma_ids(lemmas):
+    return ec.lemma_ids(lemmas)
+
+
+@product('content_mask', requires=('tokens', 'wordset'))
+def content_mask(tokens, wordset):
+    return ec.content_mask(tokens, wordset.stops)
+
+
+@product('modifier_mask', requires=('tokens', 'tags'))
+def modifier_mask(tokens, tags):
+    return mo.modifier_mask(tokens, tags)
+
+
+@analyzer('pos', requires=('tags', 'offsets'))
+def pos_spans(tags, offsets):
+    """
+    Character spans of each POS tag that has a highlight colour.
+    """
+    spans = {}
+    for t, span in zip(tags, offsets):
+        if t in hd.highlight_nltk:
+            spans.setdefault(t, []).append(span)
+    return spans
+
+
+@analyzer('ner', requires=('entities',))
+def entity_spans(entities):
+    """
+    Character spans of each entity label.
+    """
+    spans = {}
+    for ent, label, start, end in entities:
+        spans.setdefault(label, []).append((start, end))
+    return spans
+
+
+@analyzer('modifiers', requires=('text', 'modifier_mask', 'offsets'))
+def modifier_spans(text, modifier_mask, offsets, window=20, threshold=0.25):
+    """
+    Character spans of dense passages, stacked modifiers and modifiers
+    suggested for deletion (with the space that follows them).
+    """
+    runs = mo.stacked_modifiers(modifier_mask,
+                                joined=mo.whitespace_joined(text, offsets))
+    passages = mo.dense_passages(modifier_mask, window, threshold)
+
+    deletions = []
+    for i in mo.deletion_suggestions(runs):
+        start, end = offsets[i]
+        while end < len(text) and text[end] == ' ':
+            end += 1
+        deletions.append((start, end))
+
+    return {'dense': [(offsets[s][0], offsets[e-1][1]) for s, e in passages],
+            'stacked': [(offsets[s][0], offsets[e-1][1]) for s, e in runs],
+            'suggest_delete': deletions}
+
+
+@analyzer('echoes', requires=('lemma_ids', 'content_mask', 'offsets'))
+def echo_spans(lemma_ids, content_mask, offsets, window=50):
+    """
+    Character spans of content words repeated within window tokens, by
+    lemma.
+    """
+    ids, vocabulary = lemma_ids
+    pairs = ec.find_echoes(ids, content_mask, window)
+    return {vocabulary[n]: spans
+            for n, spans in ec.echo_spans(pairs, ids, offsets).items()}
+
+
+@analyzer('sentence_sentiment', requires=('sentences', 'sentiment'))
+def sentence_sentiment(sentences, sentiment):
+    """
+    (start, end, polarity, subjectivity) of each sentence.
+    """
+    return [(s, e, p, o) for (s, e), (p, o) in zip(sentences, sentiment)]
@@ -0,0 +1,85 @@
+"""
+Detection of words that recur close together (echoes).
+"""
+
+from array import array
+
+
+def lemma_ids(lemmas):
+    """
+    Integer ID for each lemma, numbered in order of first appearance.
+
+    Returns
+    -------
+    ids : array
+        ID of each lemma.
+    vocabulary : list
+        Lemma of each ID.
+    """
+    numbers = {}
+    ids = array('i', [numbers.setdefault(l.lower(), len(numbers))
+                      for l in lemmas])
+    vocabulary = [None]*len(numbers)
+    for lemma, n in numbers.items():
+        vocabulary[n] = lemma
+    return ids, vocabulary
+
+
+def content_mask(words, stops):
+    """
+    True for each token that is a content word (not a stop word, and with
+    at least two letters).
+    """
+    return [not s and len(w) > 1 and w.isalpha()
+            for w, s in zip(words, stops)]
+
+
+def find_echoes(ids, mask, window=50):
+    """
+    Pairs of content tokens with the same lemma at most window tokens
+    apart, in one pass with a table of where each lemma was last seen.
+
+    Parameters
+    ----------
+    ids : array
+        Lemma ID of each token, from lemma_ids.
+    mask : list
+        Output of content_mask.
+    window : int
+        Largest distance in tokens between the two words of an echo.
+
+    Returns
+    -------
+    pairs : list
+        (earlier token, later token) of each echo.
+    """
+    if not ids:
+        return []
+    last = array('i', [-1])*(max(ids)+1)
+
+    pairs = []
+    for i, (n, content) in enumerate(zip(ids, mask)):
+        if not content:
+            continue
+        seen = last[n]
+        if seen >= 0 and i-seen <= window:
+            pairs.append((seen, i))
+        last[n] = i
+
+    return pairs
+
+
+def echo_spans(pairs, ids, offsets):
+    """
+    Character spans of the echoed words, grouped by lemma ID.
+
+    Returns
+    -------
+    spans : dict
+        Lemma ID -> sorted (start, end) offsets of the words in its echoes.
+    """
+    tokens = {}
+    for i, j in pairs:
+        tokens.setdefault(ids[i], set()).update((i, j))
+    return {n: [offsets[t] for t in sorted(found)]
+            for n, found in tokens.items()}
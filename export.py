@@ -0,0 +1,275 @@
+"""
+Streaming export of highlighted documents to HTML and RTF.
+"""
+
+import argparse
+import heapq
+import html
+import os
+import re
+import logging
+import highlight_dictionary as hd
+import log
+
+fallback_colour = '#bebebe'
+# Used for colour names without a known hex value (grey).
+
+
+def css_class(layer, tag):
+    """
+    CSS class name for a tag in a highlight layer (e.g. 'pos-JJ').
+    """
+    return re.sub(r'[^A-Za-z0-9_-]', '_', '{}-{}'.format(layer, tag))
+
+
+def to_hex(colour):
+    """
+    Hex value (#rrggbb) of a Tk colour name or hex colour. Names without
+    a known value, and malformed hex colours, give fallback_colour.
+    """
+    value = colour if colour.startswith('#') else hd.colour_hex.get(colour)
+    if value is None or not re.fullmatch(r'#[0-9A-Fa-f]{6}', value):
+        logging.getLogger("debug-tracking").info(
+            'No hex value for colour {}, using grey.'.format(colour))
+        return fallback_colour
+    return value
+
+
+def _labelled(cls, spans):
+    for start, end in spans:
+        yield start, end, cls
+
+
+def segments(text, spans):
+    """
+    Split a text into runs that share the same set of highlights.
+
+    Parameters
+    ----------
+    text : str
+        Text the spans index into.
+    spans : dict
+        Class name -> list of (start, end) character offsets, each list
+        sorted by start.
+
+    Yields
+    ------
+    segment : tuple
+        (text, classes), covering the whole text in order. classes lists
+        the highlights active on the run, most recently started last.
+    """
+    starts = heapq.merge(*[_labelled(cls, cls_spans)
+                           for cls, cls_spans in spans.items()])
+    # Merge the sorted lists lazily, so no combined copy is made.
+    active = []
+    # Heap of (end, order, class) of the open highlights.
+    order = 0
+    position = 0
+    upcoming = next(starts, None)
+
+    while position < len(text):
+        while upcoming is not None and upcoming[0] <= position:
+            if upcoming[1] > position:
+                heapq.heappush(active, (upcoming[1], order, upcoming[2]))
+                order += 1
+            upcoming = next(starts, None)
+        while active and active[0][0] <= position:
+            heapq.heappop(active)
+
+        boundary = len(text)
+        if upcoming is not None:
+            boundary = min(boundary, upcoming[0])
+        if active:
+            boundary = min(boundary, active[0][0])
+
+        classes = [cls for end, o, cls in sorted(active, key=lambda a: a[1])]
+        yield text[position:boundary], classes
+        position = boundary
+
+
+def html_chunks(text, spans, colours, title='Clay export'):
+    """
+    Generate an HTML document with a CSS class per highlight.
+
+    Parameters
+    ----------
+    text : str
+        Document text.
+    spans : dict
+        Class name -> sorted (start, end) offsets, as for segments.
+    colours : dict
+        Class name -> background colour.
+    title : str
+        Document title.
+
+    Yields
+    ------
+    chunk : str
+        Successive pieces of the HTML file.
+    """
+    yield ('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+           '<title>{}</title>\n<style>\n'
+           'body {{ white-space: pre-wrap; font-family: serif; }}\n'
+           ).format(html.escape(title))
+    for cls, colour in sorted(colours.items()):
+        yield '.{} {{ background: {}; }}\n'.format(cls, to_hex(colour))
+    yield '</style>\n</head>\n<body>\n'
+
+    for run, classes in segments(text, spans):
+        if classes:
+            yield '<span class="{}">{}</span>'.format(' '.join(classes),
+                                                     html.escape(run))
+        else:
+            yield html.escape(run)
+
+    yield '\n</body>\n</html>\n'
+
+
+def _rtf_escape(run):
+    out = []
+    for c in run:
+        if c in '\\{}':
+            out.append('\\'+c)
+        elif c == '\n':
+            out.append('\\par\n')
+        elif ord(c) > 127:
+            code = ord(c)
+            out.append('\\u{}?'.format(code if code < 32768 else code-65536))
+        else:
+            out.append(c)
+    return ''.join(out)
+
+
+def rtf_chunks(text, spans, colours):
+    """
+    Generate an RTF document, shading each highlight with its colour. Where
+    highlights overlap, the most recently started one is used.
+
+    Parameters are as for html_chunks.
+
+    Yields
+    ------
+    chunk : str
+        Successive pieces of the RTF file.
+    """
+    classes = sorted(colours)
+    index = {cls: n+1 for n, cls in enumerate(classes)}
+    table = ''.join('\\red{};\\green{};\\blue{};'.format(
+        int(h[1:3], 16), int(h[3:5], 16), int(h[5:7], 16))
+        for h in (to_hex(colours[cls]) for cls in classes))
+    yield '{\\rtf1\\ansi\\deff0{\\fonttbl{\\f0 Times New Roman;}}'
+    yield '{{\\colortbl;{}}}\n'.format(table)
+
+    for run, active in segments(text, spans):
+        if active and active[-1] in index:
+            n = index[active[-1]]
+            yield '{{\\chcbpat{0}\\cb{0} {1}}}'.format(n, _rtf_escape(run))
+        else:
+            yield _rtf_escape(run)
+
+    yield '}\n'
+
+
+def write_export(path, chunks):
+    """
+    Write generated chunks to a file as they are produced. They go to a
+    temporary file that replaces path once complete, so an error part way
+    through leaves no partial export.
+    """
+    temp = path+'.tmp'
+    try:
+        with open(temp, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def analysis_spans(wc, layers=('pos', 'ner'), hidden_pos=()):
+    """
+    Highlight spans and colours taken directly from a WordSet's cached
+    token and entity arrays.
+
+    Parameters
+    ----------
+    wc : WordSet object
+        Analysis of the text (spacy backend).
+    layers : tuple
+        Layers to include: 'pos' and/or 'ner'.
+    hidden_pos : set
+        POS tags to leave out.
+
+    Returns
+    -------
+    spans, colours : dict
+        As used by html_chunks and rtf_chunks.
+    """
+    spans, colours = {}, {}
+
+    if 'pos' in layers:
+        for (w, t), span in zip(wc.pos, wc.offsets):
+            if t in wc.word_colours and t not in hidden_pos:
+                cls = css_class('pos', t)
+                spans.setdefault(cls, []).append(span)
+                colours[cls] = wc.word_colours[t]
+
+    if 'ner' in layers:
+        for ent, label, s, e in wc.entities:
+            cls = css_class('ner', label)
+            spans.setdefault(cls, []).append((s, e))
+            colours[cls] = wc.entity_colours.get(label, 'grey')
+
+    return spans, colours
+
+
+@log.log_function
+def export_document(path_in, path_out, nlp, fmt=None, layers=('pos', 'ner')):
+    """
+    Analyse a text file and export it with highlights, without a GUI.
+
+    Parameters
+    ----------
+    path_in : str
+        Plain text file to read.
+    path_out : str
+        File to write.
+    nlp : spaCy Language object
+        Model used for the analysis.
+    fmt : str
+        'html' or 'rtf' (default from the extension of path_out).
+    layers : tuple
+        Layers to include: 'pos' and/or 'ner'.
+    """
+    import words_analysis_classes as wd
+
+    if fmt is None:
+        fmt = 'rtf' if path_out.lower().endswith('.rtf') else 'html'
+
+    with open(path_in, 'r', encoding='utf-8') as f:
+        text = f.read()
+    wc = wd.WordSet(text, nlp)
+    spans, colours = analysis_spans(wc, layers)
+
+    if fmt == 'rtf':
+        write_export(path_out, rtf_chunks(text, spans, colours))
+    else:
+        write_export(path_out, html_chunks(text, spans, colours,
+                                           title=path_in))
+
+
+if __name__ == '__main__':
+    import startup
+
+    parser = argparse.ArgumentParser(
+        description='Export text files with POS and entity highlights.')
+    parser.add_argument('inputs', nargs='+', help='Text files to export.')
+    parser.add_argument('--format', choices=('html', 'rtf'), default='html')
+    parser.add_argument('--model', default='en_core_web_md')
+    args = parser.parse_args()
+
+    core = startup.spacy().load(args.model)
+    for path in args.inputs:
+        export_document(path, path.rsplit('.', 1)[0]+'.'+args.format, core,
+                        fmt=args.format)
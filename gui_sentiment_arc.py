@@ -0,0 +1,150 @@
+"""
+GUI class for plotting the sentiment arc of a document.
+"""
+
+import tkinter as tk
+import numpy as np
+import log
+import startup
+
+
+def sentiment_series(text, cache):
+    """
+    Polarity and subjectivity of each sentence of a text.
+
+    Sentences are found line by line, and each line's results are cached
+    by its text, so after an edit only the changed lines are analysed.
+
+    Parameters
+    ----------
+    text : str
+        Document text.
+    cache : dict
+        Line text -> list of (polarity, subjectivity), reused between
+        calls.
+
+    Returns
+    -------
+    series : numpy array
+        Shape (sentences, 2): polarity and subjectivity of each sentence.
+    """
+    values = []
+    current = {}
+    for line in text.split('\n'):
+        if not line.strip():
+            continue
+        if line not in cache:
+            blob = startup.textblob().TextBlob(line)
+            cache[line] = [(s.sentiment.polarity, s.sentiment.subjectivity)
+                           for s in blob.sentences]
+        current[line] = cache[line]
+        values.extend(cache[line])
+
+    cache.clear()
+    cache.update(current)
+    # Drop lines that are no longer in the text.
+
+    if not values:
+        return np.zeros((0, 2))
+    return np.array(values)
+
+
+def rolling_mean(series, window):
+    """
+    Mean of each window of rows, using a cumulative sum.
+    """
+    window = max(1, min(window, len(series)))
+    sums = np.cumsum(np.vstack([np.zeros((1, series.shape[1])), series]),
+                     axis=0)
+    return (sums[window:]-sums[:-window])/window
+
+
+def min_max_columns(series, columns):
+    """
+    Downsample a series to a number of pixel columns, keeping the minimum
+    and maximum of the rows falling in each column.
+
+    Returns
+    -------
+    mins, maxs : numpy array
+        Shape (columns, series.shape[1]).
+    """
+    columns = min(columns, len(series))
+    starts = (np.arange(columns)*len(series))//columns
+    return (np.minimum.reduceat(series, starts, axis=0),
+            np.maximum.reduceat(series, starts, axis=0))
+
+
+class SentimentArc(tk.Canvas):
+    """
+    Canvas plotting rolling sentence polarity and subjectivity across a
+    document.
+
+    Each pixel column is drawn as one vertical line per series, from the
+    minimum to the maximum value in that column. Lines are kept between
+    updates, and only columns whose values changed are redrawn.
+
+    Public attributes
+    -----------------
+    window : int
+        Number of sentences in the rolling mean.
+    colours : tuple
+        Line colours of polarity and subjectivity.
+
+    Class methods
+    -----------------
+    update_arc
+        Recompute the arc for a text and redraw changed columns.
+
+    """
+
+    def __init__(self, parent, width=300, height=150, window=20):
+        tk.Canvas.__init__(self, parent, width=width, height=height,
+                           background='white')
+        self.window = window
+        self.colours = ('RoyalBlue3', 'dark orange')
+        self.cache = {}
+        # Sentiment of each line of text already analysed.
+
+        self._items = None
+        # Canvas line ids, shape (columns, series).
+        self._drawn = None
+        # (mins, maxs) currently drawn.
+
+    def _y(self, value):
+        height = int(self.cget('height'))
+        # Values run from -1 (bottom) to 1 (top).
+        return (1-(value+1)/2)*(height-4)+2
+
+    @log.function_profiler
+    @log.log_function
+    def update_arc(self, text):
+        """
+        Recompute the sentiment arc of a text and redraw the columns that
+        changed.
+        """
+        series = sentiment_series(text, self.cache)
+        if len(series) == 0:
+            self.delete('all')
+            self._items, self._drawn = None, None
+            return
+
+        mins, maxs = min_max_columns(rolling_mean(series, self.window),
+                                     int(self.cget('width')))
+
+        if self._items is None or self._items.shape != mins.shape:
+            # First draw, or the number of columns changed.
+            self.delete('all')
+            self.create_line(0, self._y(0), int(self.cget('width')),
+                             self._y(0), fill='grey')
+            self._items = np.array([[self.create_line(0, 0, 0, 0, fill=c)
+                                     for c in self.colours]
+                                    for col in range(len(mins))])
+            changed = np.ones(mins.shape, dtype=bool)
+        else:
+            changed = (mins != self._drawn[0]) | (maxs != self._drawn[1])
+
+        for col, s in zip(*np.nonzero(changed)):
+            self.coords(int(self._items[col, s]), col, self._y(maxs[col, s]),
+                        col, self._y(mins[col, s])+1)
+        self._drawn = (mins, maxs)
@@ -2,10 +2,43 @@
 GUI class for tab objects.
 """
 
+import bisect
+import re
+import time
 import tkinter as tk
+import numpy as np
 import words_analysis_classes as wd
+import vector_store as vs
+import highlight_dictionary as hd
+import highlight_layers as hl
+import export as ex
+import analyzers as an
+import word_index as wi
+import poetry as pt
+import echoes as ec
+import revision_diff as rd
+import gui_tooltip as tp
+import text_buffer as bf
 import log
 
+def split_paragraph(paragraph, limit):
+    """
+    Split a paragraph into consecutive (start, end) parts of at most
+    limit characters, at sentence ends where possible, otherwise at spaces.
+    """
+    parts, start = [], 0
+    while len(paragraph)-start > limit:
+        window = paragraph[start:start+limit]
+        ends = [m.end() for m in re.finditer(r'[.!?]["\')]*\s+', window)]
+        if not ends:
+            ends = [m.end() for m in re.finditer(r'\s+', window)]
+        cut = start+(ends[-1] if ends else limit)
+        parts.append((start, cut))
+        start = cut
+    parts.append((start, len(paragraph)))
+    return parts
+
+
 class TabTextBox(tk.Frame):
     """
     Container class for tab with a text box attached.
@@ -24,8 +57,28 @@ class TabTextBox(tk.Frame):
         Vertical size of the tab window in pixels.
     tab_name: str
         Name of the tab.
+    file_path : str
+        File the text was last opened from or saved to.
     md : Spacy classifier object
         Word analysis class.
+    last_used : float
+        Time the tab was last selected.
+    layers : HighlightLayers object
+        Highlight tags of the text box, grouped into named layers.
+    index : WordIndex object
+        Inverted index of words and lemmas, for find and replace.
+    hidden_pos : set
+        POS tags that are tagged but currently not coloured.
+    inspect_mode : bool
+        Show details of the word under the mouse.
+    live_mode : bool
+        Re-highlight edited paragraphs once typing pauses.
+    live_delay : int
+        Milliseconds without edits before live analysis starts.
+    live_budget : float
+        Seconds of work allowed in each idle slice of live analysis.
+    live_chunk : int
+        Most characters of a paragraph parsed in one step of live analysis.
 
 
     Class methods
@@ -36,6 +89,14 @@ class TabTextBox(tk.Frame):
     def __init__(self, parent, xdim, ydim, tab_name, md):
         tk.Frame.__init__(self, parent)
         self.parent = parent
+        self.init_state(xdim, ydim, tab_name, md)
+        self.text_selected = tk.StringVar()
+        # List of all currently highlighted text (currently empty).
+
+    def init_state(self, xdim, ydim, tab_name, md):
+        """
+        Set the text, analysis and highlight state of a new tab.
+        """
         self.text = None
         self.raw = None
         # Raw entry text (not modified).
@@ -46,13 +107,69 @@ class TabTextBox(tk.Frame):
         self.ydim = ydim - 10
         # Full y dimension of the tab widget area.
         self.tab_name = tab_name
+        self.file_path = None
+        # File the text was last opened from or saved to.
 
         self.md_core = md
         # Classifier from Spacy, loaded in gui_windows.
 
         self.highlighted_text_list = {}
-        self.text_selected = tk.StringVar()
-        # List of all currently highlighted text (currently empty).
+
+        self.scroll = None
+        self.layers = None
+        self.last_used = time.time()
+
+        self.analysis = None
+        # Cached WordSet of the current text.
+        self.document = None
+        # Shared analyzer products and outputs of the current text.
+        self.index = None
+        self.raw_stale = False
+        # Set when the text box has been edited since raw was copied.
+
+        self.hidden_pos = set()
+        # POS tags toggled off in the Highlights menu.
+
+        self.inspect_mode = False
+        self.hover_delay = 50
+        # Milliseconds between hover inspector updates.
+        self.inspector = None
+        self._hover_event = None
+        self._hover_job = None
+        self._hover_token = None
+        self._selection_vector = (None, None)
+        # Selected text and its vector, for hover similarity.
+
+        self.live_mode = False
+        self.live_callback = None
+        # Function to call when live analysis has caught up with edits.
+        self.live_delay = 400
+        self.live_budget = 0.004
+        self.live_chunk = 400
+        self.dirty_lines = set()
+        # Lines edited since the last live analysis.
+        self.line_count = 1
+        # Lines in the text box when the last edit was recorded.
+        self._live_pieces = []
+        # (line, start, end) parts of a line still to re-highlight.
+        self._parse_rate = 0.0
+        # Smoothed seconds per character of a live parse.
+        self._live_job = None
+        self._sentiment_cache = {}
+        self._echo_window = None
+        # Window of the echoes shown, so live analysis can redo them.
+        self._echo_slots = {}
+        # Lemma -> colour number of its echoes.
+        self._echoes_unrecorded = False
+        # Set when live analysis has re-tagged echoes since their spans
+        # were recorded.
+
+    @property
+    def materialised(self):
+        """
+        True if the tab currently holds a text box widget.
+        """
+        return self.text is not None
 
     @log.log_function
     def add_text_box(self):
@@ -64,6 +181,8 @@ class TabTextBox(tk.Frame):
                             font=('Tempus Sans ITC', 12),
                             undo=True)
         # Make a text object.
+        self.layers = hl.HighlightLayers(self.text)
+        # Group highlight tags so they can be cleared by layer.
 
         self.text.grid(column=0, row=0, sticky='EW')
         self.grid_rowconfigure(0, weight=1)
@@ -77,19 +196,393 @@ class TabTextBox(tk.Frame):
         self.text.bind('<B1-Motion><ButtonRelease-1>',
                        self.capture_highlighted_text)
         # Set capture_highlighted_text as selected by the text box.
-        self.text.bind('<KeyRelease>', self.update_raw)
-        # Set update for when new text is written.
+        self.text.bind('<<Modified>>', self.track_edit)
+        # Track edits for when new text is written.
+        self.text.bind('<Motion>', self.track_hover)
+        self.text.bind('<Leave>', self.hide_inspector)
+        # Hover inspector.
+        self.inspector = tp.ToolTipDisplay(self.text, '',
+                                           self.winfo_toplevel())
 
     @log.log_function
-    def update_raw(self, event):
+    def update_raw(self, event=None):
         """
         Update the raw data, based on input from user.
         """
         self.raw = self.text.get('1.0', tk.END)
+        self.raw_stale = False
+
+    @log.log_function
+    def track_edit(self, event):
+        """
+        Record the edited lines when the text box is modified, without
+        copying the text.
+
+        The cursor ends an insertion and starts a deletion, so the lines
+        inserted (from the change in the line count) run back from the
+        cursor line.
+        """
+        if not self.text.edit_modified():
+            # Event from resetting the modified flag below.
+            return
+        self.text.edit_modified(False)
+
+        self.raw_stale = True
+        line = int(self.text.index(tk.INSERT).split('.')[0])
+        count = int(self.text.index('end-1c').split('.')[0])
+        added = count-self.line_count
+        self.mark_edited(max(line-max(added, 0), 1), line, added)
+        # Lines are paragraphs in a word-wrapped text box.
+
+        if self.live_mode:
+            if self._live_job is not None:
+                self.after_cancel(self._live_job)
+            self._live_job = self.after(self.live_delay, self.live_analysis)
+            # Debounce, so analysis waits until typing pauses.
+
+    def track_hover(self, event):
+        """
+        Record the mouse position and schedule an inspector update, at most
+        once every hover_delay milliseconds.
+        """
+        if not self.inspect_mode:
+            return
+        self._hover_event = event
+        if self._hover_job is None:
+            self._hover_job = self.after(self.hover_delay, self.inspect_hover)
+
+    @log.log_function
+    def inspect_hover(self):
+        """
+        Show the tag, lemma, sentiment and similarity to the selection of
+        the word under the mouse.
+        """
+        self._hover_job = None
+        event = self._hover_event
+        wc = self.analysis
+        if (not self.materialised or event is None or wc is None
+                or self.raw_stale or wc.offsets is None):
+            # Never analyse on hover, only use an up to date analysis.
+            self.hide_inspector()
+            return
+
+        line, col = [int(i) for i in
+                     self.text.index('@{},{}'.format(event.x,
+                                                     event.y)).split('.')]
+        offset = wc.line_starts[line-1]+col
+        token = wc.token_at[offset] if offset < len(wc.token_at) else -1
+        # Constant time lookup of the word under the mouse.
+
+        if token == -1:
+            self.hide_inspector()
+            return
+        if token == self._hover_token:
+            return
+        self._hover_token = token
+
+        word, tag = wc.pos[token]
+        if word not in self._sentiment_cache:
+            self._sentiment_cache[word] = wc.sentiment(word)
+        pos, neg, obj, colour = self._sentiment_cache[word]
+        info = '{} ({})\nLemma: {}\nSentiment: +{:.2f} -{:.2f}'.format(
+            word, tag, wc.lemmas[token], pos, neg)
+
+        sim = self.hover_similarity(word)
+        if sim is not None:
+            info += '\nSimilarity to selection: {:.2f}'.format(sim)
+
+        self.inspector.display_text(info, event.x, event.y)
+
+    @log.log_function
+    def hover_similarity(self, word):
+        """
+        Similarity of a word to the selected text, or None if there is no
+        selection.
+        """
+        if not self.text.tag_ranges(tk.SEL):
+            return None
+
+        store = vs.shared_store(self.md_core)
+        if store is None:
+            return None
+
+        selection = self.text.get(tk.SEL_FIRST, tk.SEL_LAST)
+        if self._selection_vector[0] != selection:
+            self._selection_vector = (selection, store.doc_vector(
+                self.md_core.make_doc(selection)))
+            # Only recompute when the selection changes.
+        vector = store.lookup([self.md_core.vocab.strings[word]])[0]
+
+        norm = np.linalg.norm(vector)*np.linalg.norm(
+            self._selection_vector[1])
+        if norm == 0:
+            return None
+        return float(vector @ self._selection_vector[1]/norm)
+
+    def hide_inspector(self, event=None):
+        """
+        Hide the hover inspector.
+        """
+        self._hover_token = None
+        if self.inspector is not None:
+            self.inspector.place_forget()
+
+    @log.log_function
+    def set_inspect_mode(self, on):
+        """
+        Turn the hover inspector on or off.
+        """
+        self.inspect_mode = on
+        if not on:
+            self.hide_inspector()
+
+    def mark_edited(self, first, last=None, added=0):
+        """
+        Record lines as edited, moving the lines already recorded past an
+        insertion or deletion.
+
+        Parameters
+        -----------
+        first, last : int
+            First and last edited lines (after the edit).
+        added : int
+            Lines inserted at first by the edit (negative if removed).
+        """
+        if self._live_pieces:
+            self.dirty_lines.add(self._live_pieces[0][0])
+            self._live_pieces = []
+            # The rest of a part-done line is redone from the start.
+
+        if added:
+            removed_to = first-added
+            self.dirty_lines = set(
+                l if l <= first else
+                l+added if added > 0 or l > removed_to else first
+                for l in self.dirty_lines)
+        self.line_count += added
+        self.dirty_lines.update(range(first, (last or first)+1))
+
+    @log.log_function
+    def set_live_mode(self, on):
+        """
+        Turn live analysis on or off.
+        """
+        self.live_mode = on
+        if not on and self._live_job is not None:
+            self.after_cancel(self._live_job)
+            self._live_job = None
+
+    @log.log_function
+    def live_analysis(self):
+        """
+        Re-highlight the edited lines in idle time, a few lines per slice
+        so that typing is not held up.
+        """
+        self._live_job = None
+        if not self.materialised or not self.dirty_lines:
+            return
+
+        begin = time.perf_counter()
+        started = False
+        while self._live_pieces or self.dirty_lines:
+            if not self._live_pieces:
+                line = self.dirty_lines.pop()
+                paragraph = self.text.get('{}.0'.format(line),
+                                          '{}.end'.format(line))
+                self._live_pieces = [(line, s, e) for s, e in
+                                     split_paragraph(paragraph,
+                                                     self.live_chunk)]
+
+            line, s, e = self._live_pieces[0]
+            if started and (time.perf_counter()-begin+self._parse_rate*(e-s)
+                            > self.live_budget):
+                self._live_job = self.after_idle(self.live_analysis)
+                # Out of time, so continue when the GUI is next idle.
+                return
+            # Only start a parse expected to fit in the slice.
+
+            start = time.perf_counter()
+            self.highlight_line(line, s, e)
+            self._live_pieces.pop(0)
+            self._parse_rate = 0.8*self._parse_rate+0.2*(
+                time.perf_counter()-start)/max(e-s, 1)
+            started = True
+
+        if self.live_callback is not None:
+            self.live_callback()
+
+    @log.log_function
+    def highlight_line(self, line, first=0, last=None):
+        """
+        Redo POS and sentiment highlighting for a single line, or part of
+        one.
+
+        Parameters
+        -----------
+        line : int
+            Line number in the text box.
+        first, last : int
+            Columns of the part to redo (default the whole line).
+        """
+        start = '{}.{}'.format(line, first)
+        end = '{}.end'.format(line) if last is None else '{}.{}'.format(
+            line, last)
+
+        self.layers.remove_range('pos', start, end)
+        self.layers.remove_range('sentiment', start, end)
+        self.layers.remove_range('diff', start, end)
+        # Clear old highlights from the line.
+
+        if self._echo_window is not None and self.layers.tags('echo'):
+            self.recheck_echoes(start, end)
+
+        paragraph = self.text.get(start, end)
+        if not paragraph.strip():
+            return
+
+        wc = wd.WordSet(paragraph, self.md_core)
+
+        for (w, t), (s, e) in zip(wc.pos, wc.offsets):
+            index_s = '{}.{}'.format(line, first+s)
+            index_e = '{}.{}'.format(line, first+e)
+            if t in wc.word_colours and t not in self.hidden_pos:
+                self.configure_pos_tag(t)
+                self.text.tag_add(self.layers.add('pos', t), index_s, index_e)
+            elif t[:2] in ('JJ', 'RB', 'VB'):
+                # Sentiment for descriptive words not already highlighted.
+                if w not in self._sentiment_cache:
+                    self._sentiment_cache[w] = wc.sentiment(w)
+                colour = self._sentiment_cache[w][3]
+                if colour not in ('#000000', '#ffffff'):
+                    self.text.tag_config('sentiment_'+colour,
+                                         foreground='snow', background=colour)
+                    tag = self.layers.add('sentiment', 'sentiment_'+colour)
+                    self.text.tag_add(tag, index_s, index_e)
+
+    @log.log_function
+    def word_set(self):
+        """
+        Get the WordSet of the current text, reusing the cached parse if
+        the text has not changed since it was made.
+        """
+        if self.raw_stale or self.raw is None:
+            self.update_raw()
+        if self.analysis is None or self.analysis.raw != self.raw:
+            self.analysis = wd.WordSet(self.raw, self.md_core)
+        return self.analysis
+
+    @log.log_function
+    def document_analysis(self):
+        """
+        Get the analyzer results of the current text, sharing the cached
+        WordSet parse, so each product is computed once per version of the
+        text.
+        """
+        wc = self.word_set()
+        if self.document is None or self.document.text != wc.raw:
+            self.document = an.DocumentAnalysis(wc.raw, self.md_core,
+                                                products={'wordset': wc})
+        return self.document
+
+    def analyse_line(self, line):
+        """
+        Split a line into (word, lemma, start, end) tuples with the spaCy
+        model, for updating the word index after edits.
+        """
+        return [(t.text, t.lemma_, t.idx, t.idx+len(t.text))
+                for t in self.md_core(line) if not (t.is_punct or t.is_space)]
+
+    @log.memory_profiler
+    @log.log_function
+    def word_index(self):
+        """
+        Get the word index of the current text, built from the cached
+        analysis and updated for edits made since.
+        """
+        if self.raw_stale or self.raw is None:
+            self.update_raw()
+
+        if self.index is None:
+            wc = self.analysis if self.analysis is not None else self.word_set()
+            self.index = wi.WordIndex(self.analyse_line)
+            self.index.build_from_analysis(wc.raw, wc.token, wc.lemmas,
+                                           wc.offsets)
+        self.index.analyse = self.analyse_line
+        self.index.sync(self.raw)
+        # Only lines changed since the last use are re-tokenised.
 
+        return self.index
 
+    @log.memory_profiler
     @log.log_function
-    def colourise_text(self, text, fgcolour, bgcolour, name, index):
+    def find_word(self, word, inflections=False):
+        """
+        Highlight every match of a word and move the cursor to the next
+        one.
+
+        Parameters
+        -----------
+        word : string
+            Word to find.
+        inflections : bool
+            Match every inflection of the word (e.g. 'walk' finds 'walked').
+
+        Returns
+        -------
+        found : list
+            (line, start column, end column) of each match.
+        """
+        found = self.word_index().find(word, inflections)
+
+        self.layers.clear('find')
+        if not found:
+            return found
+
+        self.text.tag_config('find', background='yellow')
+        indices = ['{}.{}'.format(line, c) for line, s, e in found
+                   for c in (s, e)]
+        self.text.tag_add(self.layers.add('find', 'find'), *indices)
+
+        line, col = [int(i) for i in self.text.index(tk.INSERT).split('.')]
+        following = [f for f in found if (f[0], f[1]) > (line, col)]
+        line, start, end = following[0] if following else found[0]
+        self.text.mark_set(tk.INSERT, '{}.{}'.format(line, end))
+        self.text.see(tk.INSERT)
+        # Jump to the next match, wrapping round to the first.
+
+        return found
+
+    @log.memory_profiler
+    @log.log_function
+    def replace_all(self, word, replacement):
+        """
+        Replace every occurrence of a word, as a single undo step.
+
+        Returns
+        -------
+        count : int
+            Number of replacements made.
+        """
+        found = self.word_index().find(word)
+        if not found:
+            return 0
+
+        self.text.config(autoseparators=False)
+        self.text.edit_separator()
+        for line, start, end in reversed(found):
+            # Work backwards so earlier positions stay valid.
+            self.text.delete('{}.{}'.format(line, start),
+                             '{}.{}'.format(line, end))
+            self.text.insert('{}.{}'.format(line, start), replacement)
+            self.mark_edited(line)
+        self.text.edit_separator()
+        self.text.config(autoseparators=True)
+
+        return len(found)
+
+    @log.log_function
+    def colourise_text(self, text, fgcolour, bgcolour, name, index,
+                       layer='selection'):
         """
         Make text a different colour.
 
@@ -103,6 +596,8 @@ class TabTextBox(tk.Frame):
             Background colour of text.
         name : string
             Tag name to assign, to avoid overwriting other colours.
+        layer : string
+            Highlight layer the tag belongs to.
 
         """
         self.text.tag_config(name, foreground=fgcolour, background=bgcolour,
@@ -110,9 +605,101 @@ class TabTextBox(tk.Frame):
         # Set tagging configuration.
 
         start, end = self.index_start_and_end(index, text)
-        self.text.tag_add(name, start, end)
+        self.text.tag_add(self.layers.add(layer, name), start, end)
         # Add highlight to text.
 
+    @log.log_function
+    def offsets_to_indices(self, offsets):
+        """
+        Convert character offsets in the cached WordSet text into Tk
+        'line.column' indices.
+
+        Parameters
+        -----------
+        offsets : iterable
+            Character offsets from the start of the text.
+
+        Returns
+        -------
+        indices : list
+            Tk text indices, in the same order as offsets.
+        """
+        starts = self.word_set().line_starts
+        indices = []
+        for o in offsets:
+            line = bisect.bisect_right(starts, o)-1
+            indices.append('{}.{}'.format(line+1, o-starts[line]))
+
+        return indices
+
+    @log.log_function
+    def tag_char_spans(self, name, spans, fgcolour='snow', bgcolour='blue',
+                       layer='pos'):
+        """
+        Tag many character spans with a single tag_add call.
+
+        Parameters
+        -----------
+        name : string
+            Tag name to assign.
+        spans : list
+            (start, end) character offsets in the cached WordSet text.
+        fgcolour : string
+            Foreground colour of text.
+        bgcolour : string
+            Background colour of text.
+        layer : string
+            Highlight layer the tag belongs to.
+        """
+        self.layers.add(layer, name)
+        self.text.tag_config(name, foreground=fgcolour, background=bgcolour,
+                             font=('Tempus Sans ITC', 12))
+
+        if spans:
+            indices = self.offsets_to_indices([o for sp in spans for o in sp])
+            self.text.tag_add(name, *indices)
+        self.layers.record(name, self.word_set().raw, spans)
+
+    @log.log_function
+    def export_spans(self):
+        """
+        Highlight spans and colours for export, from the spans recorded
+        when the tags were added.
+
+        Only tags recorded against the current analysed text are used, so
+        highlights made stale by later edits are left out. POS types that
+        are toggled off are skipped.
+
+        Returns
+        -------
+        text : str
+            Text the spans index into.
+        spans, colours : dict
+            CSS class name -> sorted (start, end) offsets, and CSS class
+            name -> background colour.
+        """
+        raw = self.word_set().raw
+        if self._echoes_unrecorded:
+            self.record_echoes(raw)
+        spans, colours = {}, {}
+        for layer, tags in self.layers.groups.items():
+            for tag in tags:
+                source, tag_spans = self.layers.spans.get(tag, (None, None))
+                if source != raw or not tag_spans:
+                    continue
+                if layer == 'pos' and tag in self.hidden_pos:
+                    continue
+                cls = ex.css_class(layer, tag)
+                spans[cls] = sorted(tag_spans)
+                colour = self.text.tag_cget(tag, 'background')
+                if not colour:
+                    continue
+                r, g, b = self.text.winfo_rgb(colour)
+                colours[cls] = '#{:02x}{:02x}{:02x}'.format(r >> 8, g >> 8,
+                                                            b >> 8)
+
+        return raw, spans, colours
+
     @log.log_function
     def index_start_and_end(self, index, text):
         """
@@ -123,36 +710,462 @@ class TabTextBox(tk.Frame):
 
         return start_index, end_index
 
+    @log.memory_profiler
     @log.log_function
     def classify_word_types(self, to_include):
         """
         Classify and highlight specific word types.
         """
-        self.raw = self.text.get('1.0', tk.END)
+        self.update_raw()
         # Get current text input.
 
-        wc = wd.WordSet(self.raw, self.md_core)
+        wc = self.word_set()
         # Label word types.
 
         flatten = [x for y in to_include for x in y]
         # Get rid of tupples.
+        self.hidden_pos = set(wc.word_colours)-set(flatten)
 
-        td = log.CodeBlockTimer('tfirst')  # This loop ~0.01-0.05s per word! Need to speed up:
+        td = log.CodeBlockTimer('tfirst')
         td.start()
 
-        for w, t in list(set(wc.pos)):
-            if t in flatten:
-                try:
-                    colour = wc.word_colours[t]
-                    self.highlight_words(w, wc, name=t, color=colour)
-                except KeyError:
-                    pass
-            else:
-                pass
+        self.layers.clear('pos')
+        self.highlighted_text_list = {}
+
+        by_tag = self.document_analysis().run('pos')
+        tagged = [(w, span) for (w, t), span in zip(wc.pos, wc.offsets)
+                  if t in wc.word_colours]
+        # Every word type is tagged, so toggling a type on or off later only
+        # changes the tag colours.
+
+        for t, spans in by_tag.items():
+            self.tag_char_spans(t, spans, layer='pos')
+            self.configure_pos_tag(t)
+
+        starts = self.offsets_to_indices([span[0] for w, span in tagged])
+        counts = {}
+        for (w, span), start in zip(tagged, starts):
+            counted = counts.get(w, 0)
+            counts[w] = counted+1
+            key = w + str(counted) if counted else w
+            # Rename w to include occurences.
+            self.highlighted_text_list[key] = self.index_start_and_end(start,
+                                                                       w)
+            # Add word and position bounds to dictionary.
         td.finish()
-        # Use the data save in the WordSet class to input the same
-        # text, but highlighted.
 
+    @log.log_function
+    def configure_pos_tag(self, tag):
+        """
+        Colour a POS tag, or make it invisible if it is toggled off.
+        """
+        if tag in self.hidden_pos:
+            self.text.tag_config(tag, foreground='', background='')
+        else:
+            self.text.tag_config(tag, foreground='snow',
+                                 background=hd.highlight_nltk[tag],
+                                 font=('Tempus Sans ITC', 12))
+
+    @log.log_function
+    def set_pos_visibility(self, to_include):
+        """
+        Show or hide POS highlights by reconfiguring their tags, without
+        re-analysing or re-tagging the text.
+
+        Parameters
+        -----------
+        to_include : list
+            Tag groups to show.
+        """
+        shown = set(x for y in to_include for x in y)
+        hidden = set(hd.highlight_nltk)-shown
+        changed = hidden ^ self.hidden_pos
+        self.hidden_pos = hidden
+
+        for tag in changed & self.layers.tags('pos'):
+            self.configure_pos_tag(tag)
+
+
+    @log.memory_profiler
+    @log.log_function
+    def named_entities(self):
+        """
+        Highlight named entities, using the entities from the cached
+        WordSet parse.
+        """
+        self.update_raw()
+        # Get current text input.
+
+        wc = self.word_set()
+        by_label = self.document_analysis().run('ner')
+        # Spans are grouped so each label is tagged in one call.
+
+        for label, spans in by_label.items():
+            colour = wc.entity_colours.get(label, 'grey')
+            self.tag_char_spans('ner_'+label, spans, bgcolour=colour,
+                                layer='ner')
+
+    @log.memory_profiler
+    @log.log_function
+    def similarity_heatmap(self, window=50, buckets=10):
+        """
+        Colour the whole text by how similar each region is to the current
+        selection, from white (unrelated) to cyan (similar).
+
+        Parameters
+        -----------
+        window : int
+            Number of tokens compared with the selection at a time.
+        buckets : int
+            Number of colour steps.
+        """
+        if not self.text.tag_ranges(tk.SEL):
+            return
+        selection = self.text.get(tk.SEL_FIRST, tk.SEL_LAST)
+
+        wc = self.word_set()
+        scores = wc.window_similarity(selection, window)
+        if scores is None:
+            return
+        # No word vectors to compare with.
+
+        self.layers.clear('heatmap')
+        spans = {}
+        previous, start, end = None, None, None
+        for score, (s, e) in zip(scores, wc.offsets):
+            bucket = min(int(max(score, 0)*buckets), buckets-1)
+            if bucket != previous:
+                if previous is not None:
+                    spans.setdefault(previous, []).append((start, end))
+                previous, start = bucket, s
+            end = e
+        if previous is not None:
+            spans.setdefault(previous, []).append((start, end))
+        # Join neighbouring words in the same bucket into one range.
+
+        for bucket, bucket_spans in spans.items():
+            level = int(255*(1-(bucket+1)/buckets))
+            colour = '#{:02x}ffff'.format(level)
+            self.tag_char_spans('heat{}'.format(bucket), bucket_spans,
+                                fgcolour='black', bgcolour=colour,
+                                layer='heatmap')
+
+    def echo_tag(self, lemma):
+        """
+        Echo tag for a lemma, one of a fixed set of colours so the number
+        of tags stays small. Lemmas take the colours in turn as they are
+        first seen, so neighbouring echoes differ.
+        """
+        n = self._echo_slots.setdefault(
+            lemma, len(self._echo_slots) % len(hd.rhyme_colours))
+        tag = self.layers.add('echo', 'echo{}'.format(n))
+        self.text.tag_config(tag, foreground='snow',
+                             background=hd.rhyme_colours[n])
+        return tag
+
+    @log.memory_profiler
+    @log.log_function
+    def echo_analysis(self, window=50):
+        """
+        Highlight content words repeated within a window of tokens, in the
+        'echo' layer. Both words of each echo share a colour.
+
+        Parameters
+        -----------
+        window : int
+            Largest distance in tokens between repeats.
+
+        Returns
+        -------
+        count : int
+            Number of distinct words echoed.
+        """
+        by_lemma = self.document_analysis().run(
+            'echoes', echoes={'window': window})
+
+        self.layers.clear('echo')
+        self._echo_window = window
+        self._echo_slots = {}
+        self._echoes_unrecorded = False
+        by_tag = {}
+        for lemma, spans in sorted(by_lemma.items(), key=lambda l: l[1][0]):
+            by_tag.setdefault(self.echo_tag(lemma), []).extend(spans)
+        for tag, spans in by_tag.items():
+            self.tag_char_spans(tag, sorted(spans), layer='echo',
+                                bgcolour=self.text.tag_cget(tag, 'background'))
+
+        return len(by_lemma)
+
+    def _token_reach(self, index, count, backwards):
+        """
+        Characters from a text index that hold count words, reading
+        backwards or forwards (fewer at the ends of the text).
+        """
+        margin = 8*count
+        while True:
+            if backwards:
+                chars = self.text.get('{}-{}c'.format(index, margin), index)
+            else:
+                chars = self.text.get(index, '{}+{}c'.format(index, margin))
+            words = [t for t in self.md_core.make_doc(chars)
+                     if not (t.is_punct or t.is_space)]
+            if len(words) >= count:
+                if backwards:
+                    return len(chars)-words[-count].idx
+                return words[count-1].idx+len(words[count-1].text)
+            if len(chars) < margin:
+                return len(chars)
+            margin *= 2
+
+    @log.log_function
+    def recheck_echoes(self, start, end):
+        """
+        Redo the echoes around an edited range. Words up to the echo
+        window away from the edit are cleared and re-tagged, along with
+        both words of every echo they are part of; the text parsed runs
+        twice the window either side, so each of those partners is seen.
+
+        Parameters
+        -----------
+        start, end : str
+            Text indices of the edited range.
+        """
+        window = self._echo_window
+        base = self.text.index('{}-{}c'.format(
+            start, self._token_reach(start, 2*window+1, True)))
+        edit_s = len(self.text.get(base, start))
+        edit_e = edit_s+len(self.text.get(start, end))
+        region = self.text.get(base, '{}+{}c'.format(
+            end, self._token_reach(end, 2*window+1, False)))
+
+        wc = wd.WordSet(region, self.md_core)
+        starts = [s for s, e in wc.offsets]
+        ends = [e for s, e in wc.offsets]
+        lo = max(bisect.bisect_right(ends, edit_s)-window, 0)
+        hi = min(bisect.bisect_left(starts, edit_e)+window, len(wc.offsets))
+        clear_s = starts[lo] if lo < hi else edit_s
+        clear_e = ends[hi-1] if lo < hi else edit_e
+        self.layers.remove_range('echo', '{}+{}c'.format(base, clear_s),
+                                 '{}+{}c'.format(base, clear_e))
+        self._echoes_unrecorded = True
+        # Words near the edit may have lost or gained echoes.
+
+        ids, vocabulary = ec.lemma_ids(wc.lemmas)
+        pairs = ec.find_echoes(ids, ec.content_mask(wc.token, wc.stops),
+                               window)
+        pairs = [(i, j) for i, j in pairs if lo <= i < hi or lo <= j < hi]
+        for n, spans in ec.echo_spans(pairs, ids, wc.offsets).items():
+            self.text.tag_add(self.echo_tag(vocabulary[n]),
+                              *['{}+{}c'.format(base, o)
+                                for sp in spans for o in sp])
+
+    def record_echoes(self, source):
+        """
+        Record the current ranges of the echo tags against the text, so
+        echoes redone by live analysis are exported. This reads the whole
+        text, so is left until the spans are needed.
+
+        Parameters
+        -----------
+        source : str
+            Contents of the text box.
+        """
+        self._echoes_unrecorded = False
+        starts = [0]+[m.end() for m in re.finditer('\n', source)]
+        for tag in self.layers.tags('echo'):
+            offsets = []
+            for index in self.text.tag_ranges(tag):
+                line, col = str(index).split('.')
+                offsets.append(starts[int(line)-1]+int(col))
+            self.layers.record(tag, source, list(zip(offsets[::2],
+                                                     offsets[1::2])))
+
+    def phrase_words(self, phrase):
+        """
+        Split a phrase into words as the text is split (punctuation
+        dropped), for building a PhraseAutomaton.
+        """
+        return [t.text for t in self.md_core.make_doc(phrase)
+                if not (t.is_punct or t.is_space)]
+
+    @log.memory_profiler
+    @log.log_function
+    def phrase_analysis(self, automaton):
+        """
+        Highlight every phrase of a phrase list found in the text, in the
+        'phrases' layer.
+
+        Parameters
+        -----------
+        automaton : PhraseAutomaton object
+            Compiled phrase list.
+
+        Returns
+        -------
+        counts : dict
+            Phrase -> number of times it was found.
+        """
+        analysis = self.document_analysis()
+        offsets = analysis.get('offsets')
+        matches = automaton.match(analysis.get('tokens'))
+
+        self.layers.clear('phrases')
+        self.tag_char_spans('phrase', [(offsets[s][0], offsets[e][1])
+                                       for s, e, p in matches],
+                            fgcolour='black', bgcolour='orange',
+                            layer='phrases')
+
+        counts = {}
+        for s, e, p in matches:
+            phrase = automaton.phrases[p]
+            counts[phrase] = counts.get(phrase, 0)+1
+        return counts
+
+    @log.memory_profiler
+    @log.log_function
+    def revision_diff(self, saved):
+        """
+        Highlight the changes made since a saved version of the text, in
+        the 'diff' layer.
+
+        Tokens of both versions are numbered through one dictionary and the
+        ID arrays compared, so only tokenising the saved text is needed
+        (the current text uses the cached analysis).
+
+        Parameters
+        -----------
+        saved : string
+            Text of the saved version.
+
+        Returns
+        -------
+        deleted : list
+            (character offset in the current text, deleted saved text) for
+            each deletion or replacement.
+        """
+        keys, offsets = self.document_analysis().get('surface')
+        old_keys, old_offsets = rd.surface_tokens(self.md_core.make_doc(saved))
+
+        numbers = {}
+        old, new = rd.token_ids(old_keys, numbers), rd.token_ids(keys,
+                                                                 numbers)
+        changes = rd.opcodes(rd.matching_blocks(old, new), len(old), len(new))
+
+        self.layers.clear('diff')
+        colours = {'insert': 'pale green', 'replace': 'khaki',
+                   'delete': 'light coral'}
+        spans = rd.diff_spans(changes, offsets, len(self.word_set().raw))
+        for tag, tag_spans in spans.items():
+            self.tag_char_spans('diff_'+tag, tag_spans, fgcolour='black',
+                                bgcolour=colours[tag], layer='diff')
+
+        return [(offsets[j1][0] if j1 < len(offsets) else
+                 len(self.word_set().raw),
+                 saved[old_offsets[i1][0]:old_offsets[i2-1][1]])
+                for tag, i1, i2, j1, j2 in changes if i2 > i1]
+
+    @log.memory_profiler
+    @log.log_function
+    def poetry_analysis(self, table):
+        """
+        Count syllables and find the stress pattern and rhyme of each line,
+        highlighting line endings that rhyme in the same colour.
+
+        Parameters
+        -----------
+        table : PronunciationTable object
+            Pronunciations to use.
+
+        Returns
+        -------
+        lines : list
+            Line analysis from poetry.analyse_lines.
+        """
+        lines = pt.analyse_lines(self.text.get('1.0', 'end-1c'), table)
+
+        by_letter = {}
+        for number, syllables, stress, s, e, letter in lines:
+            by_letter.setdefault(letter, []).extend(
+                ['{}.{}'.format(number, s), '{}.{}'.format(number, e)])
+
+        self.layers.clear('poetry')
+        rhymes = [l for l in sorted(by_letter) if len(by_letter[l]) > 2]
+        # Only colour rhymes shared by more than one line.
+        for n, letter in enumerate(rhymes):
+            tag = self.layers.add('poetry', 'rhyme_'+letter)
+            self.text.tag_config(tag, foreground='snow',
+                                 background=hd.rhyme_colours[
+                                     n % len(hd.rhyme_colours)])
+            self.text.tag_add(tag, *by_letter[letter])
+
+        return lines
+
+    @log.memory_profiler
+    @log.log_function
+    def modifier_analysis(self, window=20, threshold=0.25):
+        """
+        Highlight stacked adjectives/adverbs and passages dense with them,
+        and mark the modifiers suggested for deletion.
+
+        Parameters
+        -----------
+        window : int
+            Number of tokens in the rolling density window.
+        threshold : float
+            Fraction of modifiers above which a passage is too dense.
+
+        Returns
+        -------
+        counts : tuple
+            Number of stacked runs, dense passages and suggested deletions.
+        """
+        spans = self.document_analysis().run(
+            'modifiers', modifiers={'window': window, 'threshold': threshold})
+
+        self.layers.clear('modifiers')
+        self.tag_char_spans('dense', spans['dense'],
+                            fgcolour='black', bgcolour='light yellow',
+                            layer='modifiers')
+        self.tag_char_spans('stacked', spans['stacked'],
+                            fgcolour='black', bgcolour='lawn green',
+                            layer='modifiers')
+        self.tag_char_spans('suggest_delete', spans['suggest_delete'],
+                            fgcolour='red', bgcolour='lawn green',
+                            layer='modifiers')
+        # Deletions include the following space, so deleting leaves one.
+        self.text.tag_config('suggest_delete', overstrike=True)
+        self.text.tag_raise('suggest_delete')
+
+        return (len(spans['stacked']), len(spans['dense']),
+                len(spans['suggest_delete']))
+
+    @log.log_function
+    def apply_modifier_suggestions(self):
+        """
+        Delete every modifier marked by modifier_analysis, as a single undo
+        step.
+
+        Returns
+        -------
+        count : int
+            Number of deletions made.
+        """
+        ranges = self.text.tag_ranges('suggest_delete')
+        # Tag ranges follow any edits made since the analysis.
+        pairs = list(zip(ranges[0::2], ranges[1::2]))
+
+        self.text.config(autoseparators=False)
+        self.text.edit_separator()
+        for start, end in reversed(pairs):
+            first = int(str(start).split('.')[0])
+            last = int(str(end).split('.')[0])
+            self.text.delete(start, end)
+            self.mark_edited(first, first, first-last)
+        self.text.edit_separator()
+        self.text.config(autoseparators=True)
+
+        self.layers.clear('modifiers')
+        return len(pairs)
 
     @log.log_function
     def highlight_words(self, keyword, wc, color='blue',
@@ -182,7 +1195,8 @@ class TabTextBox(tk.Frame):
             index_pos = self.text.search(reg_search, index_pos, regexp=True,
                                          stopindex='end')
             # Search for text keyword as individual word.
-            self.colourise_text(w, char_color, color, name, index_pos)
+            self.colourise_text(w, char_color, color, name, index_pos,
+                                layer='pos')
             start, index_pos = self.index_start_and_end(index_pos, w)
             # Set index to begin highlighting at the end of the matched
             # word.
@@ -202,12 +1216,110 @@ class TabTextBox(tk.Frame):
         Add a scrollbar to the word window.
         """
 
-        scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL)
-        scrollbar.grid(column=1, row=0, sticky='N'+'S'+'W')
+        self.scroll = tk.Scrollbar(self, orient=tk.VERTICAL)
+        self.scroll.grid(column=1, row=0, sticky='N'+'S'+'W')
         # Add scrollbar on the right.
 
-        self.text.config(yscrollcommand=scrollbar.set)
-        scrollbar.config(command=self.text.yview)
+        self.text.config(yscrollcommand=self.scroll.set)
+        self.scroll.config(command=self.text.yview)
+
+    @log.log_function
+    def snapshot(self):
+        """
+        Picklable state of the text box: text, highlights, cursor and
+        scroll positions, and cached analysis results.
+        """
+        if self._echoes_unrecorded:
+            self.record_echoes(self.text.get('1.0', tk.END))
+        tags = []
+        for name in self.text.tag_names():
+            if name == tk.SEL:
+                continue
+            config = {k: v[4] if isinstance(v[4], (str, int, tuple))
+                      else str(v[4])
+                      for k, v in self.text.tag_configure(name).items()
+                      if len(v) == 5 and v[4] != ''}
+            ranges = [str(r) for r in self.text.tag_ranges(name)]
+            tags.append((name, config, ranges))
+            # Keep tag colours and the positions they cover.
+
+        return {'content': self.text.get('1.0', 'end-1c'),
+                'raw': self.raw,
+                'tags': tags,
+                'insert': self.text.index(tk.INSERT),
+                'yview': self.text.yview()[0],
+                'layers': self.layers.groups,
+                'spans': self.layers.spans,
+                'index': self.index,
+                'highlighted_text_list': self.highlighted_text_list,
+                'echoes': (self._echo_window, self._echo_slots)}
+
+    @log.memory_profiler
+    @log.log_function
+    def offload(self, store):
+        """
+        Move the text, tags and analysis state of the tab into a TabStore
+        and destroy the text box widget.
+
+        Parameters
+        -----------
+        store : TabStore object
+            Store to hold the tab state until it is rehydrated.
+        """
+        store.put(str(self), self.snapshot())
+
+        self.inspector.destroy()
+        self.text.destroy()
+        self.scroll.destroy()
+        self.text, self.scroll, self.layers = None, None, None
+        self.highlighted_text_list = {}
+        self.analysis, self.index, self.document = None, None, None
+        self.dirty_lines = set()
+        self._live_pieces = []
+        self.set_live_mode(False)
+        # Release the widget and analysis state.
+
+    @log.memory_profiler
+    @log.log_function
+    def rehydrate(self, store):
+        """
+        Recreate the text box widget, restoring any state held in a
+        TabStore.
+
+        Parameters
+        -----------
+        store : TabStore object
+            Store holding the tab state from offload.
+        """
+        self.add_text_box()
+
+        if str(self) not in store:
+            # New tab that has never been offloaded.
+            return
+
+        state = store.get(str(self))
+        self.text.insert('1.0', state['content'])
+        self.text.edit_modified(False)
+        self.line_count = int(self.text.index('end-1c').split('.')[0])
+        self.raw = state['raw']
+        self.raw_stale = True
+        self.highlighted_text_list = state['highlighted_text_list']
+        self.layers.groups = state['layers']
+        self.layers.spans = state.get('spans', {})
+        self.index = state['index']
+        self._echo_window, self._echo_slots = state.get('echoes', (None, {}))
+
+        for name, config, ranges in state['tags']:
+            self.text.tag_configure(name, **config)
+            if ranges:
+                self.text.tag_add(name, *ranges)
+        # Restore highlights.
+
+        self.text.mark_set(tk.INSERT, state['insert'])
+        self.text.yview_moveto(state['yview'])
+        self.text.edit_reset()
+        self.text.edit_modified(False)
+        # Restoring the text should not be undoable.
 
     @log.log_function
     def capture_highlighted_text(self, event):
@@ -232,7 +1344,7 @@ class TabTextBox(tk.Frame):
 
         self.text.tag_config(tag_name, foreground='snow', background=colour,
                              font=('Tempus Sans ITC', 12))
-        self.text.tag_add(tag_name, start, end)
+        self.text.tag_add(self.layers.add('selection', tag_name), start, end)
         # Highlight the text in colour.
 
         return highlighted_by_cursor
@@ -243,7 +1355,7 @@ class TabTextBox(tk.Frame):
         Get the similarities of two sections of highlighted text.
         """
 
-        wc = wd.WordSet(self.raw, self.md_core)
+        wc = self.word_set()
 
         self.text.config(cursor='@icons//highlighter_tip.cur')
         # Change cursor for highlights.
@@ -323,6 +1435,7 @@ class TabTextBox(tk.Frame):
         self.text_selected = tk.StringVar()
         # Reset selected to empty.
 
+    @log.memory_profiler
     @log.function_profiler
     @log.log_function
     def similarity_to_all_highlighted(self):
@@ -331,7 +1444,7 @@ class TabTextBox(tk.Frame):
         highlighted words.
         """
 
-        wc = wd.WordSet(self.raw, self.md_core)
+        wc = self.word_set()
 
         for k, v in zip(self.highlighted_text_list.keys(),
                         self.highlighted_text_list.values()):
@@ -341,9 +1454,10 @@ class TabTextBox(tk.Frame):
             # Remove numeric elements for words appearing twice.
             sim, color = wc.spacy_sim(self.text_selected.get(), s)
 
-            self.colourise_text(s, 'snow', color, s, v[0])
+            self.colourise_text(s, 'snow', color, s, v[0], layer='similarity')
             # Highlight text.
 
+    @log.memory_profiler
     @log.log_function
     def sentiment_analysis(self):
         """
@@ -354,7 +1468,7 @@ class TabTextBox(tk.Frame):
         if self.highlighted_text_list:
             # Highlight only selected words.
 
-            wc = wd.WordSet(self.raw, self.md_core)
+            wc = self.word_set()
 
             for s, v in zip(self.highlighted_text_list.keys(),
                             self.highlighted_text_list.values()):
@@ -362,12 +1476,13 @@ class TabTextBox(tk.Frame):
                 pos, neg, obj, color = wc.sentiment(s)
 
                 if color != '#000000':
-                    self.colourise_text(s, 'snow', color, s, v[0])
+                    self.colourise_text(s, 'snow', color, s, v[0],
+                                        layer='sentiment')
                     # Don't highlight.
 
         else:
             # Highlight all words.
-            wc = wd.WordSet(self.raw, self.md_core)
+            wc = self.word_set()
             sentiment_all_vals = wc.sentiment_all()
 
 
@@ -376,5 +1491,23 @@ class TabTextBox(tk.Frame):
         pass
 
 
+class HeadlessTab(TabTextBox):
+    """
+    Tab whose text box is an in-memory MemoryText rather than a Tk widget,
+    so the text, highlight and selection logic of TabTextBox can be run,
+    tested and benchmarked without a display.
 
+    Methods that need the widget itself (scrolling, binding, the hover
+    inspector, live analysis scheduling) are not available.
+    """
+
+    def __init__(self, md, content='', tab_name='Headless'):
+        self.init_state(20, 10, tab_name, md)
+        self.text = bf.MemoryText(content)
+        self.layers = hl.HighlightLayers(self.text)
+        self.text_selected = bf.StringValue()
+        self.raw = self.text.get('1.0', tk.END)
+        self.line_count = int(self.text.index('end-1c').split('.')[0])
 
+    def __str__(self):
+        return self.tab_name
@@ -73,8 +73,16 @@ class ToolTipDisplay(tk.Frame):
 
 
     @log.log_function
-    def display_text(self):
+    def display_text(self, info_text, x, y):
         """
-        Display data over text in tab.
+        Display data over text in tab, next to a point in the widget.
+
+        Parameters
+        -----------
+        info_text : str
+            Text to show.
+        x, y : int
+            Position in the widget, in pixels.
         """
-        pass
\ No newline at end of file
+        self.text.config(text=info_text)
+        self.place(in_=self.widget, x=x+12, y=y+12)
\ No newline at end of file
@@ -2,12 +2,26 @@
 GUI windows class
 """
 
+import os
+import time
 import tkinter as tk
 import tkinter.ttk
 import tkinter.filedialog
+import tkinter.messagebox
+import tkinter.simpledialog
 import log
 import gui_tab as tb
 import gui_tooltip as tp
+import tab_store as ts
+import word_index as wi
+import similarity_index as si
+import vector_store as vs
+import poetry as pt
+import gui_sentiment_arc as sa
+import export as ex
+import session as ss
+import phrases as ph
+import analysis_server as asv
 
 class MainWindow(tk.Tk):
     """
@@ -34,6 +48,7 @@ class MainWindow(tk.Tk):
 
         self.current_tab = None
         self.tab_no = None
+        self.toggle_pos = None
         # Empty attributes to fill later.
 
         self.store_image_copies = []
@@ -41,6 +56,48 @@ class MainWindow(tk.Tk):
 
         self.tab_size = 15
 
+        self.similarity_index = None
+        # Paragraph vectors of open tabs and chosen folders.
+        self._indexed_text = {}
+        # Hash of the text last indexed for each tab.
+
+        self.heatmap_window = 50
+        # Tokens per window of the similarity heatmap.
+        self.echo_window = 50
+        # Tokens between repeated words that count as an echo.
+        self.phrase_files = []
+        self.phrase_automaton = None
+        # Phrase lists to highlight, and their compiled automaton.
+
+        self.hover_inspector = tk.IntVar(value=1)
+        # Show details of the word under the mouse.
+
+        self.live_analysis = tk.IntVar(value=0)
+        # Live analysis of edited paragraphs (off by default).
+
+        self.memory_profiling = tk.IntVar(value=0)
+        # Trace the memory used by each action (slows analysis down).
+
+        self.tab_store = ts.TabStore()
+        # Compressed storage for tabs that are not in use.
+        self.max_live_tabs = 8
+        # Number of tabs to keep text box widgets for.
+        self.idle_offload_time = 300
+        # Seconds before an unselected tab is offloaded.
+        self.offload_check_interval = 60000
+        # Milliseconds between checks for inactive tabs.
+
+        self.session_path = ss.default_path()
+        self.session_interval = 120000
+        # Milliseconds between session snapshots.
+        self.restore_delay = 50
+        # Milliseconds between tabs restored in the background.
+
+        self.server_attach_interval = 2000
+        self.server_attach_tries = 90
+        # Milliseconds between attempts to reach a newly started analysis
+        # server, and how many attempts to make.
+
     @log.log_function
     def grid_config(self):
         """
@@ -111,6 +168,41 @@ class MainWindow(tk.Tk):
                         further_text='Sentiment analysis',
                         image=img_sentiment)
         # Sentiment analysis button.
+
+        self.add_button(self.named_entity_recognition, 9, 1, self.panes,
+                        width=4, text='NER',
+                        further_text='Named-entity recognition')
+        # Named entity highlighting button.
+
+        self.add_button(self.similar_paragraphs, 10, 1, self.panes,
+                        width=5, text='Docs',
+                        further_text='Similar paragraphs in all documents')
+        # Cross-document similarity button.
+
+        self.add_button(self.similarity_heatmap, 11, 1, self.panes,
+                        width=5, text='Heat',
+                        further_text='Similarity of the selection across the document')
+        # Similarity heatmap button.
+
+        self.add_button(self.poetry_analysis, 12, 1, self.panes,
+                        width=5, text='Poem',
+                        further_text='Syllables, meter and rhyme')
+        # Poetry analysis button.
+
+        self.add_button(self.modifier_analysis, 13, 1, self.panes,
+                        width=5, text='Mods',
+                        further_text='Excess adjectives and adverbs')
+        # Modifier density button.
+
+        self.add_button(self.update_sentiment_arc, 14, 1, self.panes,
+                        width=5, text='Arc',
+                        further_text='Sentiment arc of the document')
+        # Sentiment arc button.
+
+        self.add_button(self.echo_analysis, 15, 1, self.panes,
+                        width=5, text='Echo',
+                        further_text='Words repeated close together')
+        # Echo detection button.
         self.parent_tabs.enable_traversal()
         # Allow tab switching via keyboard.
 
@@ -122,9 +214,20 @@ class MainWindow(tk.Tk):
         self.panes.add(self.similarity_frame, stretch="always")
         self.similarity_frame.grid(row=0, column=5)
 
+        """Sentiment arc display"""
+        self.sentiment_arc = sa.SentimentArc(self.panes, width=300,
+                                             height=self.master_height*3)
+        self.panes.add(self.sentiment_arc, stretch="always")
+
         self.update()
         # Update based on events.
 
+        self.after(self.offload_check_interval, self.schedule_offload)
+        # Periodically offload long-inactive tabs.
+        self.after(self.session_interval, self.schedule_session_save)
+        self.protocol('WM_DELETE_WINDOW', self.close_window)
+        # Snapshot the session periodically and on exit.
+
     @log.log_function
     def save_file(self, tab):
         """
@@ -140,10 +243,55 @@ class MainWindow(tk.Tk):
 
         with open(file, 'w') as f:
             f.write(data)
+        tab.file_path = file
+        tab.tab_name = self.new_tab_text_length(file)
 
         self.parent_tabs.tab(tab, text=self.new_tab_text_length(file))
         # Change tab name to saved file name.
 
+    @log.log_function
+    def export_file(self, tab, fmt):
+        """
+        Export the text of a tab with its highlights as HTML or RTF.
+        """
+        file = tk.filedialog.asksaveasfilename(defaultextension='.'+fmt,
+                                               filetypes=((fmt+" files",
+                                                           "*."+fmt),
+                                                          ("all files",
+                                                           "*.*")),
+                                               title="Export file")
+        if not file:
+            return
+
+        text, spans, colours = tab.export_spans()
+        if fmt == 'rtf':
+            chunks = ex.rtf_chunks(text, spans, colours)
+        else:
+            chunks = ex.html_chunks(text, spans, colours,
+                                    title=self.parent_tabs.tab(tab, 'text'))
+        ex.write_export(file, chunks)
+
+    @log.log_function
+    def compare_with_saved(self, tab):
+        """
+        Highlight the changes made to a tab since its file was saved, and
+        list the deleted text.
+        """
+        if not tab.file_path or not os.path.exists(tab.file_path):
+            tk.messagebox.showinfo('Compare with saved',
+                                   'The tab has no saved file.', parent=self)
+            return
+
+        with open(tab.file_path, 'r') as f:
+            saved = f.read()
+        deleted = tab.revision_diff(saved)
+
+        if deleted:
+            indices = tab.offsets_to_indices([o for o, text in deleted])
+            self.report_window('Deleted since saved',
+                               ['{:>10}  {}'.format(i, ' '.join(text.split()))
+                                for i, (o, text) in zip(indices, deleted)])
+
     @log.log_function
     def open_file(self, tab):
         """
@@ -164,6 +312,8 @@ class MainWindow(tk.Tk):
             # Insert the text from the file.
             tab.raw = data
             # Raw text.
+        tab.file_path = file
+        tab.tab_name = self.new_tab_text_length(file)
 
         self.parent_tabs.tab(tab, text=self.new_tab_text_length(file))
         # Change tab name to loaded file name.
@@ -213,6 +363,107 @@ class MainWindow(tk.Tk):
         clipboard_text = self.clipboard_get()
         self.current_tab.text.insert(tk.INSERT, clipboard_text)
 
+    @log.log_function
+    def find_text(self, inflections=False):
+        """
+        Find and highlight a word in the current tab.
+        """
+        word = tk.simpledialog.askstring('Find', 'Find word:', parent=self)
+        if word:
+            self.current_tab.find_word(word.strip(), inflections)
+
+    @log.log_function
+    def tab_word_index(self, tab):
+        """
+        Get the word index of any tab, reading offloaded tabs from the tab
+        store without rehydrating them.
+        """
+        if tab.materialised:
+            return tab.word_index()
+
+        if str(tab) not in self.tab_store:
+            # Tab has never been opened, so has no text.
+            return wi.WordIndex()
+
+        state = self.tab_store.peek(str(tab))
+        index = state['index']
+        if index is None:
+            index = wi.WordIndex(tab.analyse_line)
+            index.build(state['content'])
+        else:
+            index.analyse = tab.analyse_line
+            index.sync(state['content'])
+
+        return index
+
+    @log.memory_profiler
+    @log.log_function
+    def find_all_tabs(self):
+        """
+        List every match of a word (or its inflections) in all open tabs.
+        """
+        word = tk.simpledialog.askstring('Find in all tabs', 'Find word:',
+                                         parent=self)
+        if not word:
+            return
+        inflections = tk.messagebox.askyesno('Find in all tabs',
+                                             'Include inflections?',
+                                             parent=self)
+
+        results = []
+        for name in self.parent_tabs.tabs():
+            tab = self.parent_tabs.nametowidget(name)
+            index = self.tab_word_index(tab)
+            for line, start, end in index.find(word.strip(), inflections):
+                results.append((name, line, start,
+                                index.line_text(line)[max(0, start-30):end+30]))
+
+        window = tk.Toplevel(self)
+        window.title('Found {} matches'.format(len(results)))
+        listbox = tk.Listbox(window, width=80, height=20)
+        listbox.grid(column=0, row=0, sticky='NSEW')
+        for name, line, start, context in results:
+            listbox.insert(tk.END, '{} {}.{}: {}'.format(
+                self.parent_tabs.tab(name, 'text').strip(), line, start,
+                context))
+
+        def go_to_result(event):
+            name, line, start, context = results[listbox.curselection()[0]]
+            self.go_to_line(name, line)
+            self.current_tab.text.mark_set(tk.INSERT,
+                                           '{}.{}'.format(line, start))
+
+        listbox.bind('<Double-Button-1>', go_to_result)
+
+    @log.log_function
+    def replace_all_tabs(self):
+        """
+        Replace a word in every open tab.
+        """
+        word = tk.simpledialog.askstring('Replace all', 'Find word:',
+                                         parent=self)
+        if not word:
+            return
+        replacement = tk.simpledialog.askstring('Replace all',
+                                                'Replace with:', parent=self)
+        if replacement is None:
+            return
+
+        count = 0
+        for name in self.parent_tabs.tabs():
+            tab = self.parent_tabs.nametowidget(name)
+            if not tab.materialised:
+                if not self.tab_word_index(tab).find(word.strip()):
+                    continue
+                tab.rehydrate(self.tab_store)
+                # Edit through the text box so tags and undo stay correct.
+            count += tab.replace_all(word.strip(), replacement)
+
+        self.offload_inactive_tabs()
+        tk.messagebox.showinfo('Replace all',
+                               '{} replacements made.'.format(count),
+                               parent=self)
+
     @log.log_function
     def menu(self):
         """
@@ -227,8 +478,13 @@ class MainWindow(tk.Tk):
         self.file_menu.add_command(label="New", command=lambda : self.new_file(self.current_tab))
         self.file_menu.add_command(label="Open", command=lambda : self.open_file(self.current_tab))
         self.file_menu.add_command(label="Save", command=lambda : self.save_file(self.current_tab))
+        self.file_menu.add_command(label="Export HTML", command=lambda : self.export_file(self.current_tab, 'html'))
+        self.file_menu.add_command(label="Export RTF", command=lambda : self.export_file(self.current_tab, 'rtf'))
+        self.file_menu.add_command(label="Compare with saved", command=lambda : self.compare_with_saved(self.current_tab))
+        self.file_menu.add_command(label="Add folder to similarity index",
+                                   command=self.index_folder)
         self.file_menu.add_separator()
-        self.file_menu.add_command(label="Quit", command=self.quit)
+        self.file_menu.add_command(label="Quit", command=self.close_window)
 
         self.menu.add_cascade(label="File", menu=self.file_menu)
 
@@ -237,12 +493,22 @@ class MainWindow(tk.Tk):
         """Menu for edits:"""
         self.edit_menu = tk.Menu(self.menu)
 
-        self.edit_menu.add_command(label="Undo", command=self.current_tab.text.edit_undo)
-        self.edit_menu.add_command(label="Redo", command=self.current_tab.text.edit_redo)
+        self.edit_menu.add_command(label="Undo", command=lambda : self.current_tab.text.edit_undo())
+        self.edit_menu.add_command(label="Redo", command=lambda : self.current_tab.text.edit_redo())
         self.edit_menu.add_separator()
         self.edit_menu.add_command(label="Cut", command=self.tab_cut)
         self.edit_menu.add_command(label="Copy", command=self.tab_copy)
         self.edit_menu.add_command(label="Paste", command=self.tab_paste)
+        self.edit_menu.add_separator()
+        self.edit_menu.add_command(label="Find", command=self.find_text)
+        self.edit_menu.add_command(label="Find inflections",
+                                   command=lambda : self.find_text(inflections=True))
+        self.edit_menu.add_command(label="Find in all tabs",
+                                   command=self.find_all_tabs)
+        self.edit_menu.add_command(label="Replace all",
+                                   command=self.replace_all_tabs)
+        self.edit_menu.add_command(label="Apply modifier suggestions",
+                                   command=self.apply_modifier_suggestions)
 
         self.menu.add_cascade(label="Edit", menu=self.edit_menu)
 
@@ -283,22 +549,52 @@ class MainWindow(tk.Tk):
                                                 variable=tg)
             # Add menu checkbox for each type of word highlight.
 
+        self.highlight_menu.add_separator()
+        self.highlight_menu.add_command(label='Phrase lists...',
+                                        command=self.choose_phrase_files)
+        self.highlight_menu.add_command(label='Highlight phrases',
+                                        command=self.highlight_phrases)
+
         self.menu.add_cascade(label='Highlights', menu=self.highlight_menu)
 
         """Menu for settings"""
         self.settings_menu = tk.Menu(self.menu)
 
+        self.settings_menu.add_checkbutton(label='Live analysis', onvalue=1,
+                                           offvalue=0,
+                                           command=self.toggle_live_analysis,
+                                           variable=self.live_analysis)
+        self.settings_menu.add_checkbutton(label='Hover inspector', onvalue=1,
+                                           offvalue=0,
+                                           command=self.toggle_hover_inspector,
+                                           variable=self.hover_inspector)
+        self.settings_menu.add_command(label='Heatmap window size',
+                                       command=self.set_heatmap_window)
+        self.settings_menu.add_command(label='Echo window size',
+                                       command=self.set_echo_window)
+        self.settings_menu.add_separator()
+        self.settings_menu.add_checkbutton(label='Memory profiling',
+                                           onvalue=1, offvalue=0,
+                                           command=self.toggle_memory_profiling,
+                                           variable=self.memory_profiling)
+        self.settings_menu.add_command(label='Memory usage',
+                                       command=self.show_memory_usage)
+        self.settings_menu.add_command(label='Language models',
+                                       command=self.show_model_usage)
+
         self.menu.add_cascade(label="Settings", menu=self.settings_menu)
 
         self.config(menu=self.menu)
 
 
     @log.log_function
-    def new_tab(self, event=None):
+    def new_tab(self, event=None, layout=True):
         """
-        Add a new text box tab.
+        Add a new text box tab. With layout False the tab scroll buttons are
+        left alone, for callers adding many tabs at once.
         """
-        self.stop_width()
+        if layout:
+            self.stop_width()
 
         default_tab_name = 'Document '+str(len(self.parent_tabs.tabs()))
         default_tab_name = self.new_tab_text_length(default_tab_name)
@@ -309,7 +605,7 @@ class MainWindow(tk.Tk):
                                   self.md_core)
         # Internal container class.
         self.parent_tabs.add(tab_w_box, text=tab_w_box.tab_name)
-        tab_w_box.add_text_box()
+        # The text box is only created when the tab is first selected.
 
         return tab_w_box
 
@@ -353,6 +649,177 @@ class MainWindow(tk.Tk):
         self.current_tab = self.parent_tabs.nametowidget(current_tab_name)
         # Get current tab (for open/closing functions).
 
+        if not self.current_tab.materialised:
+            self.current_tab.rehydrate(self.tab_store)
+            # Create or restore the text box of the tab.
+        self.current_tab.last_used = time.time()
+
+        if self.live_analysis.get():
+            self.current_tab.set_live_mode(True)
+        self.current_tab.set_inspect_mode(bool(self.hover_inspector.get()))
+        self.current_tab.live_callback = self.update_sentiment_arc
+        # Keep the sentiment arc up to date in live mode.
+        if self.toggle_pos is not None:
+            self.current_tab.set_pos_visibility(self.toggle_pos)
+            # Match the Highlights menu toggles.
+
+        self.offload_inactive_tabs()
+
+    @log.log_function
+    def offload_inactive_tabs(self):
+        """
+        Offload the text boxes of hidden tabs, tabs unused for longer than
+        idle_offload_time and the least recently used tabs above
+        max_live_tabs.
+        """
+        now = time.time()
+        live = []
+
+        for name in self.parent_tabs.tabs():
+            tab = self.parent_tabs.nametowidget(name)
+            if not tab.materialised or tab is self.current_tab:
+                continue
+
+            if any([self.parent_tabs.tab(name, 'state') == 'hidden',
+                    now-tab.last_used > self.idle_offload_time]):
+                tab.offload(self.tab_store)
+            else:
+                live.append(tab)
+
+        live.sort(key=lambda t: t.last_used)
+        for tab in live[:max(0, len(live)+1-self.max_live_tabs)]:
+            # Keep max_live_tabs, including the current tab.
+            tab.offload(self.tab_store)
+
+    @log.log_function
+    def schedule_offload(self):
+        """
+        Offload inactive tabs and schedule the next check.
+        """
+        self.offload_inactive_tabs()
+        self.md_core.unload_idle()
+        # Release language models that have not been used for a while.
+        self.after(self.offload_check_interval, self.schedule_offload)
+
+    @log.log_function
+    def attach_server(self, tries):
+        """
+        Switch the window and its tabs to the analysis server once it is
+        up, trying again every server_attach_interval ms up to tries
+        times. The in-process models are used until then, and unloaded
+        once the server takes over.
+        """
+        remote = asv.connect()
+        if remote is None:
+            if tries > 1:
+                self.after(self.server_attach_interval, self.attach_server,
+                           tries-1)
+            return
+
+        local, self.md_core = self.md_core, remote
+        for name in self.parent_tabs.tabs():
+            tab = self.parent_tabs.nametowidget(name)
+            tab.md_core = remote
+            tab.analysis, tab.document = None, None
+            # Cached parses hold the local vocabulary, so redo them on the
+            # server.
+        local.unload()
+
+    @log.log_function
+    def save_session(self):
+        """
+        Snapshot the open tabs, so they can be restored on the next launch.
+        Offloaded tabs are saved from the tab store as they are.
+        """
+        tabs = []
+        names = self.parent_tabs.tabs()
+        for name in names:
+            tab = self.parent_tabs.nametowidget(name)
+            if tab.materialised:
+                packed = ts.pack(tab.snapshot())
+            elif name in self.tab_store:
+                packed = self.tab_store.packed(name)
+            else:
+                packed = None
+            tabs.append((self.parent_tabs.tab(name, 'text'), tab.file_path,
+                         packed))
+
+        selected = self.parent_tabs.select()
+        ss.save_session(self.session_path, tabs,
+                        names.index(selected) if selected in names else 0)
+
+    @log.log_function
+    def schedule_session_save(self):
+        """
+        Save the session and schedule the next snapshot.
+        """
+        self.save_session()
+        self.after(self.session_interval, self.schedule_session_save)
+
+    @log.log_function
+    def restore_session(self):
+        """
+        Reopen the tabs of the last session.
+
+        Tab states go straight into the tab store, still compressed. Only
+        the selected tab is rehydrated at once; the others are rehydrated
+        one at a time once the window is idle, up to max_live_tabs, and the
+        rest when they are first selected.
+        """
+        tabs, selected = ss.load_session(self.session_path)
+        if not tabs:
+            return
+
+        empty = list(self.parent_tabs.tabs())
+        # Default tabs made before the session was loaded.
+
+        restored = []
+        for title, file_path, packed in tabs:
+            tab = self.new_tab(layout=False)
+            self.parent_tabs.tab(tab, text=title)
+            tab.file_path = file_path
+            if packed is not None:
+                self.tab_store.put_packed(str(tab), packed)
+            restored.append(tab)
+
+        selected = min(selected, len(restored)-1)
+        self.parent_tabs.select(restored[selected])
+        for name in empty:
+            tab = self.parent_tabs.nametowidget(name)
+            self.tab_store.discard(name)
+            self.parent_tabs.forget(tab)
+            tab.destroy()
+        if len(self.parent_tabs.tabs()) >= 8:
+            self.add_tab_scroll()
+        # Lay out the tab bar once, rather than for every restored tab.
+
+        background = restored[selected+1:] + restored[:selected]
+        self.after(self.restore_delay, self.restore_in_background,
+                   background[:self.max_live_tabs-1])
+
+    @log.log_function
+    def restore_in_background(self, tabs):
+        """
+        Rehydrate restored tabs one per call, so the window stays
+        responsive in between.
+        """
+        while tabs:
+            tab = tabs.pop(0)
+            if tab.winfo_exists() and not tab.materialised:
+                tab.rehydrate(self.tab_store)
+                break
+
+        if tabs:
+            self.after(self.restore_delay, self.restore_in_background, tabs)
+
+    @log.log_function
+    def close_window(self):
+        """
+        Save the session, then close the window.
+        """
+        self.save_session()
+        self.destroy()
+
     @log.log_function
     def add_button(self, to_bind, col, row, paneloc, width=1,
                    stick='NE', further_text=None, text=None,
@@ -458,7 +925,13 @@ class MainWindow(tk.Tk):
         """
         Close selected tab.
         """
+        self.tab_store.discard(str(self.current_tab))
+        if self.similarity_index is not None:
+            self.similarity_index.remove(str(self.current_tab))
+            self._indexed_text.pop(str(self.current_tab), None)
         self.parent_tabs.forget(self.current_tab)
+        self.current_tab.destroy()
+        # Release the tab widget as well as removing it from the notebook.
 
     @log.log_function
     def stop_width(self):
@@ -485,11 +958,75 @@ class MainWindow(tk.Tk):
         """
         Remove formatting from text in a tab (e.g highlights).
         """
-        self.current_tab.text.delete('1.0', 'end-1c')
-        self.current_tab.text.insert(tk.END, self.current_tab.raw)
+        self.current_tab.layers.clear_all()
+        # Delete highlight tags, leaving the text and undo history alone.
         self.current_tab.highlighted_text_list = {}
         # Erase saved text list.
 
+    @log.log_function
+    def named_entity_recognition(self, event):
+        """
+        Wrapper to highlight named entities in a text box of a tab.
+        """
+        self.current_tab.named_entities()
+
+    @log.log_function
+    def toggle_live_analysis(self):
+        """
+        Turn live analysis of edited paragraphs on or off for the current
+        tab.
+        """
+        self.current_tab.set_live_mode(bool(self.live_analysis.get()))
+
+    @log.log_function
+    def toggle_hover_inspector(self):
+        """
+        Turn the hover inspector on or off for the current tab.
+        """
+        self.current_tab.set_inspect_mode(bool(self.hover_inspector.get()))
+
+    @log.log_function
+    def toggle_memory_profiling(self):
+        """
+        Start or stop tracing the memory used by each action.
+        """
+        if self.memory_profiling.get():
+            log.memory_usage.start()
+        else:
+            log.memory_usage.stop()
+
+    @log.log_function
+    def show_memory_usage(self):
+        """
+        Show the peak and retained memory of each action and tab measured
+        so far. Allocation sites are written to the log.
+        """
+        lines = log.memory_usage.report()
+        if len(lines) == 1:
+            lines.append('Nothing measured yet: turn on Memory profiling in '
+                         'the Settings menu.')
+        self.report_window('Memory usage', lines)
+
+    @log.log_function
+    def show_model_usage(self):
+        """
+        Show the language models loaded, their load time, size and speed,
+        and which model is used for each task.
+        """
+        self.report_window('Language models', self.md_core.report())
+
+    @log.log_function
+    def report_window(self, title, lines):
+        """
+        Show lines of a report in a read-only window.
+        """
+        window = tk.Toplevel(self)
+        window.title(title)
+        report = tk.Text(window, width=80, height=20, font=('Courier', 10))
+        report.grid(column=0, row=0, sticky='NSEW')
+        report.insert('1.0', '\n'.join(lines))
+        report.config(state='disabled')
+
     @log.log_function
     def highlight_checkbox_control(self):
         """
@@ -503,6 +1040,9 @@ class MainWindow(tk.Tk):
                 if ps in self.toggle_pos:
                     self.toggle_pos.remove(ps)
 
+        self.current_tab.set_pos_visibility(self.toggle_pos)
+        # Recolour the cached tags, rather than re-analysing.
+
     @log.log_function
     def similarity_user_highlight(self, event):
         """
@@ -528,6 +1068,264 @@ class MainWindow(tk.Tk):
         """
         self.current_tab.bind_to_selection()
 
+    @log.log_function
+    def similarity_heatmap(self, event):
+        """
+        Colour the current tab by similarity to the selected text.
+        """
+        if vs.shared_store(self.md_core) is None:
+            tk.messagebox.showinfo('Similarity heatmap',
+                                   'The language model has no word vectors, '
+                                   'so the text can\'t be compared with the '
+                                   'selection.', parent=self)
+            return
+        self.current_tab.similarity_heatmap(window=self.heatmap_window)
+
+    @log.log_function
+    def echo_analysis(self, event):
+        """
+        Highlight words repeated close together in the current tab.
+        """
+        self.current_tab.echo_analysis(window=self.echo_window)
+
+    @log.log_function
+    def choose_phrase_files(self):
+        """
+        Choose the phrase lists (one phrase per line) to highlight, then
+        highlight them in the current tab.
+        """
+        files = tk.filedialog.askopenfilenames(filetypes=(("txt files",
+                                                           "*.txt"),
+                                                          ("all files",
+                                                           "*.*")),
+                                               title="Phrase lists")
+        if not files:
+            return
+        self.phrase_files = list(files)
+        self.phrase_automaton = None
+        self.highlight_phrases()
+
+    @log.log_function
+    def highlight_phrases(self):
+        """
+        Highlight the phrases of the chosen phrase lists in the current tab,
+        and list how often each was found.
+        """
+        if not self.phrase_files:
+            self.choose_phrase_files()
+            return
+
+        if self.phrase_automaton is None:
+            self.phrase_automaton = ph.load_automaton(
+                self.phrase_files, self.current_tab.phrase_words)
+            # Compiled once, then read from the cache on later launches.
+
+        counts = self.current_tab.phrase_analysis(self.phrase_automaton)
+        self.report_window('Phrases found',
+                           ['{:>6}  {}'.format(n, phrase) for phrase, n in
+                            sorted(counts.items(), key=lambda c: -c[1])])
+
+    @log.log_function
+    def set_echo_window(self):
+        """
+        Set the number of tokens between repeats that count as an echo.
+        """
+        size = tk.simpledialog.askinteger('Echo window size',
+                                          'Tokens between repeats:',
+                                          initialvalue=self.echo_window,
+                                          minvalue=1, parent=self)
+        if size:
+            self.echo_window = size
+            if self.current_tab.layers.tags('echo'):
+                self.current_tab.echo_analysis(window=size)
+
+    @log.log_function
+    def set_heatmap_window(self):
+        """
+        Set the number of tokens per window of the similarity heatmap.
+        """
+        size = tk.simpledialog.askinteger('Heatmap window size',
+                                          'Tokens per window:',
+                                          initialvalue=self.heatmap_window,
+                                          minvalue=1, parent=self)
+        if size:
+            self.heatmap_window = size
+
+    @log.log_function
+    def poetry_analysis(self, event):
+        """
+        Show syllables, stress and rhyme scheme of each line of the current
+        tab.
+        """
+        lines = self.current_tab.poetry_analysis(pt.shared_table())
+
+        for child in self.similarity_frame.winfo_children():
+            child.destroy()
+
+        listbox = tk.Listbox(self.similarity_frame, width=40, height=30)
+        listbox.grid(row=0, column=0, sticky='NSEW')
+        for number, syllables, stress, s, e, letter in lines:
+            listbox.insert(tk.END, '{}: {} syllables {} {}'.format(
+                number, syllables, stress, letter))
+
+    @log.log_function
+    def modifier_analysis(self, event):
+        """
+        Highlight excess adjectives and adverbs in the current tab.
+        """
+        runs, passages, deletions = self.current_tab.modifier_analysis()
+
+        for child in self.similarity_frame.winfo_children():
+            child.destroy()
+        s_text = ('Stacked modifiers: {}\nDense passages: {}\n'
+                  'Suggested deletions: {}').format(runs, passages, deletions)
+        tk.ttk.Label(self.similarity_frame, text=s_text).grid(row=0, column=0,
+                                                              sticky='W')
+
+    @log.log_function
+    def apply_modifier_suggestions(self):
+        """
+        Delete the suggested modifiers in the current tab in one undo step.
+        """
+        self.current_tab.apply_modifier_suggestions()
+
+    @log.memory_profiler
+    @log.log_function
+    def update_sentiment_arc(self, event=None):
+        """
+        Plot the sentiment arc of the current tab, redrawing only the parts
+        that changed.
+        """
+        self.sentiment_arc.update_arc(self.current_tab.text.get('1.0',
+                                                                'end-1c'))
+
+    @log.log_function
+    def tab_content(self, tab):
+        """
+        Get the text of any tab, reading offloaded tabs from the tab store.
+        """
+        if tab.materialised:
+            return tab.text.get('1.0', 'end-1c')
+        if str(tab) in self.tab_store:
+            return self.tab_store.peek(str(tab))['content']
+        return ''
+
+    @log.log_function
+    def paragraph_index(self):
+        """
+        Get the cross-document paragraph index, re-indexing any open tab
+        whose text has changed since it was last indexed.
+
+        Returns
+        -------
+        index : ParagraphIndex object
+            The index, or None (after telling the user) if the language
+            model has no word vectors.
+        """
+        store = vs.shared_store(self.md_core)
+        if store is None:
+            tk.messagebox.showinfo('Similar paragraphs',
+                                   'The language model has no word vectors, '
+                                   'so paragraphs can\'t be compared.',
+                                   parent=self)
+            return None
+        if self.similarity_index is None:
+            self.similarity_index = si.ParagraphIndex(store.vectors.shape[1])
+
+        for name in self.parent_tabs.tabs():
+            content = self.tab_content(self.parent_tabs.nametowidget(name))
+            if self._indexed_text.get(name) != hash(content):
+                vectors, labels = si.paragraph_vectors(self.md_core, store,
+                                                       content)
+                self.similarity_index.add(name, vectors, labels)
+                self._indexed_text[name] = hash(content)
+
+        return self.similarity_index
+
+    @log.memory_profiler
+    @log.log_function
+    def index_folder(self):
+        """
+        Add the paragraphs of every text file in a folder to the
+        cross-document similarity index.
+        """
+        folder = tk.filedialog.askdirectory(title="Choose folder to index")
+        if not folder:
+            return
+
+        index = self.paragraph_index()
+        if index is None:
+            return
+        store = vs.shared_store(self.md_core)
+        for file in sorted(os.listdir(folder)):
+            if not file.endswith('.txt'):
+                continue
+            path = os.path.join(folder, file)
+            with open(path, 'r') as f:
+                vectors, labels = si.paragraph_vectors(self.md_core, store,
+                                                       f.read())
+            index.add(path, vectors, labels)
+
+    @log.memory_profiler
+    @log.log_function
+    def similar_paragraphs(self, event):
+        """
+        Find the paragraphs in all documents that are most similar to the
+        selection, or to the paragraph at the cursor.
+        """
+        text = self.current_tab.text
+        if text.tag_ranges(tk.SEL):
+            query = text.get(tk.SEL_FIRST, tk.SEL_LAST)
+            exclude = None
+        else:
+            line = int(text.index(tk.INSERT).split('.')[0])
+            query = text.get('{}.0'.format(line), '{}.end'.format(line))
+            exclude = (str(self.current_tab), line)
+            # Don't match the paragraph with itself.
+
+        index = self.paragraph_index()
+        if index is None:
+            return
+        vector = vs.shared_store(self.md_core).doc_vector(
+            self.md_core.make_doc(query))
+        self.show_similar_paragraphs(index.query(vector, k=10,
+                                                 exclude=exclude))
+
+    @log.log_function
+    def show_similar_paragraphs(self, results):
+        """
+        List similar paragraphs in the similarity frame. Clicking a
+        paragraph from an open tab jumps to it.
+        """
+        for child in self.similarity_frame.winfo_children():
+            child.destroy()
+
+        tabs = self.parent_tabs.tabs()
+        for row, (sim, source, number, paragraph) in enumerate(results):
+            if source in tabs:
+                name = self.parent_tabs.tab(source, 'text').strip()
+            else:
+                name = os.path.basename(source)
+
+            label = tk.ttk.Label(self.similarity_frame, wraplength=300,
+                                 text='{} paragraph {} ({:.2f}): {}'.format(
+                                     name, number, sim, paragraph[:80]))
+            label.grid(row=row, column=0, sticky='W')
+            if source in tabs:
+                label.bind('<Button-1>',
+                           lambda e, s=source, n=number: self.go_to_line(s, n))
+
+    @log.log_function
+    def go_to_line(self, tab_name, line):
+        """
+        Select a tab and move the cursor to the start of a line.
+        """
+        self.parent_tabs.select(tab_name)
+        self.update()
+        # Let the tab be rehydrated before moving the cursor.
+        self.current_tab.text.mark_set(tk.INSERT, '{}.0'.format(line))
+        self.current_tab.text.see(tk.INSERT)
+
     @log.log_function
     def box_grid(self, frame, xdim=5, ydim=5):
         """
@@ -553,7 +1351,7 @@ class MainWindow(tk.Tk):
         """
         Perform sentiment analysis on text.
         """
-        self.current_tab.text.delete('1.0', 'end-1c')
-        self.current_tab.text.insert(tk.END, self.current_tab.raw)
+        self.current_tab.layers.clear('pos', 'sentiment', 'similarity', 'ner')
+        # Swap other highlights for the sentiment layer.
 
         self.current_tab.sentiment_analysis()
\ No newline at end of file
@@ -21,3 +21,33 @@ highlight_nltk = {'VB':'RoyalBlue3', 'VBD':'RoyalBlue3', 'VBG':'RoyalBlue3', # V
                   'EX': 'sandy brown'} # Existential
                   # Highlight with nltk labelling.
 
+
+highlight_ner = {'PERSON': 'salmon', 'NORP': 'dark orange', # People, groups
+                 'FAC': 'sandy brown', 'ORG': 'gold', # Buildings, organisations
+                 'GPE': 'lawn green', 'LOC': 'lime green', # Places
+                 'PRODUCT': 'turquoise3', 'EVENT': 'RoyalBlue3', # Objects, events
+                 'WORK_OF_ART': 'MediumPurple1', 'LAW': 'purple1', # Titles
+                 'LANGUAGE': 'deep pink',
+                 'DATE': 'grey', 'TIME': 'grey', # Times
+                 'PERCENT': 'maroon1', 'MONEY': 'maroon1', # Numbers
+                 'QUANTITY': 'maroon1', 'ORDINAL': 'maroon1',
+                 'CARDINAL': 'maroon1'}
+                 # Highlight with spaCy named-entity labelling.
+
+rhyme_colours = ['salmon', 'lawn green', 'turquoise3', 'gold', 'MediumPurple1',
+                 'dark orange', 'deep pink', 'RoyalBlue3', 'sandy brown',
+                 'maroon1']
+                 # Highlight colours for rhyme groups, reused in turn.
+
+colour_hex = {'RoyalBlue3': '#3a5fcd', 'firebrick1': '#ff3030',
+              'salmon': '#fa8072', 'lawn green': '#7cfc00', 'grey': '#bebebe',
+              'purple1': '#9b30ff', 'turquoise3': '#00c5cd',
+              'MediumPurple1': '#ab82ff', 'maroon1': '#ff34b3',
+              'dark orange': '#ff8c00', 'gold': '#ffd700',
+              'dark goldenrod': '#b8860b', 'deep pink': '#ff1493',
+              'lime green': '#32cd32', 'dark slate gray': '#2f4f4f',
+              'sandy brown': '#f4a460', 'snow': '#fffafa',
+              'light yellow': '#ffffe0', 'yellow': '#ffff00',
+              'red': '#ff0000', 'blue': '#0000ff', 'black': '#000000',
+              'white': '#ffffff'}
+              # Hex values of the Tk colour names above, for exporting.
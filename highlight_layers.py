@@ -0,0 +1,100 @@
+"""
+Named groups of highlight tags in a text box.
+"""
+
+import log
+
+
+class HighlightLayers(object):
+    """
+    Tracks which tags of a text box belong to each highlight layer (e.g.
+    'pos', 'sentiment', 'similarity', 'selection'), so that a layer can be
+    cleared without touching the text itself.
+
+    Public attributes
+    -----------------
+    text : TKinter text box widget
+        Text box holding the tags.
+    groups : dict
+        Set of tag names for each layer name.
+    spans : dict
+        (source text, character spans) for tags added in bulk from an
+        analysis, so they can be exported without reading Tk tag ranges.
+
+    Class methods
+    -----------------
+    add
+        Register a tag as part of a layer.
+    record
+        Keep the character spans a tag was added to.
+    clear
+        Delete all tags of one or more layers.
+    clear_all
+        Delete the tags of every layer.
+    remove_range
+        Remove the tags of a layer from part of the text.
+
+    """
+
+    def __init__(self, text, groups=None):
+        self.text = text
+        self.groups = groups if groups is not None else {}
+        self.spans = {}
+
+    def add(self, layer, tag):
+        """
+        Register a tag as part of a layer.
+
+        Parameters
+        -----------
+        layer : string
+            Name of the layer.
+        tag : string
+            Tag name used in the text box.
+
+        Returns
+        -------
+        tag : string
+            The tag name, so the call can be used inline.
+        """
+        self.groups.setdefault(layer, set()).add(tag)
+        return tag
+
+    def record(self, tag, source, spans):
+        """
+        Keep the character spans of a tag, and the text they index into.
+        """
+        self.spans[tag] = (source, spans)
+
+    def tags(self, layer):
+        """
+        Get the tag names in a layer.
+        """
+        return self.groups.get(layer, set())
+
+    @log.log_function
+    def clear(self, *layers):
+        """
+        Delete all tags in the given layers. The text is left as it is.
+        """
+        for layer in layers:
+            tags = self.groups.pop(layer, set())
+            for tag in tags:
+                self.spans.pop(tag, None)
+            if tags:
+                self.text.tag_delete(*tags)
+                # Remove every tag of the layer in one call.
+
+    @log.log_function
+    def clear_all(self):
+        """
+        Delete the tags of every layer.
+        """
+        self.clear(*list(self.groups))
+
+    def remove_range(self, layer, start, end):
+        """
+        Remove the tags of a layer between two text indices.
+        """
+        for tag in self.tags(layer):
+            self.text.tag_remove(tag, start, end)
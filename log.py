@@ -3,6 +3,7 @@ import logging
 import functools
 import os
 import time
+import tracemalloc
 
 
 def log_setup(logfile_name = 'clay_log', logfile_loc = False,
@@ -136,4 +137,125 @@ class CodeBlockTimer(object):
             # Write output to file.
             self.logger.info('Timer {} ran in {}s.'.format(self.timer_name, self.runtime))
         if self.print_sc:
-            print('Timer {} ran in {}s.'.format(self.timer_name, self.runtime))
\ No newline at end of file
+            print('Timer {} ran in {}s.'.format(self.timer_name, self.runtime))
+
+
+class MemoryUsage(object):
+    """
+    Peak and retained memory of actions, measured with tracemalloc.
+
+    Measuring slows allocation down, so nothing is traced until start is
+    called. Only the outermost measured block is recorded, as tracemalloc
+    has a single peak counter.
+
+    Public attributes
+    -----------------
+    active : Boolean
+        True while memory is being traced.
+    top : int
+        Number of allocation sites to log for each action.
+    stats : dict
+        (action, tab) -> [calls, largest peak, total retained, last
+        retained] in bytes.
+    logger : Logger
+        Log object to write to.
+
+    Class methods
+    -----------------
+    start
+        Start tracing memory.
+    stop
+        Stop tracing memory.
+    measure
+        Record the memory used by a call of a function.
+    report
+        Lines summarising the memory used by each action.
+
+    """
+    def __init__(self, top=5):
+        self.active = False
+        self.top = top
+        self.stats = {}
+        self.logger = logging.getLogger("debug-tracking")
+        self._depth = 0
+
+    def start(self):
+        """Start tracing memory."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.active = True
+
+    def stop(self):
+        """Stop tracing memory."""
+        self.active = False
+        if tracemalloc.is_tracing() and self._depth == 0:
+            tracemalloc.stop()
+
+    def measure(self, action, tab, fun, *args, **kwargs):
+        """
+        Call a function, recording its peak and retained memory under an
+        action name and tab name, and log where the retained memory was
+        allocated.
+        """
+        if not self.active or self._depth:
+            return fun(*args, **kwargs)
+
+        before = tracemalloc.take_snapshot()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self._depth += 1
+        try:
+            return fun(*args, **kwargs)
+        finally:
+            self._depth -= 1
+            after_size, peak = tracemalloc.get_traced_memory()
+            peak, retained = peak-size, after_size-size
+
+            record = self.stats.setdefault((action, tab), [0, 0, 0, 0])
+            record[0] += 1
+            record[1] = max(record[1], peak)
+            record[2] += retained
+            record[3] = retained
+
+            self.logger.info('Memory {} ({}): peak {}kB, retained {}kB.'.format(
+                action, tab, peak//1024, retained//1024))
+            for stat in tracemalloc.take_snapshot().compare_to(
+                    before, 'lineno')[:self.top]:
+                self.logger.info('Memory {} site: {}'.format(action, stat))
+            if not self.active:
+                self.stop()
+                # Tracing was turned off during the call.
+
+    def report(self):
+        """
+        Lines summarising each action, largest peak first.
+        """
+        lines = ['{:<28} {:<16} {:>6} {:>10} {:>12}'.format(
+            'Action', 'Tab', 'Calls', 'Peak kB', 'Retained kB')]
+        for (action, tab), (calls, peak, retained, last) in sorted(
+                self.stats.items(), key=lambda s: -s[1][1]):
+            lines.append('{:<28} {:<16} {:>6} {:>10} {:>12}'.format(
+                action, str(tab).strip(), calls, peak//1024, retained//1024))
+        return lines
+
+
+memory_usage = MemoryUsage()
+# Shared by every action measured with memory_profiler.
+
+
+def memory_profiler(fun):
+    """
+    Decorator to record the memory used by a method in memory_usage, when
+    memory tracing is on. The tab name of the instance, if it has one, is
+    recorded with it.
+
+    Parameters
+    ----------
+    fun : python function object
+        Function input.
+    """
+    @functools.wraps(fun)
+    def wrapper_memory_function(*args, **kwargs):
+        tab = getattr(args[0], 'tab_name', None) if args else None
+        return memory_usage.measure(fun.__name__, tab, fun, *args, **kwargs)
+    return wrapper_memory_function
@@ -0,0 +1,261 @@
+"""
+Loading spaCy pipelines on demand, choosing one for each task.
+"""
+
+import logging
+import os
+import time
+import log
+import startup
+import vector_store as vs
+
+
+class ModelManager(object):
+    """
+    Chooses and loads spaCy pipelines per task, and unloads them after
+    they have been idle.
+
+    Tagging, parsing and entities use the first installed pipeline of the
+    'tagging' tier (the small model by default), except that short texts
+    use any tagging pipeline already loaded rather than wait for another
+    to load. Vectors are read from the memory-mapped table exported from
+    the 'vectors' tier (see vector_store), so the vector model is only
+    loaded to export the table the first time.
+
+    Calling the manager parses a text, and make_doc and vocab work as on a
+    pipeline, so it can be passed wherever a spaCy model is expected.
+
+    Public attributes
+    -----------------
+    tiers : dict
+        Task -> pipeline names, in order of preference.
+    small_document : int
+        Texts with fewer characters than this use whichever tagging
+        pipeline is already loaded.
+    idle_unload : float
+        Seconds without use before a pipeline is unloaded.
+    loaded : dict
+        Pipeline name -> loaded spaCy Language object.
+    costs : dict
+        Pipeline name -> [load seconds, size in bytes, seconds per 1000
+        characters parsed].
+    choices : dict
+        Task -> (pipeline name, reason) of the latest choice.
+
+    Class methods
+    -----------------
+    pipeline
+        Get a loaded pipeline for a task.
+    vector_store
+        Get the shared vector table.
+    unload_idle
+        Unload pipelines that have not been used recently.
+    unload
+        Unload every pipeline.
+    report
+        Lines describing the loaded pipelines and the choices made.
+
+    """
+
+    def __init__(self, tiers=None, small_document=2000, idle_unload=600):
+        self.tiers = tiers or {'tagging': ['en_core_web_sm', 'en_core_web_md'],
+                               'vectors': ['en_core_web_md',
+                                           'en_core_web_lg']}
+        self.small_document = small_document
+        self.idle_unload = idle_unload
+
+        self.loaded = {}
+        self.last_used = {}
+        self.costs = {}
+        self.choices = {}
+        self.unavailable = set()
+        # Pipelines that failed to load (e.g. not installed).
+        self._store = None
+        self.logger = logging.getLogger("debug-tracking")
+
+    def _load(self, name):
+        if name not in self.loaded:
+            start = time.time()
+            self.loaded[name] = startup.spacy().load(name)
+            nlp = self.loaded[name]
+
+            size = nlp.vocab.vectors.data.nbytes
+            path = getattr(nlp, 'path', None)
+            if path is not None:
+                size = max(size, sum(os.path.getsize(os.path.join(d, f))
+                                     for d, ds, fs in os.walk(str(path))
+                                     for f in fs))
+            # Size on disk, as an estimate of the memory used.
+            self.costs[name] = [time.time()-start, size, None]
+            self.logger.info('Model {} loaded in {:.2f}s, about {}MB.'.format(
+                name, self.costs[name][0], size//2**20))
+
+        self.last_used[name] = time.time()
+        return self.loaded[name]
+
+    def _choose(self, task, name, reason):
+        if self.choices.get(task, (None,))[0] != name:
+            self.logger.info('Model for {}: {} ({}).'.format(task, name,
+                                                             reason))
+        self.choices[task] = (name, reason)
+
+    def pipeline(self, task='tagging', size=None):
+        """
+        Get a loaded pipeline for a task.
+
+        Parameters
+        -----------
+        task : str
+            'tagging' or 'vectors'.
+        size : int
+            Number of characters to be processed, if known.
+
+        Raises
+        ------
+        OSError
+            If no pipeline of the tier can be loaded.
+        """
+        names = self.tiers[task]
+
+        if task == 'tagging' and size is not None and (
+                size < self.small_document):
+            for name in self.tiers['tagging']+self.tiers['vectors']:
+                if name in self.loaded:
+                    self._choose(task, name, 'already loaded, short text')
+                    return self._load(name)
+
+        for name in names:
+            if name in self.unavailable:
+                continue
+            try:
+                nlp = self._load(name)
+            except OSError:
+                self.unavailable.add(name)
+                self.logger.info('Model {} is not installed.'.format(name))
+                continue
+            self._choose(task, name, 'first installed of {}'.format(
+                ', '.join(names)))
+            return nlp
+
+        raise OSError('No installed model for {}: {}'.format(task, names))
+
+    def __call__(self, text):
+        """
+        Parse a text with the tagging pipeline, recording its speed.
+        """
+        nlp = self.pipeline('tagging', len(text))
+        start = time.time()
+        doc = nlp(text)
+        if len(text) > 100:
+            name = self.choices['tagging'][0]
+            rate = (time.time()-start)*1000/len(text)
+            previous = self.costs[name][2]
+            self.costs[name][2] = rate if previous is None else (
+                0.8*previous+0.2*rate)
+            # Smoothed seconds per 1000 characters.
+        return doc
+
+    def make_doc(self, text):
+        """
+        Tokenise a text without running the pipeline.
+        """
+        nlp = next(iter(self.loaded.values()), None) or self.pipeline()
+        return nlp.make_doc(text)
+
+    @property
+    def vocab(self):
+        """
+        Vocabulary of a loaded pipeline (string hashes are the same in
+        every pipeline).
+        """
+        return (next(iter(self.loaded.values()), None) or
+                self.pipeline()).vocab
+
+    @log.log_function
+    def vector_store(self):
+        """
+        Get the shared vector table of the vectors tier, loading the
+        vector model only if the table has not been exported yet.
+
+        Returns
+        -------
+        store : VectorStore object
+            Vector table, or None if no vector model is installed.
+        """
+        if self._store is not None:
+            return self._store
+
+        util = startup.spacy().util
+        for name in self.tiers['vectors']:
+            if name in self.unavailable:
+                continue
+            try:
+                meta = util.get_model_meta(util.get_package_path(name))
+            except Exception:
+                self.unavailable.add(name)
+                continue
+            self._store = vs.open_store(vs.store_path(meta))
+            if self._store is not None:
+                self._choose('vectors', name,
+                             'memory-mapped table, model not loaded')
+                return self._store
+
+        try:
+            nlp = self.pipeline('vectors')
+        except OSError:
+            return None
+        self._choose('vectors', self.choices['vectors'][0],
+                     'model loaded to export its table')
+        self._store = vs.shared_store(nlp)
+        return self._store
+
+    @log.log_function
+    def unload_idle(self):
+        """
+        Unload pipelines that have not been used for idle_unload seconds.
+
+        Returns
+        -------
+        names : list
+            Pipelines unloaded.
+        """
+        now = time.time()
+        names = [n for n in self.loaded
+                 if now-self.last_used[n] > self.idle_unload]
+        for name in names:
+            del self.loaded[name]
+            self.logger.info('Model {} unloaded after {:.0f}s idle.'.format(
+                name, now-self.last_used[name]))
+        return names
+
+    @log.log_function
+    def unload(self):
+        """
+        Unload every pipeline (e.g. once a shared server takes over).
+
+        Returns
+        -------
+        names : list
+            Pipelines unloaded.
+        """
+        names = list(self.loaded)
+        self.loaded.clear()
+        for name in names:
+            self.logger.info('Model {} unloaded.'.format(name))
+        return names
+
+    def report(self):
+        """
+        Lines describing each pipeline used and the choice for each task.
+        """
+        lines = ['{:<18} {:>7} {:>9} {:>10} {:>12}'.format(
+            'Model', 'Loaded', 'Load s', 'Size MB', 'ms/1k chars')]
+        for name, (load, size, rate) in sorted(self.costs.items()):
+            lines.append('{:<18} {:>7} {:>9.2f} {:>10} {:>12}'.format(
+                name, 'yes' if name in self.loaded else 'no', load,
+                size//2**20, '-' if rate is None else
+                '{:.1f}'.format(rate*1000)))
+        lines.append('')
+        for task, (name, reason) in sorted(self.choices.items()):
+            lines.append('{}: {} ({})'.format(task, name, reason))
+        return lines
@@ -0,0 +1,115 @@
+"""
+Detection of excess adjectives and adverbs.
+"""
+
+from itertools import accumulate
+import highlight_dictionary as hd
+
+modifier_tags = set(t for t in hd.highlight_nltk if t[:2] in ('JJ', 'RB'))
+# Adjective and adverb tags.
+keep_words = {'not', "n't", 'never', 'no', 'only', 'also', 'too', 'so',
+              'more', 'most', 'less', 'least'}
+# Modifiers that change meaning or grammar when removed.
+
+
+def modifier_mask(words, tags):
+    """
+    True for each token that is a removable adjective or adverb.
+    """
+    return [t in modifier_tags and w.lower() not in keep_words
+            for w, t in zip(words, tags)]
+
+
+def whitespace_joined(text, offsets):
+    """
+    True for each token separated from the one before it by whitespace
+    only (so not by punctuation such as a comma or full stop).
+    """
+    return [i > 0 and not text[offsets[i-1][1]:s].strip()
+            for i, (s, e) in enumerate(offsets)]
+
+
+def stacked_modifiers(mask, min_run=2, joined=None):
+    """
+    Runs of consecutive modifiers (e.g. 'very big red').
+
+    Parameters
+    ----------
+    mask : list
+        Output of modifier_mask.
+    min_run : int
+        Shortest run to report.
+    joined : list
+        Output of whitespace_joined, so that runs stop at punctuation
+        ('big, red' or 'quickly. Bright' are not stacked). Without it,
+        only the mask is used.
+
+    Returns
+    -------
+    runs : list
+        (first token, last token + 1) of each run.
+    """
+    runs = []
+    start = None
+    for i, m in enumerate(mask + [False]):
+        if start is not None and not (m and (joined is None or joined[i])):
+            if i-start >= min_run:
+                runs.append((start, i))
+            start = None
+        if m and start is None:
+            start = i
+
+    return runs
+
+
+def dense_passages(mask, window=20, threshold=0.25):
+    """
+    Passages where modifiers make up more than a fraction of the tokens in
+    a rolling window.
+
+    Parameters
+    ----------
+    mask : list
+        Output of modifier_mask.
+    window : int
+        Number of tokens in the rolling window.
+    threshold : float
+        Fraction of modifiers above which a window is too dense.
+
+    Returns
+    -------
+    passages : list
+        (first token, last token + 1) of each passage, with overlapping
+        dense windows merged.
+    """
+    n = len(mask)
+    if n == 0:
+        return []
+    window = min(window, n)
+
+    counts = [0] + list(accumulate(mask))
+    # counts[i] is the number of modifiers in the first i tokens.
+    limit = threshold*window
+
+    passages = []
+    for i in range(n-window+1):
+        if counts[i+window]-counts[i] > limit:
+            if passages and passages[-1][1] >= i:
+                passages[-1] = (passages[-1][0], i+window)
+            else:
+                passages.append((i, i+window))
+
+    return passages
+
+
+def deletion_suggestions(runs):
+    """
+    Tokens to delete so each stacked run keeps only its last modifier
+    (usually the one closest to the noun).
+
+    Returns
+    -------
+    tokens : list
+        Index of each token to delete.
+    """
+    return [i for start, end in runs for i in range(start, end-1)]
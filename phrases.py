@@ -0,0 +1,195 @@
+"""
+Matching lists of phrases (e.g. clichés) against the words of a text.
+"""
+
+import collections
+import hashlib
+import os
+import pickle
+import logging
+import log
+
+automaton_version = 1
+# Increase when the layout of a compiled automaton changes.
+
+
+def default_cache_dir():
+    """
+    Directory of compiled phrase lists (~/.clay/phrases).
+    """
+    return os.path.join(os.path.expanduser('~'), '.clay', 'phrases')
+
+
+def read_phrases(paths):
+    """
+    Read phrase files, one phrase per line. Blank lines and lines starting
+    with '#' are skipped.
+
+    Returns
+    -------
+    phrases : list
+        Distinct phrases, in the order first read.
+    """
+    phrases = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    phrases.setdefault(line, None)
+    return list(phrases)
+
+
+class PhraseAutomaton(object):
+    """
+    Aho-Corasick automaton over words, finding every occurrence of every
+    phrase in one pass over a text.
+
+    Words are numbered, so a word that is in no phrase sends the match
+    straight back to the root without any dictionary lookups in the trie.
+
+    Public attributes
+    -----------------
+    phrases : list
+        Phrase strings.
+    lengths : list
+        Number of words in each phrase.
+    vocab : dict
+        Lower case word -> word ID.
+    goto : list
+        Word ID -> next state, for each state of the trie.
+    fail : list
+        State to fall back to when a word has no transition.
+    out : list
+        Phrases (by position in phrases) ending at each state.
+
+    Class methods
+    -----------------
+    match
+        Find the phrases in a list of words.
+
+    """
+
+    def __init__(self, phrases, tokenise):
+        self.phrases = []
+        self.lengths = []
+        self.vocab = {}
+        self.goto = [{}]
+        out = [[]]
+
+        for phrase in phrases:
+            words = [w.lower() for w in tokenise(phrase)]
+            if not words:
+                continue
+            state = 0
+            for w in words:
+                n = self.vocab.setdefault(w, len(self.vocab))
+                if n not in self.goto[state]:
+                    self.goto[state][n] = len(self.goto)
+                    self.goto.append({})
+                    out.append([])
+                state = self.goto[state][n]
+            out[state].append(len(self.phrases))
+            self.phrases.append(phrase)
+            self.lengths.append(len(words))
+
+        self.fail = [0]*len(self.goto)
+        queue = collections.deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for n, child in self.goto[state].items():
+                queue.append(child)
+                back = self.fail[state]
+                while back and n not in self.goto[back]:
+                    back = self.fail[back]
+                self.fail[child] = self.goto[back].get(n, 0)
+                out[child].extend(out[self.fail[child]])
+                # Breadth first, so the fallback's outputs are complete.
+        self.out = [tuple(o) for o in out]
+
+    def match(self, words):
+        """
+        Find every occurrence of the phrases in a list of words.
+
+        Parameters
+        ----------
+        words : list
+            Words of the text, tokenised as the phrases were.
+
+        Returns
+        -------
+        matches : list
+            (first word, last word, phrase) positions of each match.
+        """
+        vocab, goto, fail, out = self.vocab, self.goto, self.fail, self.out
+        matches = []
+        state = 0
+        for i, w in enumerate(words):
+            n = vocab.get(w.lower())
+            if n is None:
+                state = 0
+                continue
+            while state and n not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(n, 0)
+            for p in out[state]:
+                matches.append((i-self.lengths[p]+1, i, p))
+        return matches
+
+
+def cache_key(paths):
+    """
+    Key of the compiled automaton for a set of phrase files, changing when
+    any file is modified.
+    """
+    digest = hashlib.sha1()
+    for path in sorted(os.path.abspath(p) for p in paths):
+        stat = os.stat(path)
+        digest.update('{}\0{}\0{}\n'.format(path, stat.st_size,
+                                            stat.st_mtime_ns).encode('utf-8'))
+    return digest.hexdigest()
+
+
+@log.log_function
+def load_automaton(paths, tokenise, cache_dir=None):
+    """
+    Get the automaton for a set of phrase files, from the compiled cache
+    if the files have not changed since it was built.
+
+    Parameters
+    ----------
+    paths : list
+        Phrase files.
+    tokenise : function
+        Splits a phrase into words, as the texts to match are split.
+    cache_dir : str
+        Directory of compiled automata (default ~/.clay/phrases).
+
+    Returns
+    -------
+    automaton : PhraseAutomaton object
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    path = os.path.join(cache_dir, cache_key(paths)+'.pkl')
+
+    try:
+        with open(path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get('version') == automaton_version:
+            return cached['automaton']
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.getLogger("debug-tracking").exception(
+            'Compiled phrase list could not be read: {}'.format(e))
+
+    automaton = PhraseAutomaton(read_phrases(paths), tokenise)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp = path+'.tmp'
+    with open(temp, 'wb') as f:
+        pickle.dump({'version': automaton_version, 'automaton': automaton},
+                    f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp, path)
+
+    return automaton
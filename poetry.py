@@ -0,0 +1,271 @@
+"""
+Syllable, meter and rhyme analysis for poetry.
+"""
+
+import mmap
+import os
+import re
+import struct
+import zlib
+from array import array
+import log
+import startup
+
+_magic = b'CLAYPRN1'
+# Eight bytes, so the arrays after the header stay 4-byte aligned.
+_word_pattern = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_vowel_groups = re.compile(r'[aeiouy]+')
+
+_open_tables = {}
+
+
+def rhyme_part(phones):
+    """
+    Phones from the last stressed vowel to the end of a word (e.g. 'AE1 T'
+    for 'cat'), which rhyming words share.
+    """
+    last = None
+    for i, p in enumerate(phones):
+        if p[-1] in '12':
+            last = i
+    if last is None:
+        # No stressed vowel, so use the last vowel.
+        for i, p in enumerate(phones):
+            if p[-1].isdigit():
+                last = i
+    if last is None:
+        return ' '.join(phones)
+
+    return ' '.join([p.rstrip('012') for p in phones[last:last+1]] +
+                    phones[last+1:])
+
+
+@log.log_function
+def compile_table(entries, path):
+    """
+    Compile a pronunciation dictionary into a compact binary table.
+
+    The table holds the sorted words, the first pronunciation of each word
+    and a CRC32 hash of each word's rhyme part, in arrays that can be read
+    directly from a memory map.
+
+    Parameters
+    ----------
+    entries : dict
+        Word -> list of pronunciations, each a list of ARPAbet phones (the
+        format of nltk.corpus.cmudict.dict()).
+    path : str
+        File to write.
+    """
+    words = sorted(w.lower() for w in entries)
+    word_blob, phone_blob = bytearray(), bytearray()
+    word_offsets, phone_offsets = array('I', [0]), array('I', [0])
+    rhymes = array('I')
+
+    for w in words:
+        phones = entries[w][0]
+        word_blob += w.encode('utf-8')
+        word_offsets.append(len(word_blob))
+        phone_blob += ' '.join(phones).encode('ascii')
+        phone_offsets.append(len(phone_blob))
+        rhymes.append(zlib.crc32(rhyme_part(phones).encode('ascii')))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path+'.tmp', 'wb') as f:
+        f.write(_magic)
+        f.write(struct.pack('<III', len(words), len(word_blob),
+                            len(phone_blob)))
+        for part in (word_offsets, phone_offsets, rhymes):
+            f.write(part.tobytes())
+        f.write(word_blob)
+        f.write(phone_blob)
+    os.replace(path+'.tmp', path)
+
+
+class PronunciationTable(object):
+    """
+    Memory-mapped pronunciation table made by compile_table.
+
+    Words are found by binary search over the mapped, sorted word list, so
+    opening the table reads nothing and lookups touch only a few pages.
+
+    Public attributes
+    -----------------
+    path : str
+        Location of the compiled table.
+    count : int
+        Number of words in the table.
+
+    Class methods
+    -----------------
+    phones
+        ARPAbet phones of a word.
+    syllables
+        Number of syllables in a word.
+    stress
+        Stress pattern of a word.
+    rhyme_key
+        Hash shared by words that rhyme.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        start = len(_magic)
+        if self._map[:start] != _magic:
+            raise ValueError('{} is not a pronunciation table'.format(path))
+        self.count, word_len, phone_len = struct.unpack_from('<III',
+                                                             self._map, start)
+        start += 12
+
+        n = (self.count+1)*4
+        view = memoryview(self._map)
+        self._word_offsets = view[start:start+n].cast('I')
+        self._phone_offsets = view[start+n:start+2*n].cast('I')
+        self._rhymes = view[start+2*n:start+2*n+self.count*4].cast('I')
+        start += 2*n + self.count*4
+        self._words = start
+        self._phones = start+word_len
+
+        self._cache = {}
+        # Row of each word already looked up (None if missing).
+
+    def _word(self, row):
+        s, e = self._word_offsets[row], self._word_offsets[row+1]
+        return self._map[self._words+s:self._words+e]
+
+    def _row(self, word):
+        if word in self._cache:
+            return self._cache[word]
+
+        key = word.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            mid = (low+high)//2
+            if self._word(mid) < key:
+                low = mid+1
+            else:
+                high = mid
+        row = low if low < self.count and self._word(low) == key else None
+
+        self._cache[word] = row
+        return row
+
+    def phones(self, word):
+        """
+        ARPAbet phones of a word, or None if it is not in the table.
+        """
+        row = self._row(word.lower())
+        if row is None:
+            return None
+        s, e = self._phone_offsets[row], self._phone_offsets[row+1]
+        return self._map[self._phones+s:self._phones+e].decode('ascii').split()
+
+    def syllables(self, word):
+        """
+        Number of syllables in a word, guessed from its spelling if it is
+        not in the table.
+        """
+        phones = self.phones(word)
+        if phones is None:
+            return max(1, len(_vowel_groups.findall(word.lower().rstrip('e'))))
+        return sum(p[-1].isdigit() for p in phones)
+
+    def stress(self, word):
+        """
+        Stress of each syllable of a word: '1' stressed, '0' unstressed,
+        '?' if the word is not in the table.
+        """
+        phones = self.phones(word)
+        if phones is None:
+            return '?'*self.syllables(word)
+        return ''.join('0' if p[-1] == '0' else '1'
+                       for p in phones if p[-1].isdigit())
+
+    def rhyme_key(self, word):
+        """
+        Hash of the rhyme part of a word. Words with equal keys rhyme.
+        Words not in the table use their last vowel group and what follows.
+        """
+        row = self._row(word.lower())
+        if row is None:
+            found = list(_vowel_groups.finditer(word.lower()))
+            ending = word.lower()[found[-1].start():] if found else word
+            # Set the top bit so spelt endings don't collide with phones.
+            return zlib.crc32(ending.encode('utf-8')) | 1 << 31
+        return self._rhymes[row]
+
+
+@log.log_function
+def shared_table(path=None):
+    """
+    Open the pronunciation table, compiling it from NLTK's CMU
+    Pronouncing Dictionary the first time.
+
+    Parameters
+    ----------
+    path : str
+        Location of the table (default ~/.clay/cmudict.bin).
+    """
+    if path is None:
+        path = os.path.join(os.path.expanduser('~'), '.clay', 'cmudict.bin')
+
+    if path not in _open_tables:
+        if not os.path.exists(path):
+            corpus = startup.lazy_module('nltk.corpus')
+            compile_table(corpus.cmudict.dict(), path)
+        _open_tables[path] = PronunciationTable(path)
+
+    return _open_tables[path]
+
+
+def analyse_lines(text, table):
+    """
+    Syllable count, stress pattern and rhyme of each line of a poem.
+
+    Parameters
+    ----------
+    text : str
+        Poem, one verse line per line.
+    table : PronunciationTable object
+        Pronunciations to use.
+
+    Returns
+    -------
+    lines : list
+        (line number, syllables, stress pattern, end word start column,
+        end word end column, rhyme letter) for each line with words. Lines
+        sharing a rhyme letter rhyme with each other.
+    """
+    lines = []
+    letters = {}
+
+    for number, line in enumerate(text.split('\n')):
+        words = list(_word_pattern.finditer(line))
+        if not words:
+            continue
+
+        syllables = sum(table.syllables(w.group()) for w in words)
+        stress = ''.join(table.stress(w.group()) for w in words)
+
+        last = words[-1]
+        key = table.rhyme_key(last.group())
+        if key not in letters:
+            letters[key] = _rhyme_letter(len(letters))
+        lines.append((number+1, syllables, stress, last.start(), last.end(),
+                      letters[key]))
+
+    return lines
+
+
+def _rhyme_letter(n):
+    """Letter for the nth rhyme of a poem (A-Z, then AA, AB...)."""
+    letter = ''
+    n += 1
+    while n:
+        n, r = divmod(n-1, 26)
+        letter = chr(65+r) + letter
+    return letter
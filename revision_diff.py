@@ -0,0 +1,236 @@
+"""
+Token-level differences between two versions of a text.
+"""
+
+from array import array
+from bisect import bisect_left
+
+
+def surface_tokens(doc):
+    """
+    Word hash and character offsets of every token of a spaCy Doc except
+    whitespace (punctuation is kept, as changes to it are revisions too).
+
+    Returns
+    -------
+    keys : list
+        spaCy string hash (orth) of each token.
+    offsets : list
+        (start, end) character offsets of each token.
+    """
+    tokens = [t for t in doc if not t.is_space]
+    return ([t.orth for t in tokens],
+            [(t.idx, t.idx+len(t.text)) for t in tokens])
+
+
+def token_ids(keys, numbers):
+    """
+    Integer ID for each token key, numbered through a dictionary shared by
+    the texts being compared.
+    """
+    return array('i', [numbers.setdefault(k, len(numbers)) for k in keys])
+
+
+def _unique_anchors(a, a0, a1, b, b0, b1):
+    # Tokens occurring exactly once in both ranges, longest run in order
+    # (patience diff).
+    counts = {}
+    for i in range(a0, a1):
+        n = a[i]
+        counts[n] = i if n not in counts else -1
+    in_b = {}
+    for j in range(b0, b1):
+        n = b[j]
+        if counts.get(n, -1) >= 0:
+            in_b[n] = j if n not in in_b else -1
+
+    pairs = sorted((counts[n], j) for n, j in in_b.items() if j >= 0)
+    if not pairs:
+        return []
+
+    tails, tail_at, back = [], [], [None]*len(pairs)
+    for p, (i, j) in enumerate(pairs):
+        t = bisect_left(tails, j)
+        back[p] = tail_at[t-1] if t else None
+        if t == len(tails):
+            tails.append(j)
+            tail_at.append(p)
+        else:
+            tails[t] = j
+            tail_at[t] = p
+    # Patience sorting for the longest increasing run of b positions.
+
+    anchors, p = [], tail_at[-1]
+    while p is not None:
+        anchors.append(pairs[p])
+        p = back[p]
+    return anchors[::-1]
+
+
+def _furthest(prev, k, d, n, m):
+    # Furthest x on diagonal k after d edits, and whether it was reached by
+    # an insertion (from k+1) rather than a deletion (from k-1).
+    down = prev[(k+d)//2] if k < d else -1
+    if down >= 0 and down-k > m:
+        down = -1
+    right = prev[(k+d-2)//2]+1 if k > -d else -1
+    if right <= 0 or right > n:
+        right = -1
+    if down >= right:
+        return down, True
+    return right, False
+
+
+def _myers(a, a0, a1, b, b0, b1, max_cost):
+    # Greedy O(ND) Myers diff of a[a0:a1] and b[b0:b1]. Returns the equal
+    # blocks, or None if more than max_cost edits are needed.
+    n, m = a1-a0, b1-b0
+    trace = []
+    for d in range(min(n+m, max_cost)+1):
+        prev = trace[-1] if d else None
+        cur = [-1]*(d+1)
+        for k in range(-d, d+1, 2):
+            x = _furthest(prev, k, d, n, m)[0] if d else 0
+            if x < 0:
+                continue
+            y = x-k
+            while x < n and y < m and a[a0+x] == b[b0+y]:
+                x += 1
+                y += 1
+            cur[(k+d)//2] = x
+            if x >= n and y >= m:
+                trace.append(cur)
+                return _backtrack(trace, n, m, a0, b0)
+        trace.append(cur)
+    return None
+
+
+def _backtrack(trace, n, m, a0, b0):
+    blocks = []
+    x, y = n, m
+    for d in range(len(trace)-1, -1, -1):
+        k = x-y
+        if d:
+            start, inserted = _furthest(trace[d-1], k, d, n, m)
+        else:
+            start, inserted = 0, False
+        if x > start:
+            blocks.append((a0+start, b0+start-k, x-start))
+        if not d:
+            break
+        x, y = (start, start-k-1) if inserted else (start-1, start-k)
+    return blocks[::-1]
+
+
+def matching_blocks(a, b, max_cost=1000):
+    """
+    Runs of equal tokens shared by two ID arrays, in order.
+
+    Common prefixes and suffixes are stripped, the remainder is split at
+    tokens that occur once in each version (patience diff), and the gaps
+    left are compared with Myers' algorithm. A gap needing more than
+    max_cost edits is reported as replaced outright.
+
+    Returns
+    -------
+    blocks : list
+        (start in a, start in b, length) of each run.
+    """
+    blocks = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+
+        start = a0
+        while a0 < a1 and b0 < b1 and a[a0] == b[b0]:
+            a0 += 1
+            b0 += 1
+        if a0 > start:
+            blocks.append((start, b0-(a0-start), a0-start))
+        end = a1
+        while a1 > a0 and b1 > b0 and a[a1-1] == b[b1-1]:
+            a1 -= 1
+            b1 -= 1
+        if end > a1:
+            blocks.append((a1, b1, end-a1))
+        if a0 == a1 or b0 == b1:
+            continue
+
+        anchors = _unique_anchors(a, a0, a1, b, b0, b1)
+        if anchors:
+            for i, j in anchors:
+                stack.append((a0, i, b0, j))
+                blocks.append((i, j, 1))
+                a0, b0 = i+1, j+1
+            stack.append((a0, a1, b0, b1))
+        else:
+            blocks.extend(_myers(a, a0, a1, b, b0, b1, max_cost) or [])
+
+    merged = []
+    for i, j, size in sorted(blocks):
+        if merged and merged[-1][0]+merged[-1][2] == i and (
+                merged[-1][1]+merged[-1][2] == j):
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2]+size)
+        else:
+            merged.append((i, j, size))
+    return merged
+
+
+def opcodes(blocks, n, m):
+    """
+    Changes between two token arrays of lengths n and m, from their
+    matching blocks.
+
+    Returns
+    -------
+    changes : list
+        (tag, i1, i2, j1, j2) for each change, where tag is 'insert',
+        'delete' or 'replace' and a[i1:i2] became b[j1:j2].
+    """
+    changes = []
+    i = j = 0
+    for bi, bj, size in blocks+[(n, m, 0)]:
+        if i < bi or j < bj:
+            tag = ('replace' if i < bi and j < bj else
+                   'delete' if i < bi else 'insert')
+            changes.append((tag, i, bi, j, bj))
+        i, j = bi+size, bj+size
+    return changes
+
+
+def diff_spans(changes, offsets, length):
+    """
+    Character spans in the newer text to highlight for each kind of change.
+
+    Insertions and replacements cover the new tokens. Deletions are marked
+    on the space where the old tokens were, or on the next token if there
+    is no space.
+
+    Parameters
+    ----------
+    changes : list
+        Output of opcodes.
+    offsets : list
+        (start, end) offsets of the tokens of the newer text.
+    length : int
+        Length of the newer text.
+
+    Returns
+    -------
+    spans : dict
+        'insert', 'replace' and 'delete' -> list of (start, end) spans.
+    """
+    spans = {'insert': [], 'replace': [], 'delete': []}
+    for tag, i1, i2, j1, j2 in changes:
+        if j2 > j1:
+            spans[tag].append((offsets[j1][0], offsets[j2-1][1]))
+            continue
+        start = offsets[j1-1][1] if j1 else 0
+        end = offsets[j1][0] if j1 < len(offsets) else length
+        if end == start and j1 < len(offsets):
+            end = offsets[j1][1]
+        elif end == start and j1:
+            start = offsets[j1-1][0]
+        if end > start:
+            spans['delete'].append((start, end))
+    return spans
@@ -0,0 +1,76 @@
+"""
+Saving and restoring the open tabs between launches.
+"""
+
+import os
+import pickle
+import logging
+import log
+
+session_version = 1
+# Increase when the layout of a snapshot changes.
+
+
+def default_path():
+    """
+    Location of the session snapshot (~/.clay/session.pkl).
+    """
+    return os.path.join(os.path.expanduser('~'), '.clay', 'session.pkl')
+
+
+@log.log_function
+def save_session(path, tabs, selected):
+    """
+    Write a session snapshot.
+
+    Tab states are stored as the compressed bytes kept by TabStore, so tabs
+    that are already offloaded are saved without unpacking them, and
+    restored tabs can be put back into a TabStore without unpacking either.
+    The file is replaced atomically, so a crash while saving leaves the
+    previous snapshot intact.
+
+    Parameters
+    ----------
+    path : str
+        File to write.
+    tabs : list
+        (title, file path, compressed state) of each tab, in order. The
+        state may be None for tabs that have never held any text.
+    selected : int
+        Position of the selected tab.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    snapshot = {'version': session_version,
+                'selected': selected,
+                'tabs': tabs}
+
+    temp = path+'.tmp'
+    with open(temp, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp, path)
+
+
+def load_session(path):
+    """
+    Read a session snapshot.
+
+    Returns
+    -------
+    tabs, selected : list, int
+        As passed to save_session, or ([], 0) if there is no readable
+        snapshot of the current version.
+    """
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        return [], 0
+    except Exception as e:
+        logging.getLogger("debug-tracking").exception(
+            'Session snapshot could not be read: {}'.format(e))
+        return [], 0
+
+    if snapshot.get('version') != session_version:
+        return [], 0
+
+    return snapshot['tabs'], snapshot['selected']
@@ -0,0 +1,199 @@
+"""
+Paragraph embedding index for similarity across documents.
+"""
+
+import numpy as np
+import log
+
+
+class ParagraphIndex(object):
+    """
+    Normalised float32 matrix of paragraph vectors from many documents,
+    for finding the paragraphs nearest in content to a query.
+
+    Rows are added and removed one document (source) at a time. Removed
+    rows are reused by later additions, so the matrix only grows when it
+    is full.
+
+    Public attributes
+    -----------------
+    dim : int
+        Length of the paragraph vectors.
+    matrix : numpy array
+        Unit length paragraph vectors, one per row.
+    active : numpy array
+        True for rows holding a paragraph.
+    labels : list
+        (source, paragraph number, text) for each row.
+
+    Class methods
+    -----------------
+    add
+        Add the paragraphs of a document.
+    remove
+        Remove the paragraphs of a document.
+    query
+        Find the k paragraphs most similar to a vector.
+
+    """
+
+    def __init__(self, dim, capacity=1024):
+        self.dim = dim
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.labels = [None]*capacity
+
+        self._free = []
+        # Rows freed by remove, to reuse.
+        self._used = 0
+        # Rows below this have been used at least once.
+        self._rows = {}
+        # Source -> rows of its paragraphs.
+
+    def __contains__(self, source):
+        return source in self._rows
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def _grow(self, needed):
+        capacity = len(self.matrix)
+        while capacity < needed:
+            capacity *= 2
+        extra = capacity-len(self.matrix)
+
+        self.matrix = np.vstack([self.matrix,
+                                 np.zeros((extra, self.dim),
+                                          dtype=np.float32)])
+        self.active = np.concatenate([self.active,
+                                      np.zeros(extra, dtype=bool)])
+        self.labels.extend([None]*extra)
+
+    def add(self, source, vectors, labels):
+        """
+        Add the paragraphs of a document, replacing any already indexed.
+
+        Parameters
+        ----------
+        source : str
+            Name of the document (e.g. tab name or file path).
+        vectors : numpy array
+            One vector per paragraph.
+        labels : list
+            (paragraph number, text) for each vector.
+        """
+        self.remove(source)
+
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        vectors = vectors/norms
+        # Normalise so a dot product is the cosine similarity.
+
+        reuse = self._free[:len(vectors)]
+        del self._free[:len(reuse)]
+        new = len(vectors)-len(reuse)
+        if self._used+new > len(self.matrix):
+            self._grow(self._used+new)
+        rows = np.array(reuse + list(range(self._used, self._used+new)),
+                        dtype=np.int64)
+        self._used += new
+
+        self.matrix[rows] = vectors
+        self.active[rows] = True
+        for row, (number, text) in zip(rows, labels):
+            self.labels[row] = (source, number, text)
+        self._rows[source] = rows
+
+    def remove(self, source):
+        """
+        Remove the paragraphs of a document.
+        """
+        rows = self._rows.pop(source, None)
+        if rows is None:
+            return
+
+        self.matrix[rows] = 0
+        self.active[rows] = False
+        for row in rows:
+            self.labels[row] = None
+        self._free.extend(rows.tolist())
+
+    def query(self, vector, k=10, exclude=None):
+        """
+        Find the paragraphs most similar to a vector.
+
+        Parameters
+        ----------
+        vector : numpy array
+            Query vector (e.g. the mean vector of a selection).
+        k : int
+            Number of paragraphs to return.
+        exclude : tuple
+            (source, paragraph number) to leave out (e.g. the query
+            paragraph itself).
+
+        Returns
+        -------
+        results : list
+            (similarity, source, paragraph number, text), most similar
+            first.
+        """
+        norm = np.linalg.norm(vector)
+        if norm == 0 or self._used == 0:
+            return []
+
+        sims = self.matrix[:self._used] @ (np.asarray(vector,
+                                                      dtype=np.float32)/norm)
+        sims[~self.active[:self._used]] = -np.inf
+
+        fetch = min(k+1, self._used)
+        # One extra, in case the excluded paragraph is among them.
+        top = np.argpartition(-sims, fetch-1)[:fetch]
+        top = top[np.argsort(-sims[top])]
+        # Partial sort, so only k rows are fully ordered.
+
+        results = []
+        for row in top:
+            if not self.active[row]:
+                continue
+            source, number, text = self.labels[row]
+            if exclude == (source, number):
+                continue
+            results.append((float(sims[row]), source, number, text))
+
+        return results[:k]
+
+
+@log.log_function
+def paragraph_vectors(nlp, store, text):
+    """
+    Mean word vector of each paragraph (non-empty line) of a text.
+
+    Parameters
+    ----------
+    nlp : spaCy Language object
+        Model used to tokenise the text.
+    store : VectorStore object
+        Shared word vector table.
+    text : str
+        Document text.
+
+    Returns
+    -------
+    vectors : numpy array
+        One vector per paragraph.
+    labels : list
+        (paragraph number, text) for each vector.
+    """
+    vectors, labels = [], []
+    for number, paragraph in enumerate(text.split('\n')):
+        if not paragraph.strip():
+            continue
+        vectors.append(store.doc_vector(nlp.make_doc(paragraph)))
+        labels.append((number+1, paragraph))
+
+    if not vectors:
+        return np.zeros((0, store.vectors.shape[1]), dtype=np.float32), []
+
+    return np.vstack(vectors), labels
@@ -0,0 +1,139 @@
+"""
+Deferred imports of heavy modules and import time profiling at launch.
+"""
+
+import builtins
+import logging
+import sys
+import time
+
+launch_time = time.perf_counter()
+# Time this module was first imported (the start of the launch).
+
+_modules = {}
+
+
+def lazy_module(name):
+    """
+    Import a module the first time it is needed.
+
+    Parameters
+    ----------
+    name : str
+        Full module name.
+
+    Returns
+    -------
+    module : python module object
+        The imported module.
+    """
+    if name not in _modules:
+        __import__(name)
+        # Use __import__ so ImportProfiler records the cost.
+        _modules[name] = sys.modules[name]
+    return _modules[name]
+
+
+def spacy():
+    """spaCy, imported on first use."""
+    return lazy_module('spacy')
+
+
+def textblob():
+    """TextBlob (and NLTK), imported on first use."""
+    return lazy_module('textblob')
+
+
+def matplotlib():
+    """Matplotlib, imported on first use."""
+    return lazy_module('matplotlib')
+
+
+class ImportProfiler(object):
+    """
+    Records the time spent importing each module, in the same way as
+    python -X importtime, and the time taken to reach launch milestones.
+
+    Public attributes
+    -----------------
+    records : list
+        (module name, self time, cumulative time, nesting depth) for each
+        import, with times in seconds.
+    marks : list
+        (label, seconds since launch) for each milestone.
+
+    Class methods
+    -----------------
+    start
+        Begin recording imports.
+    stop
+        Stop recording imports.
+    mark
+        Record the time since launch of a milestone.
+    report
+        Write the slowest imports and the milestones to the log.
+
+    """
+
+    def __init__(self):
+        self.records = []
+        self.marks = []
+        self.logger = logging.getLogger("debug-tracking")
+
+        self._original_import = None
+        self._stack = []
+        # Time spent in nested imports, for the import in progress.
+
+    def start(self):
+        """Begin recording imports."""
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def stop(self):
+        """Stop recording imports."""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, *args, **kwargs):
+        if name in sys.modules:
+            # Already imported, so nothing to time.
+            return self._original_import(name, *args, **kwargs)
+
+        self._stack.append(0.0)
+        begin = time.perf_counter()
+        try:
+            return self._original_import(name, *args, **kwargs)
+        finally:
+            cumulative = time.perf_counter()-begin
+            nested = self._stack.pop()
+            self.records.append((name, cumulative-nested, cumulative,
+                                 len(self._stack)))
+            if self._stack:
+                self._stack[-1] += cumulative
+
+    def mark(self, label):
+        """
+        Record the time since launch of a milestone (e.g. the splash
+        screen being shown).
+        """
+        self.marks.append((label, time.perf_counter()-launch_time))
+
+    def report(self, top=20):
+        """
+        Write the slowest imports and the launch milestones to the log.
+
+        Parameters
+        ----------
+        top : int
+            Number of imports to report, slowest first.
+        """
+        self.logger.info('import time: self [us] | cumulative | imported package')
+        for name, own, cumulative, depth in sorted(self.records,
+                                                   key=lambda r: -r[2])[:top]:
+            self.logger.info('import time: {:>9d} | {:>10d} | {}{}'.format(
+                int(own*1e6), int(cumulative*1e6), '  '*depth, name))
+
+        for label, elapsed in self.marks:
+            self.logger.info('Launch: {} after {:.0f}ms.'.format(label,
+                                                                  elapsed*1e3))
@@ -0,0 +1,143 @@
+"""
+Compressed storage for the contents of inactive tabs.
+"""
+
+import os
+import pickle
+import tempfile
+import zlib
+import log
+
+
+def pack(state):
+    """
+    Pickle and compress a tab state.
+    """
+    return zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def unpack(packed):
+    """
+    Inverse of pack.
+    """
+    return pickle.loads(zlib.decompress(packed))
+
+
+class TabStore(object):
+    """
+    Store for the text, tags and analysis state of offloaded tabs.
+
+    States are pickled and compressed. Once the compressed states held in
+    memory exceed memory_limit, further states are spilled to disk.
+
+    Public attributes
+    -----------------
+    memory_limit : int
+        Number of compressed bytes to hold in memory before spilling to disk.
+    spill_dir : str
+        Directory for states spilled to disk.
+    memory_used : int
+        Number of compressed bytes currently held in memory.
+
+    Class methods
+    -----------------
+    put
+        Compress and store the state of a tab.
+    get
+        Remove a tab state from the store and return it.
+    peek
+        Return a tab state without removing it from the store.
+    discard
+        Remove a tab state without returning it.
+    packed
+        Return the compressed state of a tab.
+    put_packed
+        Store a state that is already compressed.
+
+    """
+
+    def __init__(self, memory_limit=64*1024*1024, spill_dir=None):
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self.memory_used = 0
+
+        self._in_memory = {}
+        self._on_disk = {}
+        # Compressed states, keyed by tab name.
+
+    def __contains__(self, key):
+        return key in self._in_memory or key in self._on_disk
+
+    def __len__(self):
+        return len(self._in_memory) + len(self._on_disk)
+
+    @log.log_function
+    def put(self, key, state):
+        """
+        Compress and store the state of a tab.
+
+        Parameters
+        -----------
+        key : str
+            Name of the tab widget.
+        state : dict
+            Picklable state of the tab.
+        """
+        self.put_packed(key, pack(state))
+
+    def put_packed(self, key, packed):
+        """
+        Store a tab state already compressed by put (e.g. from a saved
+        session), without unpacking it.
+        """
+        self.discard(key)
+        # Replace any older copy of the same tab.
+
+        if self.memory_used + len(packed) <= self.memory_limit:
+            self._in_memory[key] = packed
+            self.memory_used += len(packed)
+        else:
+            # Out of memory budget, so spill to disk.
+            if self.spill_dir is None:
+                self.spill_dir = tempfile.mkdtemp(prefix='clay_tabs_')
+            fd, path = tempfile.mkstemp(suffix='.tab', dir=self.spill_dir)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(packed)
+            self._on_disk[key] = path
+
+    def packed(self, key):
+        """
+        Return the compressed state of a tab without removing it.
+        """
+        if key in self._in_memory:
+            return self._in_memory[key]
+        with open(self._on_disk[key], 'rb') as f:
+            return f.read()
+
+    def peek(self, key):
+        """
+        Return the state of a tab without removing it from the store.
+        """
+        return unpack(self.packed(key))
+
+    def get(self, key):
+        """
+        Remove the state of a tab from the store and return it.
+        """
+        state = self.peek(key)
+        self.discard(key)
+
+        return state
+
+    def discard(self, key):
+        """
+        Remove the state of a tab, if stored.
+        """
+        if key in self._in_memory:
+            self.memory_used -= len(self._in_memory.pop(key))
+        elif key in self._on_disk:
+            path = self._on_disk.pop(key)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
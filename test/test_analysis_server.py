@@ -0,0 +1,76 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import analysis_server as asv
+
+
+class ReportOnly(object):
+    def report(self):
+        return ['model a', 'model b']
+
+
+@unittest.skipUnless(asv.available(), 'Unix domain sockets not available')
+class TestAnalysisServer(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'analysis.sock')
+        self.server = asv.AnalysisServer(self.path, ReportOnly())
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_requests(self):
+        """Test framed requests, replies and errors over the socket."""
+        client = asv.connect(self.path)
+        self.assertEqual(client.request(asv.REPORT), b'model a\nmodel b')
+        self.assertIn('model b', client.report())
+        with self.assertRaises(RuntimeError):
+            client.request(99, 'unknown')
+        self.assertEqual(client.timings[asv.REPORT][0], 2)
+
+    def test_not_running(self):
+        """Test connecting without a server gives None, for a fallback."""
+        self.assertIsNone(asv.connect(self.path+'.missing'))
+
+    def test_one_server(self):
+        """Test a second server leaves a running server's socket alone."""
+        with self.assertRaises(OSError):
+            asv.AnalysisServer(self.path, ReportOnly())
+        self.assertIsNotNone(asv.connect(self.path))
+
+        lock = asv.lock_server(self.path)
+        self.assertIsNotNone(lock)
+        self.assertIsNone(asv.lock_server(self.path))
+        lock.close()
+
+    def test_remove_socket(self):
+        """Test only the server's own socket file is removed."""
+        os.remove(self.path)
+        open(self.path, 'w').close()
+        # Replaced, as by a newer server.
+        self.server.remove_socket()
+        self.assertTrue(os.path.exists(self.path))
+
+        os.remove(self.path)
+        stale = asv.AnalysisServer(self.path+'.2', ReportOnly())
+        stale.server_close()
+        replacement = asv.AnalysisServer(self.path+'.2', ReportOnly())
+        # A stale socket, with no server behind it, is replaced.
+        replacement.server_close()
+        replacement.remove_socket()
+        self.assertFalse(os.path.exists(self.path+'.2'))
+
+    def test_start_without_waiting(self):
+        """Test starting a server returns at once, for a later connect."""
+        missing = self.path+'.missing'
+        with mock.patch('analysis_server.start_server') as start:
+            self.assertIsNone(asv.connect(missing, start=True))
+        start.assert_called_once_with(missing)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import threading
+import unittest
+import analyzers as an
+
+
+class TestAnalyzers(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.registry = an.Registry()
+
+        @self.registry.product('words', requires=('text',))
+        def words(text):
+            self.calls.append('words')
+            return text.split()
+
+        @self.registry.product('lengths', requires=('words',))
+        def lengths(words):
+            self.calls.append('lengths')
+            return [len(w) for w in words]
+
+        @self.registry.analyzer('long', requires=('words', 'lengths'))
+        def long(words, lengths, minimum=4):
+            return [w for w, n in zip(words, lengths) if n >= minimum]
+
+        @self.registry.analyzer('count', requires=('words',))
+        def count(words):
+            return len(words)
+
+    def test_shared_products(self):
+        """Test each product is computed once for several analyzers."""
+        doc = an.DocumentAnalysis('the quick brown fox', None,
+                                  registry=self.registry)
+        results = doc.run('long', 'count')
+
+        self.assertEqual(results, {'long': ['quick', 'brown'], 'count': 4})
+        self.assertEqual(doc.run('long', long={'minimum': 5}),
+                         ['quick', 'brown'])
+        self.assertEqual(doc.run('long', long={'minimum': 6}), [])
+        self.assertEqual(sorted(self.calls), ['lengths', 'words'])
+
+    def test_threads(self):
+        """Test lone steps run in place and one pool serves every run."""
+        doc = an.DocumentAnalysis('a b', None, registry=self.registry)
+        self.registry.analyzer('thread', requires=('words',))(
+            lambda words: threading.current_thread())
+
+        self.assertIs(doc.run('thread'), threading.current_thread())
+        self.assertIsNone(doc._pool)
+        doc.run('long', 'count')
+        pool = doc._pool
+        doc.run('long', 'count', long={'minimum': 2})
+        self.assertIs(doc._pool, pool)
+
+        serial = an.DocumentAnalysis('a b', None, registry=self.registry,
+                                     workers=1)
+        serial.run('long', 'count', 'thread')
+        self.assertIsNone(serial._pool)
+
+    def test_levels(self):
+        """Test steps are ordered by dependency and cycles are found."""
+        levels = self.registry.levels(['long'])
+        self.assertEqual(levels, [['text'], ['words'], ['lengths'],
+                                  ['long']])
+
+        self.registry.product('a', requires=('b',))(lambda b: b)
+        self.registry.product('b', requires=('a',))(lambda a: a)
+        with self.assertRaises(ValueError):
+            self.registry.levels(['a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
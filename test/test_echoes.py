@@ -0,0 +1,35 @@
+import unittest
+import echoes as ec
+
+
+class TestEchoes(unittest.TestCase):
+    def setUp(self):
+        self.words = ['The', 'storm', 'broke', 'and', 'the', 'storms',
+                      'passed']
+        self.lemmas = ['the', 'storm', 'break', 'and', 'the', 'storm',
+                       'pass']
+        self.stops = [True, False, False, True, True, False, False]
+        self.offsets = [(0, 3), (4, 9), (10, 15), (16, 19), (20, 23),
+                        (24, 30), (31, 37)]
+
+    def test_lemma_ids(self):
+        """Test lemmas are numbered in order of first appearance."""
+        ids, vocabulary = ec.lemma_ids(self.lemmas)
+        self.assertEqual(list(ids), [0, 1, 2, 3, 0, 1, 4])
+        self.assertEqual(vocabulary, ['the', 'storm', 'break', 'and',
+                                      'pass'])
+
+    def test_find_echoes(self):
+        """Test only content words within the window are echoes."""
+        ids, vocabulary = ec.lemma_ids(self.lemmas)
+        mask = ec.content_mask(self.words, self.stops)
+
+        self.assertEqual(ec.find_echoes(ids, mask, window=4), [(1, 5)])
+        self.assertEqual(ec.find_echoes(ids, mask, window=3), [])
+        self.assertEqual(ec.echo_spans([(1, 5)], ids, self.offsets),
+                         {1: [(4, 9), (24, 30)]})
+        self.assertEqual(ec.find_echoes(ec.lemma_ids([])[0], []), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
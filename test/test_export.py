@@ -0,0 +1,66 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+import export as ex
+
+
+class TestExport(unittest.TestCase):
+    def test_segments(self):
+        """Test overlapping spans split the text into runs."""
+        text = 'The big red dog'
+        spans = {'pos-JJ': [(4, 7), (8, 11)], 'ner-X': [(8, 15)]}
+        runs = list(ex.segments(text, spans))
+        self.assertEqual(''.join(r for r, c in runs), text)
+        self.assertEqual(runs, [('The ', []), ('big', ['pos-JJ']),
+                                (' ', []), ('red', ['pos-JJ', 'ner-X']),
+                                (' dog', ['ner-X'])])
+
+    def test_html_rtf(self):
+        """Test text is escaped and highlights are coloured."""
+        text = 'a<b {c}\né'
+        spans = {'pos-NN': [(0, 3)]}
+        colours = {'pos-NN': 'red'}
+        html = ''.join(ex.html_chunks(text, spans, colours))
+        self.assertIn('<span class="pos-NN">a&lt;b</span>', html)
+        self.assertIn('.pos-NN { background: #ff0000; }', html)
+
+        rtf = ''.join(ex.rtf_chunks(text, spans, colours))
+        self.assertIn('\\red255;\\green0;\\blue0;', rtf)
+        self.assertIn('{\\chcbpat1\\cb1 a<b}', rtf)
+        self.assertIn('\\{c\\}\\par\n\\u233?', rtf)
+
+    def test_rtf_braces(self):
+        """Test RTF groups balance, even with unknown colour names."""
+        rtf = ''.join(ex.rtf_chunks('hello {world}', {'a': [(0, 5)]},
+                                    {'a': 'no such colour'}))
+        self.assertTrue(rtf.startswith('{\\rtf1'))
+
+        depth = 0
+        for brace in re.sub(r'\\[\\{}]', '', rtf):
+            depth += {'{': 1, '}': -1}.get(brace, 0)
+            self.assertGreaterEqual(depth, 0)
+        self.assertEqual(depth, 0)
+        self.assertIn('\\red190;\\green190;\\blue190;', rtf)
+
+    def test_write_export(self):
+        """Test a failed export leaves no file behind."""
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'out.rtf')
+
+        def failing():
+            yield 'start'
+            raise ValueError('bad chunk')
+
+        with self.assertRaises(ValueError):
+            ex.write_export(path, failing())
+        self.assertEqual(os.listdir(directory), [])
+        ex.write_export(path, iter(['é']))
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'é')
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+import numpy as np
+import gui_sentiment_arc as sa
+
+
+class FakeSentence(object):
+    def __init__(self, text):
+        self.sentiment = mock.Mock(polarity=len(text)/100,
+                                   subjectivity=text.count('!')/10)
+
+
+class FakeTextBlob(object):
+    calls = []
+
+    def __init__(self, text):
+        FakeTextBlob.calls.append(text)
+        self.sentences = [FakeSentence(s) for s in text.split('.') if s]
+
+
+class TestSentimentArc(unittest.TestCase):
+    def test_rolling_mean(self):
+        """Test window means, including windows longer than the series."""
+        series = np.array([[1.0, 0.0], [3.0, 2.0], [5.0, 4.0]])
+        np.testing.assert_allclose(sa.rolling_mean(series, 2),
+                                   [[2.0, 1.0], [4.0, 3.0]])
+        np.testing.assert_allclose(sa.rolling_mean(series, 10), [[3.0, 2.0]])
+        np.testing.assert_allclose(sa.rolling_mean(series, 0), series)
+
+    def test_min_max_columns(self):
+        """Test downsampling keeps the extremes of each column."""
+        series = np.array([[1.0], [4.0], [2.0], [0.0], [3.0], [5.0]])
+        mins, maxs = sa.min_max_columns(series, 2)
+        np.testing.assert_allclose(mins, [[1.0], [0.0]])
+        np.testing.assert_allclose(maxs, [[4.0], [5.0]])
+
+        mins, maxs = sa.min_max_columns(series, 100)
+        # More columns than rows keeps every row.
+        np.testing.assert_allclose(mins, series)
+        np.testing.assert_allclose(maxs, series)
+
+    def test_sentiment_series(self):
+        """Test only new lines are analysed and old ones are dropped."""
+        cache = {}
+        FakeTextBlob.calls = []
+        with mock.patch('startup.textblob',
+                        return_value=mock.Mock(TextBlob=FakeTextBlob)):
+            series = sa.sentiment_series('Good. Bad!\n\nFine.', cache)
+            self.assertEqual(series.shape, (3, 2))
+            np.testing.assert_allclose(series[1], [0.05, 0.1])
+
+            sa.sentiment_series('Good. Bad!\nNew.', cache)
+            self.assertEqual(FakeTextBlob.calls,
+                             ['Good. Bad!', 'Fine.', 'New.'])
+            self.assertEqual(sorted(cache), ['Good. Bad!', 'New.'])
+
+            self.assertEqual(sa.sentiment_series('\n', cache).shape, (0, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
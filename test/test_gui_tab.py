@@ -0,0 +1,143 @@
+import re
+import unittest
+import gui_tab as gt
+
+
+class FakeWordSet(object):
+    def __init__(self, text):
+        self.token = text.split()
+
+
+class FakeToken(object):
+    def __init__(self, match):
+        self.text = match.group()
+        self.idx = match.start()
+        self.lemma_ = self.text.lower()
+        self.tag_ = 'XX'
+        self.is_punct = not self.text.isalnum()
+        self.is_space = False
+        self.is_stop = self.lemma_ in ('the', 'a', 'and')
+
+
+class FakeNlp(object):
+    """Tokenises on words and punctuation, tagging nothing."""
+    def make_doc(self, text):
+        return [FakeToken(m) for m in re.finditer(r'\w+|[^\w\s]', text)]
+
+    def __call__(self, text):
+        doc = FakeDoc(self.make_doc(text))
+        return doc
+
+
+class FakeDoc(list):
+    sents = []
+    ents = []
+
+
+class TestHeadlessTab(unittest.TestCase):
+    def test_highlight_and_click(self):
+        """Test word highlighting and click selection without a display."""
+        content = 'the cat sat\non the mat'
+        tab = gt.HeadlessTab(None, content)
+
+        tab.highlight_words('the', FakeWordSet(content))
+        self.assertEqual(tab.text.tag_ranges('highlight'),
+                         ('1.0', '1.3', '2.3', '2.6'))
+        self.assertIn('the', tab.highlighted_text_list)
+        self.assertEqual(tab.layers.tags('pos'), {'highlight'})
+
+        tab.text.mark_set('insert', '2.4')
+        tab.get_highlighted_word_by_click(None)
+        self.assertEqual(tab.text_selected.get(), 'the')
+        self.assertEqual(tab.text.tag_cget('the', 'background'), 'red')
+
+    def test_scale(self):
+        """Test highlighting every match in a large buffer tags each one."""
+        content = 'the cat sat on the mat\n'*1000+'and the end'
+        tab = gt.HeadlessTab(None, content)
+        tab.highlight_words('the', FakeWordSet(content))
+
+        ranges = tab.text.tag_ranges('highlight')
+        expected = tuple(index for line in range(1, 1001)
+                         for index in ('{}.0'.format(line),
+                                       '{}.3'.format(line),
+                                       '{}.15'.format(line),
+                                       '{}.18'.format(line)))
+        self.assertEqual(ranges, expected+('1001.4', '1001.7'))
+        self.assertEqual(tab.index_start_and_end('1001.4', 'the'),
+                         ('1001.4', '1001.4+3c'))
+
+    def test_track_edit(self):
+        """Test multi-line edits mark every changed line and move others."""
+        tab = gt.HeadlessTab(None, 'one\ntwo\nthree\nfour')
+        tab.dirty_lines = {4}
+
+        tab.text.mark_set('insert', '2.3')
+        tab.text.insert('insert', ' and\nmore\nlines')
+        tab.track_edit(None)
+        self.assertEqual(tab.dirty_lines, {2, 3, 4, 6})
+
+        tab.dirty_lines = {1, 6}
+        tab.text.mark_set('insert', '2.0')
+        tab.text.delete('2.0', '5.0')
+        tab.track_edit(None)
+        self.assertEqual(tab.dirty_lines, {1, 2, 3})
+        self.assertEqual(tab.line_count, 3)
+
+    def test_apply_modifier_suggestions(self):
+        """Test every line a suggestion is deleted from is marked edited."""
+        tab = gt.HeadlessTab(None, 'a very big dog\nstill\na really red fox')
+        tab.text.tag_add('suggest_delete', '1.2', '1.7', '3.2', '3.9')
+        tab.text.mark_set('insert', '1.0')
+
+        self.assertEqual(tab.apply_modifier_suggestions(), 2)
+        self.assertEqual(tab.text.get('1.0', 'end-1c'),
+                         'a big dog\nstill\na red fox')
+        self.assertEqual(tab.dirty_lines, {1, 3})
+
+    def test_echoes(self):
+        """Test echoes differ in colour and are redone around an edit."""
+        content = 'The cat sat.\nA fox ran.\nThe cat ran, and sat.'
+        tab = gt.HeadlessTab(FakeNlp(), content)
+        self.assertEqual(tab.echo_analysis(window=6), 2)
+        cat, ran = tab.echo_tag('cat'), tab.echo_tag('ran')
+        self.assertNotEqual(cat, ran)
+        self.assertEqual(tab.text.tag_ranges(ran),
+                         ('2.6', '2.9', '3.8', '3.11'))
+
+        tab.text.delete('2.6', '2.9')
+        tab.text.insert('2.6', 'hid')
+        tab.highlight_line(2)
+        self.assertEqual(tab.text.tag_ranges(ran), ())
+        # Both words lose the echo, though only one was edited.
+        self.assertEqual(tab.text.tag_ranges(cat),
+                         ('1.4', '1.7', '3.4', '3.7'))
+
+        tab.text.delete('2.6', '2.9')
+        tab.text.insert('2.6', 'sat')
+        tab.highlight_line(2)
+        sat = tab.echo_tag('sat')
+        self.assertNotIn(sat, (cat, ran))
+        self.assertEqual(tab.text.tag_ranges(sat), ('1.8', '1.11', '2.6',
+                                                    '2.9', '3.17', '3.20'))
+
+        self.assertNotIn(sat, tab.layers.spans)
+        # Spans are only recorded when needed, not on every edit.
+        state = tab.snapshot()
+        source, spans = state['spans'][sat]
+        self.assertEqual(source, tab.text.get('1.0', 'end'))
+        self.assertEqual([source[s:e] for s, e in spans], ['sat']*3)
+        self.assertFalse(tab._echoes_unrecorded)
+
+    def test_split_paragraph(self):
+        """Test long paragraphs are parsed in parts at sentence ends."""
+        paragraph = 'One two three. Four five six. Seven eight nine.'
+        parts = gt.split_paragraph(paragraph, 20)
+        self.assertEqual([paragraph[s:e] for s, e in parts],
+                         ['One two three. ', 'Four five six. ',
+                          'Seven eight nine.'])
+        self.assertEqual(gt.split_paragraph('short', 20), [(0, 5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import tracemalloc
+import unittest
+from unittest import mock
+import log
+
+
+class Tab(object):
+    tab_name = 'Document 1 '
+
+    @log.memory_profiler
+    def outer(self):
+        data = [bytes(1000) for i in range(100)]
+        return self.inner(data)
+
+    @log.memory_profiler
+    def inner(self, data):
+        self.kept = bytes(50000)
+        return len(data)
+
+
+class TestMemoryUsage(unittest.TestCase):
+    def setUp(self):
+        self.usage = log.MemoryUsage()
+        patcher = mock.patch('log.memory_usage', self.usage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.usage.stop)
+
+    def test_inactive(self):
+        """Test nothing is traced or recorded before start."""
+        self.assertEqual(Tab().outer(), 100)
+        self.assertEqual(self.usage.stats, {})
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_outermost(self):
+        """Test only the outermost measured call is recorded."""
+        self.usage.start()
+        self.assertTrue(tracemalloc.is_tracing())
+        tab = Tab()
+        self.assertEqual(tab.outer(), 100)
+        tab.outer()
+
+        self.assertEqual(list(self.usage.stats), [('outer', 'Document 1 ')])
+        calls, peak, retained, last = self.usage.stats['outer',
+                                                       'Document 1 ']
+        self.assertEqual(calls, 2)
+        self.assertGreaterEqual(peak, 100000)
+        # The temporary list is counted in the peak...
+        self.assertLess(last, peak)
+        # ...but only the kept bytes are retained.
+
+        self.usage.stop()
+        self.assertFalse(tracemalloc.is_tracing())
+        tab.outer()
+        self.assertEqual(self.usage.stats['outer', 'Document 1 '][0], 2)
+
+    def test_stop_during_call(self):
+        """Test stopping inside a measured call ends tracing after it."""
+        self.usage.start()
+        self.assertIsNone(self.usage.measure('stop', None, self.usage.stop))
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(self.usage.stats['stop', None][0], 1)
+
+    def test_report(self):
+        """Test the report lists actions, largest peak first."""
+        self.usage.stats = {('small', None): [1, 2048, 1024, 1024],
+                            ('large', 'Document 1 '): [3, 10240, 0, 0]}
+        lines = self.usage.report()
+
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('Action'))
+        self.assertEqual(lines[1].split(), ['large', 'Document', '1', '3',
+                                            '10', '0'])
+        self.assertEqual(lines[2].split(), ['small', 'None', '1', '2', '1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from unittest import mock
+import numpy as np
+import models
+
+
+class FakePipeline(object):
+    def __init__(self, name):
+        self.name = name
+        self.path = None
+        self.vocab = mock.Mock()
+        self.vocab.vectors.data = np.zeros((4, 3), dtype=np.float32)
+
+    def __call__(self, text):
+        return (self.name, text)
+
+
+class FakeSpacy(object):
+    def __init__(self, installed):
+        self.installed = installed
+        self.loads = []
+
+    def load(self, name):
+        self.loads.append(name)
+        if name not in self.installed:
+            raise OSError('No model {}'.format(name))
+        return FakePipeline(name)
+
+
+class TestModelManager(unittest.TestCase):
+    def setUp(self):
+        self.spacy = FakeSpacy({'en_core_web_md', 'en_core_web_lg'})
+        patcher = mock.patch('startup.spacy', return_value=self.spacy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = models.ModelManager(small_document=100,
+                                           idle_unload=60)
+
+    def test_tiers(self):
+        """Test the first installed pipeline of a tier is chosen once."""
+        nlp = self.manager.pipeline('tagging')
+        self.assertEqual(nlp.name, 'en_core_web_md')
+        self.assertEqual(self.manager.unavailable, {'en_core_web_sm'})
+        self.assertEqual(self.manager.choices['tagging'][0], 'en_core_web_md')
+
+        self.manager.pipeline('tagging')
+        self.assertEqual(self.spacy.loads, ['en_core_web_sm',
+                                            'en_core_web_md'])
+        # Missing pipelines are not retried, loaded ones are reused.
+
+        self.spacy.installed = set()
+        self.manager.loaded.clear()
+        with self.assertRaises(OSError):
+            self.manager.pipeline('tagging')
+
+    def test_small_document(self):
+        """Test short texts reuse any loaded pipeline."""
+        self.manager.pipeline('vectors')
+        self.assertEqual(self.manager('short text'),
+                         ('en_core_web_md', 'short text'))
+        self.assertEqual(self.manager.choices['tagging'],
+                         ('en_core_web_md', 'already loaded, short text'))
+
+        self.spacy.installed.add('en_core_web_sm')
+        text = 'word '*50
+        self.assertEqual(self.manager(text)[0], 'en_core_web_sm')
+        # Longer texts use the preferred tagging pipeline.
+        self.assertIsNotNone(self.manager.costs['en_core_web_sm'][2])
+
+    def test_unload_idle(self):
+        """Test only pipelines idle for longer than the limit unload."""
+        manager = models.ModelManager({'tagging': ['en_core_web_md'],
+                                       'vectors': ['en_core_web_lg']},
+                                      idle_unload=60)
+        with mock.patch('models.time.time', return_value=1000.0):
+            manager.pipeline('tagging')
+        with mock.patch('models.time.time', return_value=1050.0):
+            manager.pipeline('vectors')
+
+        with mock.patch('models.time.time', return_value=1070.0):
+            self.assertEqual(manager.unload_idle(), ['en_core_web_md'])
+        self.assertEqual(list(manager.loaded), ['en_core_web_lg'])
+        with mock.patch('models.time.time', return_value=1111.0):
+            self.assertEqual(manager.unload_idle(), ['en_core_web_lg'])
+        self.assertEqual(manager.loaded, {})
+        self.assertIn(' no ', manager.report()[1])
+
+        manager.pipeline('tagging')
+        manager.pipeline('vectors')
+        self.assertEqual(sorted(manager.unload()), ['en_core_web_lg',
+                                                    'en_core_web_md'])
+        self.assertEqual(manager.loaded, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import modifier_density as mo
+
+
+class TestModifierDensity(unittest.TestCase):
+    def test_stacked(self):
+        """Test runs of modifiers and the suggested deletions."""
+        words = ['The', 'very', 'big', 'red', 'dog', 'was', 'not', 'happy']
+        tags = ['DT', 'RB', 'JJ', 'JJ', 'NN', 'VBD', 'RB', 'JJ']
+        mask = mo.modifier_mask(words, tags)
+
+        runs = mo.stacked_modifiers(mask)
+        self.assertEqual(runs, [(1, 4)])
+        # 'not happy' is kept, as removing 'not' changes the meaning.
+        self.assertEqual(mo.deletion_suggestions(runs), [1, 2])
+
+    def test_punctuation(self):
+        """Test runs stop at commas and sentence ends."""
+        text = 'A big, red dog ran quickly. Bright lights shone.'
+        offsets = [(0, 1), (2, 5), (7, 10), (11, 14), (15, 18), (19, 26),
+                   (28, 34), (35, 41), (42, 47)]
+        tags = ['DT', 'JJ', 'JJ', 'NN', 'VBD', 'RB', 'JJ', 'NNS', 'VBD']
+        words = [text[s:e] for s, e in offsets]
+        mask = mo.modifier_mask(words, tags)
+
+        self.assertEqual(mo.stacked_modifiers(mask), [(1, 3), (5, 7)])
+        joined = mo.whitespace_joined(text, offsets)
+        self.assertEqual(joined[2], False)
+        self.assertEqual(mo.stacked_modifiers(mask, joined=joined), [])
+
+    def test_dense(self):
+        """Test dense passages are merged."""
+        mask = [False]*10 + [True, False]*5 + [False]*10
+        self.assertEqual(mo.dense_passages(mask, window=4, threshold=0.25),
+                         [(9, 20)])
+        self.assertEqual(mo.dense_passages([], window=4), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+import phrases as ph
+
+
+class TestPhrases(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cliches.txt')
+        with open(self.path, 'w') as f:
+            f.write('# Cliches\nat the end of the day\nend of\n\nthe day\n'
+                    'he she\nshe\nhers\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_match(self):
+        """Test overlapping and nested phrases are all found."""
+        automaton = ph.PhraseAutomaton(ph.read_phrases([self.path]),
+                                       str.split)
+        words = 'At the END of the day ushers said'.split()
+        found = sorted((s, e, automaton.phrases[p])
+                       for s, e, p in automaton.match(words))
+
+        self.assertEqual(found, [(0, 5, 'at the end of the day'),
+                                 (2, 3, 'end of'), (4, 5, 'the day')])
+        self.assertEqual(sorted(automaton.phrases[p] for s, e, p in
+                                automaton.match('he she hers'.split())),
+                         ['he she', 'hers', 'she'])
+
+    def test_cache(self):
+        """Test the compiled automaton is reused until the file changes."""
+        cache = os.path.join(self.directory, 'cache')
+        calls = []
+
+        def tokenise(phrase):
+            calls.append(phrase)
+            return phrase.split()
+
+        first = ph.load_automaton([self.path], tokenise, cache)
+        built = len(calls)
+        second = ph.load_automaton([self.path], tokenise, cache)
+        self.assertEqual(len(calls), built)
+        self.assertEqual(second.phrases, first.phrases)
+
+        with open(self.path, 'a') as f:
+            f.write('new phrase\n')
+        os.utime(self.path, ns=(0, 10**9))
+        third = ph.load_automaton([self.path], tokenise, cache)
+        self.assertIn('new phrase', third.phrases)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+import poetry as pt
+
+
+class TestPoetry(unittest.TestCase):
+    def setUp(self):
+        entries = {'the': [['DH', 'AH0']], 'cat': [['K', 'AE1', 'T']],
+                   'sat': [['S', 'AE1', 'T']], 'on': [['AA1', 'N']],
+                   'mat': [['M', 'AE1', 'T']], 'a': [['AH0']],
+                   'dog': [['D', 'AO1', 'G']],
+                   'below': [['B', 'IH0', 'L', 'OW1']]}
+        self.path = os.path.join(tempfile.mkdtemp(), 'pron.bin')
+        pt.compile_table(entries, self.path)
+        self.table = pt.PronunciationTable(self.path)
+
+    def test_lookup(self):
+        """Test syllables and stress from the compiled table."""
+        self.assertEqual(self.table.count, 8)
+        self.assertEqual(self.table.phones('Below'), ['B', 'IH0', 'L', 'OW1'])
+        self.assertEqual(self.table.syllables('below'), 2)
+        self.assertEqual(self.table.stress('below'), '01')
+        self.assertIsNone(self.table.phones('zebra'))
+        self.assertEqual(self.table.stress('zebra'), '??')
+
+    def test_rhyme(self):
+        """Test rhyme letters of line endings."""
+        lines = pt.analyse_lines('The cat sat\n\nA dog\non the mat', self.table)
+
+        self.assertEqual([l[0] for l in lines], [1, 3, 4])
+        self.assertEqual([l[5] for l in lines], ['A', 'B', 'A'])
+        self.assertEqual(lines[0][1:3], (3, '011'))
+        self.assertEqual(lines[2][3:5], (7, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import revision_diff as rd
+
+
+class TestRevisionDiff(unittest.TestCase):
+    def changes(self, old, new):
+        numbers = {}
+        a = rd.token_ids(old.split(), numbers)
+        b = rd.token_ids(new.split(), numbers)
+        return rd.opcodes(rd.matching_blocks(a, b), len(a), len(b))
+
+    def test_opcodes(self):
+        """Test insertions, deletions and replacements between versions."""
+        self.assertEqual(self.changes('a b c d', 'a b c d'), [])
+        self.assertEqual(self.changes('the cat sat on the mat',
+                                      'the black cat sat on a mat'),
+                         [('insert', 1, 1, 1, 2), ('replace', 4, 5, 5, 6)])
+        self.assertEqual(self.changes('x y x y x', 'y x y'),
+                         [('delete', 0, 1, 0, 0), ('delete', 4, 5, 3, 3)])
+        self.assertEqual(self.changes('', 'a b'),
+                         [('insert', 0, 0, 0, 2)])
+
+    def test_minimal(self):
+        """Test the Myers diff finds a longest common subsequence."""
+        a, b = [1, 2, 3, 1, 2, 2, 1], [3, 2, 1, 2, 1, 3]
+        blocks = rd.matching_blocks(a, b)
+        self.assertEqual(sum(size for i, j, size in blocks), 4)
+        for i, j, size in blocks:
+            self.assertEqual(a[i:i+size], b[j:j+size])
+
+    def test_diff_spans(self):
+        """Test changes are mapped to spans of the newer text."""
+        new = 'the black cat sat'
+        offsets = [(0, 3), (4, 9), (10, 13), (14, 17)]
+        changes = [('insert', 1, 1, 1, 2), ('delete', 2, 3, 3, 3),
+                   ('delete', 4, 5, 4, 4)]
+        self.assertEqual(rd.diff_spans(changes, offsets, len(new)),
+                         {'insert': [(4, 9)], 'replace': [],
+                          'delete': [(13, 14), (14, 17)]})
+
+
+if __name__ == '__main__':
+    unittest.main()
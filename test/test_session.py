@@ -0,0 +1,37 @@
+import os
+import tempfile
+import unittest
+import session as ss
+import tab_store as ts
+
+
+class TestSession(unittest.TestCase):
+    def test_round_trip(self):
+        """Test a saved session is restored into a tab store unchanged."""
+        path = os.path.join(tempfile.mkdtemp(), 'clay', 'session.pkl')
+        state = {'content': 'hello', 'insert': '1.3'}
+        tabs = [('Document 0', None, None),
+                ('chapter.txt', '/tmp/chapter.txt', ts.pack(state))]
+        ss.save_session(path, tabs, 1)
+
+        loaded, selected = ss.load_session(path)
+        self.assertEqual((loaded, selected), (tabs, 1))
+
+        store = ts.TabStore()
+        store.put_packed('.tab1', loaded[1][2])
+        self.assertEqual(store.get('.tab1'), state)
+
+    def test_missing_or_bad(self):
+        """Test missing or unreadable snapshots give an empty session."""
+        folder = tempfile.mkdtemp()
+        self.assertEqual(ss.load_session(os.path.join(folder, 'none')),
+                         ([], 0))
+
+        path = os.path.join(folder, 'bad')
+        with open(path, 'wb') as f:
+            f.write(b'not a session')
+        self.assertEqual(ss.load_session(path), ([], 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
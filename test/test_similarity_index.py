@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+import similarity_index as si
+
+
+class TestParagraphIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = si.ParagraphIndex(2, capacity=2)
+        self.index.add('a', np.array([[1, 0], [0, 1]]),
+                       [(1, 'east'), (2, 'north')])
+        self.index.add('b', np.array([[1, 1]]), [(1, 'north east')])
+
+    def test_query(self):
+        """Test results are ordered by cosine similarity."""
+        results = self.index.query(np.array([1.0, 0.1]), k=2)
+        self.assertEqual([(s, n) for sim, s, n, t in results],
+                         [('a', 1), ('b', 1)])
+        self.assertAlmostEqual(results[0][0], 1/np.hypot(1, 0.1), places=5)
+        self.assertEqual(len(self.index), 3)
+
+    def test_exclude_and_large_k(self):
+        """Test excluding a paragraph and asking for more than are held."""
+        results = self.index.query(np.array([1.0, 0.0]), k=10,
+                                   exclude=('a', 1))
+        self.assertEqual([(s, n) for sim, s, n, t in results],
+                         [('b', 1), ('a', 2)])
+        self.assertEqual(self.index.query(np.zeros(2)), [])
+
+    def test_remove_reuses_rows(self):
+        """Test removed rows are reused before the matrix grows."""
+        capacity = len(self.index.matrix)
+        self.index.remove('a')
+        self.assertNotIn('a', self.index)
+        self.assertEqual([t for sim, s, n, t in
+                          self.index.query(np.array([1.0, 0.0]), k=5)],
+                         ['north east'])
+
+        self.index.add('c', np.array([[0, 2], [3, 0]]),
+                       [(1, 'up'), (2, 'right')])
+        self.assertEqual(len(self.index.matrix), capacity)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.query(np.array([0.0, 1.0]), k=1)[0][3],
+                         'up')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+import tab_store as ts
+
+
+class TestTabStore(unittest.TestCase):
+    def test_round_trip(self):
+        """Test a tab state is returned unchanged and removed."""
+        store = ts.TabStore()
+        state = {'content': 'hello '*1000, 'tags': [('NN', {}, ['1.0', '1.5'])]}
+        store.put('.tab1', state)
+
+        self.assertIn('.tab1', store)
+        self.assertLess(store.memory_used, len(state['content']))
+        # Text should be compressed.
+        self.assertEqual(store.get('.tab1'), state)
+        self.assertNotIn('.tab1', store)
+        self.assertEqual(store.memory_used, 0)
+
+    def test_spill_to_disk(self):
+        """Test states beyond the memory limit are spilled to disk."""
+        store = ts.TabStore(memory_limit=0)
+        store.put('.tab1', {'content': 'hello'})
+
+        self.assertEqual(store.memory_used, 0)
+        self.assertEqual(store.peek('.tab1'), {'content': 'hello'})
+        store.discard('.tab1')
+        self.assertEqual(len(store), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
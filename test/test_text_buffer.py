@@ -0,0 +1,55 @@
+import unittest
+import tkinter as tk
+import text_buffer as bf
+
+
+class TestMemoryText(unittest.TestCase):
+    def test_indices(self):
+        """Test indices are parsed and normalised as Tk does."""
+        text = bf.MemoryText('one two\nthree')
+        self.assertEqual(text.index(tk.END), '3.0')
+        self.assertEqual(text.index('end-1c'), '2.5')
+        self.assertEqual(text.index('1.2+4c'), '1.6')
+        self.assertEqual(text.index('1.99'), '1.7')
+        self.assertEqual(text.index('2.3 linestart'), '2.0')
+        self.assertEqual(text.index('1.2 lineend'), '1.7')
+        self.assertEqual(text.index('1.5+1 lines'), '2.5')
+        self.assertEqual(text.get('1.4', '1.4+3c'), 'two')
+        self.assertEqual(text.get('1.0', tk.END), 'one two\nthree\n')
+        with self.assertRaises(tk.TclError):
+            text.index(tk.SEL_FIRST)
+
+    def test_tags_follow_edits(self):
+        """Test tags merge, and move with inserted and deleted text."""
+        text = bf.MemoryText('one two three')
+        text.tag_add('hl', '1.0', '1.3', '1.8', '1.13')
+        text.tag_add('hl', '1.3', '1.4')
+        self.assertEqual(text.tag_ranges('hl'), ('1.0', '1.4', '1.8', '1.13'))
+
+        text.insert('1.0', 'X')
+        text.insert('1.2', 'Y')
+        # Inside a range, so the new text is tagged.
+        self.assertEqual(text.tag_ranges('hl'),
+                         ('1.1', '1.6', '1.10', '1.15'))
+        self.assertEqual(text.tag_names('1.0'), ())
+        self.assertEqual(text.tag_names('1.2'), ('hl',))
+
+        text.delete('1.0', '1.11')
+        self.assertEqual(text.get('1.0', 'end-1c'), 'hree')
+        self.assertEqual(text.tag_ranges('hl'), ('1.0', '1.4'))
+        text.tag_remove('hl', '1.1', '1.2')
+        self.assertEqual(text.tag_ranges('hl'), ('1.0', '1.1', '1.2', '1.4'))
+
+    def test_search(self):
+        """Test searches with Tcl word boundaries, counts and wrapping."""
+        text = bf.MemoryText('cat concat cat')
+        count = bf.StringValue()
+        self.assertEqual(text.search(r'\ycat\y', '1.1', regexp=True,
+                                     count=count), '1.11')
+        self.assertEqual(count.get(), 3)
+        self.assertEqual(text.search('cat', '1.12'), '1.0')
+        self.assertEqual(text.search('dog', '1.0', stopindex=tk.END), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+import words_analysis_classes as wc
+
+
+class FakeToken(object):
+    def __init__(self, orth):
+        self.orth = orth
+        self.is_punct = self.is_space = False
+
+
+class FakeStore(object):
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def lookup(self, keys):
+        return self.vectors[np.asarray(keys, dtype=np.int64)]
+
+    def doc_vector(self, doc):
+        return self.lookup([t.orth for t in doc]).mean(axis=0)
+
+
+class FakeModel(object):
+    def __init__(self, store):
+        self.store = store
+
+    def vector_store(self):
+        return self.store
+
+    def make_doc(self, text):
+        return [FakeToken(int(w)) for w in text.split()]
+
+
+def word_set(store, keys):
+    ws = wc.WordSet.__new__(wc.WordSet)
+    ws.md_core = FakeModel(store)
+    ws.doc = [FakeToken(k) for k in keys]
+    return ws
+
+
+class TestWindowSimilarity(unittest.TestCase):
+    def test_matches_direct_means(self):
+        """Test window scores of a long text against per-window means."""
+        rng = np.random.RandomState(0)
+        vectors = (rng.rand(50, 8)*100+1000).astype(np.float32)
+        keys = rng.randint(0, 50, 200000)
+        # Large, similar vectors make float32 running sums lose precision.
+
+        window = 40
+        scores = word_set(FakeStore(vectors), keys).window_similarity(
+            '3 7', window=window)
+
+        query = vectors[[3, 7]].mean(axis=0).astype(np.float64)
+        for centre in (window//2, 100000, len(keys)-window//2-1):
+            start = centre-window//2
+            mean = vectors[keys[start:start+window]].astype(
+                np.float64).mean(axis=0)
+            expected = mean @ query/(np.linalg.norm(mean)*np.linalg.norm(
+                query))
+            self.assertAlmostEqual(float(scores[centre]), expected, places=6)
+        self.assertEqual(scores.dtype, np.float32)
+
+    def test_blocks(self):
+        """Test scores don't depend on the block size, even at the edges."""
+        rng = np.random.RandomState(1)
+        vectors = rng.rand(20, 4).astype(np.float32)
+        ws = word_set(FakeStore(vectors), rng.randint(0, 20, 103))
+
+        whole = ws.window_similarity('1 2', window=10, block=1000)
+        self.assertEqual(len(whole), 103)
+        for block in (1, 7, 10, 94):
+            np.testing.assert_allclose(
+                ws.window_similarity('1 2', window=10, block=block), whole,
+                rtol=1e-6)
+        self.assertEqual(len(ws.window_similarity('1', window=500)), 103)
+
+    def test_no_vectors(self):
+        """Test a model without vectors gives None."""
+        self.assertIsNone(word_set(None, [1, 2]).window_similarity('1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
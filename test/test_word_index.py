@@ -0,0 +1,38 @@
+import unittest
+import word_index as wi
+
+
+class TestWordIndex(unittest.TestCase):
+    def test_find(self):
+        """Test finding words and inflections."""
+        index = wi.WordIndex()
+        index.build('I walk home.\nShe walked and walks.\nWalk on.')
+
+        self.assertEqual(index.find('walk'), [(1, 2, 6), (3, 0, 4)])
+        self.assertEqual(index.find('walk', inflections=True),
+                         [(1, 2, 6), (2, 4, 10), (2, 15, 20), (3, 0, 4)])
+
+    def test_build_from_analysis(self):
+        """Test building from an existing tokenisation."""
+        text = 'a cat\nthe cats'
+        index = wi.WordIndex()
+        index.build_from_analysis(text, ['a', 'cat', 'the', 'cats'],
+                                  ['a', 'cat', 'the', 'cat'],
+                                  [(0, 1), (2, 5), (6, 9), (10, 14)])
+
+        self.assertEqual(index.find('cat', inflections=True),
+                         [(1, 2, 5), (2, 4, 8)])
+
+    def test_sync(self):
+        """Test edits only change the affected lines."""
+        index = wi.WordIndex()
+        index.build('one\ntwo\nthree')
+        index.sync('one\nnew line\ntwo\nthree two')
+
+        self.assertEqual(index.find('two'), [(3, 0, 3), (4, 6, 9)])
+        self.assertEqual(index.find('line'), [(2, 4, 8)])
+        self.assertEqual(index.find('new'), [(2, 0, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,430 @@
+"""
+In-memory stand-in for a Tk text box, for running and benchmarking text
+and highlight logic without a display.
+"""
+
+import bisect
+import re
+import tkinter as tk
+
+_base = re.compile(r'\s*(?:(\d+)\.(\d+|end)|@(\d+),(\d+)|([^\s+-]+))')
+_modifier = re.compile(r'\s*(?:([+-])\s*(\d+)\s*(chars|char|cha|ch|c|'
+                       r'lines|line|lin|li|l|indices|index|i)?|'
+                       r'(linestart|lineend|wordstart|wordend))')
+_word = re.compile(r'\w')
+
+
+class StringValue(object):
+    """
+    Stand-in for tk.StringVar.
+    """
+
+    def __init__(self, value=''):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class MemoryText(object):
+    """
+    Model of the text, marks and tags of a tk.Text widget.
+
+    Supports the subset of the tk.Text interface used for editing and
+    highlighting: text indices ('line.column', 'end', marks, 'tag.first',
+    with +/- char/line and linestart/lineend modifiers), insert and delete
+    (moving marks and tags as Tk does), tags, marks and search. Display
+    methods (scrolling, configuration) are accepted and do nothing.
+
+    As in Tk, the text always ends with a newline that cannot be deleted.
+
+    Public attributes
+    -----------------
+    chars : str
+        Full contents, including the final newline.
+    tags : dict
+        Tag name -> sorted list of [start, end] character offsets, with
+        touching ranges merged.
+    tag_options : dict
+        Tag name -> configured options.
+    marks : dict
+        Mark name -> character offset.
+
+    """
+
+    def __init__(self, content=''):
+        self.chars = '\n'
+        self.tags = {tk.SEL: []}
+        self.tag_options = {tk.SEL: {}}
+        self.marks = {tk.INSERT: 0, tk.CURRENT: 0}
+        self.options = {}
+        self._modified = False
+        self._line_starts = None
+        if content:
+            self.insert('1.0', content)
+            self._modified = False
+
+    # Indices.
+
+    @property
+    def line_starts(self):
+        """
+        Offset of the start of each line.
+        """
+        if self._line_starts is None:
+            starts = [0]
+            found = self.chars.find('\n')
+            while found != -1:
+                starts.append(found+1)
+                found = self.chars.find('\n', found+1)
+            self._line_starts = starts
+        return self._line_starts
+
+    def _line_col(self, offset):
+        line = bisect.bisect_right(self.line_starts, offset)-1
+        return line, offset-self.line_starts[line]
+
+    def _line_offset(self, line, col):
+        starts = self.line_starts
+        if line < 0:
+            return 0
+        if line >= len(starts)-1:
+            return len(self.chars)
+        line_end = starts[line+1]-1
+        return min(starts[line]+col, line_end)
+
+    def offset(self, index):
+        """
+        Character offset of a text index.
+        """
+        index = str(index)
+        m = _base.match(index)
+        if m is None:
+            raise tk.TclError('bad text index "{}"'.format(index))
+
+        line, col, x, y, name = m.groups()
+        if line is not None:
+            if col == 'end':
+                col = len(self.chars)
+            position = self._line_offset(int(line)-1, int(col))
+        elif x is not None:
+            position = 0
+        elif name == tk.END:
+            position = len(self.chars)
+        elif name in self.marks:
+            position = self.marks[name]
+        elif name.endswith('.first') or name.endswith('.last'):
+            tag, end = name.rsplit('.', 1)
+            ranges = self.tags.get(tag)
+            if not ranges:
+                raise tk.TclError('text doesn\'t contain any characters '
+                                  'tagged with "{}"'.format(tag))
+            position = ranges[0][0] if end == 'first' else ranges[-1][1]
+        else:
+            raise tk.TclError('bad text index "{}"'.format(index))
+
+        rest = index[m.end():]
+        while rest.strip():
+            m = _modifier.match(rest)
+            if m is None:
+                raise tk.TclError('bad text index "{}"'.format(index))
+            sign, count, unit, edge = m.groups()
+            line, col = self._line_col(position)
+            if edge == 'linestart':
+                position = self.line_starts[line]
+            elif edge == 'lineend':
+                position = self._line_offset(line, len(self.chars))
+            elif edge in ('wordstart', 'wordend'):
+                step = -1 if edge == 'wordstart' else 1
+                if edge == 'wordstart':
+                    while position > 0 and _word.match(self.chars[position-1]):
+                        position += step
+                else:
+                    while (position < len(self.chars) and
+                           _word.match(self.chars[position])):
+                        position += step
+            else:
+                n = int(count)*(-1 if sign == '-' else 1)
+                if unit and unit[0] == 'l':
+                    position = self._line_offset(line+n, col)
+                else:
+                    position += n
+            position = max(0, min(position, len(self.chars)))
+            rest = rest[m.end():]
+
+        return min(position, len(self.chars))
+
+    def index_of(self, offset):
+        """
+        Text index ('line.column') of a character offset.
+        """
+        line, col = self._line_col(offset)
+        return '{}.{}'.format(line+1, col)
+
+    def index(self, index):
+        """
+        Normalise a text index to 'line.column'.
+        """
+        return self.index_of(self.offset(index))
+
+    def compare(self, index1, op, index2):
+        """
+        Compare two text indices with an operator such as '<'.
+        """
+        a, b = self.offset(index1), self.offset(index2)
+        return {'<': a < b, '<=': a <= b, '==': a == b, '>=': a >= b,
+                '>': a > b, '!=': a != b}[op]
+
+    # Text.
+
+    def get(self, index1, index2=None):
+        """
+        Get the text between two indices, or the character at one.
+        """
+        start = self.offset(index1)
+        end = start+1 if index2 is None else self.offset(index2)
+        return self.chars[start:end] if end > start else ''
+
+    def insert(self, index, chars, *tags):
+        """
+        Insert text. The new text takes the given tags, or if none are
+        given, any tag covering the characters on both sides.
+        """
+        if not chars:
+            return
+        position = min(self.offset(index), len(self.chars)-1)
+        # Text can't go after the final newline.
+        n = len(chars)
+        self.chars = self.chars[:position]+chars+self.chars[position:]
+        self._line_starts = None
+        self._modified = True
+
+        for ranges in self.tags.values():
+            for r in ranges:
+                if r[0] >= position:
+                    r[0] += n
+                    r[1] += n
+                elif r[1] > position:
+                    r[1] += n
+        for name, m in self.marks.items():
+            if m >= position:
+                self.marks[name] = m+n
+
+        if tags:
+            for name in self.tags:
+                self.tag_remove(name, self.index_of(position),
+                                self.index_of(position+n))
+            for name in tags:
+                self.tag_add(name, self.index_of(position),
+                             self.index_of(position+n))
+
+    def delete(self, index1, index2=None):
+        """
+        Delete the text between two indices, or the character at one.
+        """
+        start = self.offset(index1)
+        end = start+1 if index2 is None else self.offset(index2)
+        end = min(end, len(self.chars)-1)
+        if end <= start:
+            return
+        n = end-start
+        self.chars = self.chars[:start]+self.chars[end:]
+        self._line_starts = None
+        self._modified = True
+
+        def moved(o):
+            return o if o <= start else max(start, o-n)
+
+        for name, ranges in self.tags.items():
+            kept = []
+            for s, e in ranges:
+                s, e = moved(s), moved(e)
+                if e > s:
+                    if kept and kept[-1][1] >= s:
+                        kept[-1][1] = max(kept[-1][1], e)
+                    else:
+                        kept.append([s, e])
+            self.tags[name] = kept
+        for name, m in self.marks.items():
+            self.marks[name] = moved(m)
+
+    def search(self, pattern, index, stopindex=None, forwards=None,
+               backwards=None, exact=None, regexp=None, nocase=None,
+               count=None):
+        """
+        Find the first match of a pattern at or after an index, wrapping
+        round the text if there is no stopindex. Tcl word boundaries (\\y,
+        \\m, \\M) are supported in regular expressions.
+
+        Returns
+        -------
+        index : str
+            Index of the match, or '' if there is none.
+        """
+        if regexp:
+            pattern = re.sub(r'\\[ymM]', r'\\b', pattern)
+        else:
+            pattern = re.escape(pattern)
+        compiled = re.compile(pattern, re.IGNORECASE if nocase else 0)
+        start = self.offset(index)
+
+        if backwards:
+            stop = 0 if stopindex is None else self.offset(stopindex)
+            matches = [m for m in compiled.finditer(self.chars, stop, start)]
+            match = matches[-1] if matches else None
+        else:
+            stop = (len(self.chars) if stopindex is None
+                    else self.offset(stopindex))
+            match = compiled.search(self.chars, start, stop)
+            if match is None and stopindex is None:
+                match = compiled.search(self.chars, 0, start)
+
+        if match is None:
+            return ''
+        if count is not None:
+            count.set(match.end()-match.start())
+        return self.index_of(match.start())
+
+    # Marks.
+
+    def mark_set(self, name, index):
+        self.marks[name] = self.offset(index)
+
+    def mark_unset(self, *names):
+        for name in names:
+            self.marks.pop(name, None)
+
+    def mark_names(self):
+        return tuple(self.marks)
+
+    # Tags.
+
+    def tag_configure(self, name, cnf=None, **kw):
+        """
+        Set options of a tag, or get them if none are given.
+        """
+        self.tags.setdefault(name, [])
+        options = self.tag_options.setdefault(name, {})
+        kw.update(cnf or {})
+        if not kw:
+            return {k: (k, '', '', '', v) for k, v in options.items()}
+        options.update(kw)
+
+    tag_config = tag_configure
+
+    def tag_cget(self, name, option):
+        return self.tag_options.get(name, {}).get(option, '')
+
+    def tag_add(self, name, index1, *args):
+        """
+        Add a tag to one or more ranges, given as pairs of indices (a
+        lone index tags one character).
+        """
+        ranges = self.tags.setdefault(name, [])
+        self.tag_options.setdefault(name, {})
+        indices = (index1,)+args
+        for i in range(0, len(indices), 2):
+            start = self.offset(indices[i])
+            end = (self.offset(indices[i+1]) if i+1 < len(indices)
+                   else start+1)
+            end = min(end, len(self.chars)-1)
+            if end <= start:
+                continue
+
+            if not ranges or ranges[-1][1] < start:
+                ranges.append([start, end])
+                # Adding in order (the usual case) is a plain append.
+                continue
+            lo = bisect.bisect_left(ranges, [start, start])
+            if lo > 0 and ranges[lo-1][1] >= start:
+                lo -= 1
+            hi = lo
+            while hi < len(ranges) and ranges[hi][0] <= end:
+                hi += 1
+            if hi > lo:
+                start = min(start, ranges[lo][0])
+                end = max(end, ranges[hi-1][1])
+            ranges[lo:hi] = [[start, end]]
+
+    def tag_remove(self, name, index1, index2=None):
+        """
+        Remove a tag from a range.
+        """
+        if name not in self.tags:
+            return
+        start = self.offset(index1)
+        end = start+1 if index2 is None else self.offset(index2)
+        kept = []
+        for s, e in self.tags[name]:
+            if e <= start or s >= end:
+                kept.append([s, e])
+            else:
+                if s < start:
+                    kept.append([s, start])
+                if e > end:
+                    kept.append([end, e])
+        self.tags[name] = kept
+
+    def tag_delete(self, *names):
+        for name in names:
+            self.tags.pop(name, None)
+            self.tag_options.pop(name, None)
+
+    def tag_ranges(self, name):
+        """
+        Start and end index of each range of a tag, as a flat tuple.
+        """
+        return tuple(self.index_of(o) for r in self.tags.get(name, [])
+                     for o in r)
+
+    def tag_names(self, index=None):
+        """
+        Names of all tags, lowest priority first, or the tags covering the
+        character at an index.
+        """
+        if index is None:
+            return tuple(self.tags)
+        position = self.offset(index)
+        return tuple(name for name, ranges in self.tags.items()
+                     if any(s <= position < e for s, e in ranges))
+
+    def tag_raise(self, name, above=None):
+        ranges = self.tags.pop(name)
+        self.tags[name] = ranges
+
+    def tag_lower(self, name, below=None):
+        ranges = self.tags.pop(name)
+        self.tags = dict([(name, ranges)]+list(self.tags.items()))
+
+    # Undo and display, which have no effect without a widget.
+
+    def edit_modified(self, flag=None):
+        if flag is None:
+            return self._modified
+        self._modified = bool(flag)
+
+    def edit_separator(self):
+        pass
+
+    def edit_reset(self):
+        pass
+
+    def configure(self, cnf=None, **kw):
+        self.options.update(cnf or {}, **kw)
+
+    config = configure
+
+    def cget(self, option):
+        return self.options.get(option, '')
+
+    def see(self, index):
+        pass
+
+    def yview(self, *args):
+        return (0.0, 1.0)
+
+    def yview_moveto(self, fraction):
+        pass
@@ -0,0 +1,191 @@
+"""
+Memory-mapped word vector table, shared between processes.
+"""
+
+import os
+import shutil
+import tempfile
+import numpy as np
+import log
+
+_open_stores = {}
+# Stores already opened in this process, keyed by directory.
+
+
+class VectorStore(object):
+    """
+    Word vectors of a spaCy model, exported once to .npy files and read
+    through memory maps. Every process that opens the same files shares
+    the operating system's copy of the pages, rather than holding its own
+    copy of the table on the heap.
+
+    Public attributes
+    -----------------
+    path : str
+        Directory holding the exported table.
+    keys : numpy memmap
+        Sorted spaCy string hashes (uint64) of words with vectors.
+    rows : numpy memmap
+        Row in vectors for each entry of keys.
+    vectors : numpy memmap
+        Vector table (float32), one row per vector.
+
+    Class methods
+    -----------------
+    export : class method
+        Write the vector table of a spaCy model to disk.
+    lookup
+        Get the vectors for an array of word hashes.
+    doc_vector
+        Mean vector of a tokenised document.
+    similarity
+        Cosine similarity between two tokenised documents.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.keys = np.load(os.path.join(path, 'keys.npy'), mmap_mode='r')
+        self.rows = np.load(os.path.join(path, 'rows.npy'), mmap_mode='r')
+        self.vectors = np.load(os.path.join(path, 'vectors.npy'),
+                               mmap_mode='r')
+
+    @classmethod
+    @log.log_function
+    def export(cls, nlp, path):
+        """
+        Write the vector table and key to row map of a spaCy model to disk.
+
+        Parameters
+        ----------
+        nlp : spaCy Language object
+            Loaded model with word vectors.
+        path : str
+            Directory to write to.
+        """
+        table = nlp.vocab.vectors
+        keys = np.fromiter(table.key2row.keys(), dtype=np.uint64,
+                           count=len(table.key2row))
+        rows = np.fromiter(table.key2row.values(), dtype=np.int64,
+                           count=len(table.key2row))
+        order = np.argsort(keys)
+        # Sorted keys allow binary search without loading a dictionary.
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+        np.save(os.path.join(staging, 'keys.npy'), keys[order])
+        np.save(os.path.join(staging, 'rows.npy'), rows[order])
+        np.save(os.path.join(staging, 'vectors.npy'),
+                np.asarray(table.data, dtype=np.float32))
+        try:
+            os.replace(staging, path)
+            # Rename into place, so other processes never see a partial table.
+        except OSError:
+            # Another process finished the export first.
+            shutil.rmtree(staging, ignore_errors=True)
+
+        return cls(path)
+
+    def lookup(self, keys):
+        """
+        Get the vectors for an array of word hashes.
+
+        Parameters
+        ----------
+        keys : array-like
+            spaCy string hashes (e.g. token.orth).
+
+        Returns
+        -------
+        vectors : numpy array
+            One row per key, zero for words without a vector.
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        found = np.searchsorted(self.keys, keys)
+        found[found == len(self.keys)] = 0
+        hit = self.keys[found] == keys
+
+        out = np.zeros((len(keys), self.vectors.shape[1]), dtype=np.float32)
+        out[hit] = self.vectors[self.rows[found[hit]]]
+
+        return out
+
+    def doc_vector(self, doc):
+        """
+        Mean vector of a tokenised document (as spaCy's Doc.vector).
+        """
+        if len(doc) == 0:
+            return np.zeros(self.vectors.shape[1], dtype=np.float32)
+        return self.lookup([t.orth for t in doc]).mean(axis=0)
+
+    def similarity(self, doc1, doc2):
+        """
+        Cosine similarity between two tokenised documents.
+        """
+        v1, v2 = self.doc_vector(doc1), self.doc_vector(doc2)
+        norm = np.linalg.norm(v1)*np.linalg.norm(v2)
+        if norm == 0:
+            return 0.0
+
+        return float(np.dot(v1, v2)/norm)
+
+
+def store_path(meta, cache_dir=None):
+    """
+    Directory of the exported vector table of a model, from its meta data.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.expanduser('~'), '.clay', 'vectors')
+
+    name = '{}_{}-{}'.format(meta.get('lang', 'xx'), meta.get('name', 'model'),
+                             meta.get('version', '0'))
+    return os.path.join(cache_dir, name)
+
+
+def open_store(path):
+    """
+    Open an exported vector table, without needing its model.
+
+    Returns
+    -------
+    store : VectorStore object
+        Store at path, or None if the table has not been exported.
+    """
+    if path not in _open_stores:
+        if not os.path.exists(os.path.join(path, 'vectors.npy')):
+            return None
+        _open_stores[path] = VectorStore(path)
+
+    return _open_stores[path]
+
+
+@log.log_function
+def shared_store(nlp, cache_dir=None):
+    """
+    Open the shared vector store for a spaCy model, exporting it the first
+    time the model is used.
+
+    Parameters
+    ----------
+    nlp : spaCy Language object or ModelManager object
+        Loaded model with word vectors, or a model manager (which chooses
+        the vector model itself).
+    cache_dir : str
+        Directory for exported tables (default ~/.clay/vectors).
+
+    Returns
+    -------
+    store : VectorStore object
+        Store for the model, or None if the model has no vectors.
+    """
+    if hasattr(nlp, 'vector_store'):
+        return nlp.vector_store()
+
+    path = store_path(nlp.meta, cache_dir)
+    store = open_store(path)
+    if store is None:
+        if nlp.vocab.vectors.shape[0] == 0:
+            return None
+        store = _open_stores[path] = VectorStore.export(nlp, path)
+
+    return store
@@ -0,0 +1,230 @@
+"""
+Inverted index of words and lemmas, for find and replace.
+"""
+
+import re
+
+_word_pattern = re.compile(r"\w+(?:'\w+)?")
+_suffixes = ('ing', 'ied', 'ies', 'ed', 'es', 's')
+
+
+def simple_lemma(word):
+    """
+    Rough lemma of a word from stripping common inflections, used when no
+    language model is available.
+    """
+    word = word.lower()
+    for suffix in _suffixes:
+        if word.endswith(suffix) and len(word)-len(suffix) >= 3:
+            stem = word[:-len(suffix)]
+            if suffix in ('ied', 'ies'):
+                return stem + 'y'
+            return stem
+    return word
+
+
+def simple_tokens(line):
+    """
+    Split a line into (word, lemma, start, end) tuples with a regular
+    expression, used when no language model is available.
+    """
+    return [(m.group(), simple_lemma(m.group()), m.start(), m.end())
+            for m in _word_pattern.finditer(line)]
+
+
+class WordIndex(object):
+    """
+    Inverted index from words and lemmas to their positions in a document.
+
+    Postings are kept per line (a paragraph in a word-wrapped text box),
+    so an edit only re-tokenises the lines it changed.
+
+    Public attributes
+    -----------------
+    analyse : function
+        Takes a line of text and returns (word, lemma, start, end) tuples.
+    source : str
+        Text the index currently describes.
+
+    Class methods
+    -----------------
+    build
+        Index a whole text.
+    build_from_analysis
+        Index a whole text from an existing tokenisation.
+    sync
+        Re-index only the lines that differ from a new version of the text.
+    find
+        Positions of a word, or of every inflection of it.
+
+    """
+
+    def __init__(self, analyse=None):
+        self.analyse = analyse if analyse is not None else simple_tokens
+        self.source = ''
+
+        self._lines = []
+        # Text of each line, in document order.
+        self._ids = []
+        # Stable id of each line, in document order.
+        self._tokens = {}
+        # Line id -> list of (word, lemma, start, end), lower cased.
+        self._words = {}
+        self._lemmas = {}
+        # Word or lemma -> set of line ids containing it.
+        self._position = None
+        # Line id -> line number, rebuilt after edits.
+        self._next_id = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['analyse'] = None
+        # Analysis functions are not picklable, so are set again on use.
+        return state
+
+    def _add_line(self, text, tokens):
+        line_id = self._next_id
+        self._next_id += 1
+
+        tokens = [(w.lower(), l.lower(), s, e) for w, l, s, e in tokens]
+        self._tokens[line_id] = tokens
+        for w, l, s, e in tokens:
+            self._words.setdefault(w, set()).add(line_id)
+            self._lemmas.setdefault(l, set()).add(line_id)
+
+        return line_id
+
+    def _remove_line(self, line_id):
+        for w, l, s, e in self._tokens.pop(line_id):
+            self._words[w].discard(line_id)
+            self._lemmas[l].discard(line_id)
+
+    def build(self, text):
+        """
+        Index a whole text.
+        """
+        self.build_from_lines(text, [self.analyse(line)
+                                     for line in text.split('\n')])
+
+    def build_from_analysis(self, text, words, lemmas, offsets):
+        """
+        Index a whole text from an existing tokenisation (e.g. a cached
+        WordSet), rather than tokenising again.
+
+        Parameters
+        ----------
+        text : str
+            Text that was tokenised.
+        words, lemmas : list
+            Word and lemma of each token.
+        offsets : list
+            (start, end) character offsets of each token in text.
+        """
+        lines = text.split('\n')
+        per_line = [[] for l in lines]
+
+        line, line_start = 0, 0
+        for w, l, (s, e) in zip(words, lemmas, offsets):
+            while s >= line_start+len(lines[line])+1:
+                line_start += len(lines[line])+1
+                line += 1
+            per_line[line].append((w, l, s-line_start, e-line_start))
+        # Offsets are in order, so lines are assigned in one pass.
+
+        self.build_from_lines(text, per_line)
+
+    def build_from_lines(self, text, per_line):
+        """
+        Index a text from a list of tokens for each of its lines.
+        """
+        self._tokens, self._words, self._lemmas = {}, {}, {}
+        self._lines = text.split('\n')
+        self._ids = [self._add_line(t, tokens)
+                     for t, tokens in zip(self._lines, per_line)]
+        self._position = None
+        self.source = text
+
+    def sync(self, text):
+        """
+        Bring the index up to date with a new version of the text,
+        re-tokenising only the lines between the unchanged start and end of
+        the document.
+        """
+        if text == self.source:
+            return
+
+        new_lines = text.split('\n')
+        old_lines = self._lines
+
+        first = 0
+        limit = min(len(old_lines), len(new_lines))
+        while first < limit and old_lines[first] == new_lines[first]:
+            first += 1
+        last = 0
+        while (last < limit-first and
+               old_lines[-1-last] == new_lines[-1-last]):
+            last += 1
+        # Lines [first, len-last) differ between the versions.
+
+        for line_id in self._ids[first:len(old_lines)-last]:
+            self._remove_line(line_id)
+        changed = new_lines[first:len(new_lines)-last]
+        self._ids[first:len(old_lines)-last] = [
+            self._add_line(t, self.analyse(t)) for t in changed]
+
+        self._lines = new_lines
+        self._position = None
+        self.source = text
+
+    def line_text(self, line):
+        """
+        Text of a line, counted from 1 as in Tk.
+        """
+        return self._lines[line-1]
+
+    def lemma_of(self, word):
+        """
+        Lemma of a single word, using the index's analysis function.
+        """
+        tokens = self.analyse(word)
+        if not tokens:
+            return word.lower()
+        return tokens[0][1].lower()
+
+    def find(self, word, inflections=False):
+        """
+        Positions of a word in the text.
+
+        Parameters
+        ----------
+        word : str
+            Word to find (case insensitive).
+        inflections : bool
+            Match every word sharing the lemma of word (e.g. 'walk' finds
+            'walked').
+
+        Returns
+        -------
+        found : list
+            (line number, start column, end column) of each match, in
+            document order, with lines counted from 1 as in Tk.
+        """
+        if self._position is None:
+            self._position = {line_id: n+1
+                              for n, line_id in enumerate(self._ids)}
+
+        if inflections:
+            key = self.lemma_of(word)
+            line_ids, field = self._lemmas.get(key, ()), 1
+        else:
+            key = word.lower()
+            line_ids, field = self._words.get(key, ()), 0
+
+        found = []
+        for line_id in line_ids:
+            line = self._position[line_id]
+            found.extend((line, t[2], t[3]) for t in self._tokens[line_id]
+                         if t[field] == key)
+        found.sort()
+
+        return found
@@ -1,10 +1,12 @@
 """
 Classes for analysing prose itself.
 """
+from array import array
+import numpy as np
 import log
+import startup
 import highlight_dictionary as hd
-import textblob as tx
-import matplotlib as plt
+import vector_store as vs
 
 # Highlighting.
 # Content similarity.
@@ -24,8 +26,28 @@ class WordSet(object):
     -----------------
     raw : str
         Raw string of input data.
-    processed : list
-        List of tokenised words.
+    backend : str
+        'spacy' to take tokens, tags, sentences and entities from a single
+        spaCy parse, or 'textblob' to use the TextBlob (NLTK) tagger.
+    doc : spaCy Doc object
+        Cached spaCy parse of the text (None for the textblob backend).
+    token : list
+        List of tokenised words (punctuation removed).
+    pos : list
+        List of (word, Penn Treebank tag) tuples.
+    sentences : list
+        Sentences of the text.
+    lemmas : list
+        Lemma of each word in token (spacy backend only).
+    stops : list
+        True for each word in token that is a stop word (spacy backend
+        only).
+    offsets : list
+        (start, end) character offsets of each word in token (spacy backend
+        only).
+    entities : list
+        (text, label, start, end) tuples for named entities (spacy backend
+        only).
 
     Class methods
     -----------------
@@ -36,16 +58,86 @@ class WordSet(object):
 
     """
 
-    def __init__(self, text, md):
+    def __init__(self, text, md, backend='spacy'):
         self.raw = text
-        self.blob = tx.TextBlob(text)
-        self.token = self.blob.words
-        # Keeps in punctuation and upper cases.
-        self.sentences = self.blob.sentences
-        self.pos = self.blob.tags
-
-        self.word_colours = hd.highlight_nltk
+        self.backend = backend
         self.md_core = md
+        self.word_colours = hd.highlight_nltk
+        self.entity_colours = hd.highlight_ner
+
+        self._blob = None
+        # TextBlob is only built if needed (e.g. for sentiment).
+        self._line_starts = None
+        self._token_at = None
+
+        if backend == 'spacy':
+            self.doc = md(text)
+            # One parse supplies tokens, tags, sentences and entities.
+            words = [t for t in self.doc if not (t.is_punct or t.is_space)]
+            # Drop punctuation to match TextBlob's words.
+
+            self.token = [t.text for t in words]
+            self.pos = [(t.text, t.tag_) for t in words]
+            # token.tag_ uses the same Penn Treebank tags as NLTK.
+            self.lemmas = [t.lemma_ for t in words]
+            self.stops = [t.is_stop for t in words]
+            self.offsets = [(t.idx, t.idx+len(t.text)) for t in words]
+            self.sentences = list(self.doc.sents)
+            self.entities = [(e.text, e.label_, e.start_char, e.end_char)
+                             for e in self.doc.ents]
+        else:
+            self.doc = None
+            self.token = self.blob.words
+            # Keeps in punctuation and upper cases.
+            self.sentences = self.blob.sentences
+            self.pos = self.blob.tags
+            self.lemmas, self.offsets, self.entities = None, None, None
+            self.stops = None
+
+    @property
+    def blob(self):
+        """
+        TextBlob of the text, created on first use.
+        """
+        if self._blob is None:
+            self._blob = startup.textblob().TextBlob(self.raw)
+        return self._blob
+
+    @property
+    def line_starts(self):
+        """
+        Character offset of the start of each line of the text.
+        """
+        if self._line_starts is None:
+            starts = [0]
+            found = self.raw.find('\n')
+            while found != -1:
+                starts.append(found+1)
+                found = self.raw.find('\n', found+1)
+            self._line_starts = starts
+        return self._line_starts
+
+    @property
+    def token_at(self):
+        """
+        Index into token of the word covering each character of the text,
+        or -1 between words (spacy backend only).
+        """
+        if self._token_at is None and self.offsets is not None:
+            table = array('i', [-1])*len(self.raw)
+            for i, (s, e) in enumerate(self.offsets):
+                table[s:e] = array('i', [i])*(e-s)
+            self._token_at = table
+        return self._token_at
+
+    @property
+    def vector(self):
+        """
+        Mean word vector of the text (spacy backend only).
+        """
+        if self.doc is None:
+            return None
+        return self.doc.vector
 
     def txt_percent(self):
         """
@@ -65,8 +157,16 @@ class WordSet(object):
         """
         Get similarity between vectors and highlight colour.
         """
-        s1, s2 = self.md_core(s1), self.md_core(s2)
-        sim = s1.similarity(s2)
+        s1, s2 = self.md_core.make_doc(s1), self.md_core.make_doc(s2)
+        # Word vectors come from the vocabulary, so only tokenise rather
+        # than running the full pipeline.
+
+        store = vs.shared_store(self.md_core)
+        if store is not None:
+            sim = store.similarity(s1, s2)
+            # Read vectors from the shared memory-mapped table.
+        else:
+            sim = s1.similarity(s2)
 
         r, g, b = int(17 / 10), 255, 255
         g, b = int((abs(sim) * g)), int((abs(sim) * b))
@@ -75,6 +175,81 @@ class WordSet(object):
 
         return sim, color
 
+    @log.function_profiler
+    @log.log_function
+    def window_similarity(self, selection, window=50, block=4096):
+        """
+        Similarity of a selection to every window of tokens in the text
+        (spacy backend only).
+
+        Window sums are updated in a single pass (adding the token entering
+        each window and removing the one leaving), so each window costs
+        O(1). Tokens are looked up block rows at a time, keeping memory
+        bounded on long texts.
+
+        Parameters
+        -----------
+        selection : string
+            Text to compare against the document.
+        window : int
+            Number of tokens in each window.
+        block : int
+            Windows scored at a time.
+
+        Returns
+        -------
+        scores : numpy array
+            For each word in token, the similarity of the window centred on
+            it, or None if the model has no word vectors.
+        """
+        store = vs.shared_store(self.md_core)
+        if store is None:
+            return None
+        keys = np.array([t.orth for t in self.doc
+                         if not (t.is_punct or t.is_space)], dtype=np.uint64)
+        n = len(keys)
+        if n == 0:
+            return np.zeros(0, dtype=np.float32)
+        window = max(1, min(window, n))
+
+        query = store.doc_vector(self.md_core.make_doc(selection))
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return np.zeros(n, dtype=np.float32)
+
+        total = np.zeros(store.vectors.shape[1], dtype=np.float64)
+        for a in range(0, window, block):
+            total += store.lookup(keys[a:min(a+block, window)]).sum(
+                axis=0, dtype=np.float64)
+        # Sum of the first window, in float64 so that the running sum keeps
+        # its precision late in a long text.
+
+        count = n-window+1
+        window_scores = np.empty(count, dtype=np.float32)
+        for a in range(0, count, block):
+            b = min(a+block, count)
+            sums = np.empty((b-a, len(total)), dtype=np.float64)
+            first = max(a, 1)
+            np.subtract(store.lookup(keys[first+window-1:b+window-1]),
+                        store.lookup(keys[first-1:b-1]),
+                        out=sums[first-a:], dtype=np.float64)
+            # Change in the sum from each window to the next.
+            if a == 0:
+                sums[0] = total
+            else:
+                sums[0] += total
+            np.cumsum(sums, axis=0, out=sums)
+            total = sums[-1]
+            # Sum of the vectors in each window (the mean has the same
+            # cosine), carried on to the next block.
+
+            norms = np.linalg.norm(sums, axis=1)
+            norms[norms == 0] = np.inf
+            window_scores[a:b] = (sums @ query)/(norms*query_norm)
+
+        starts = np.clip(np.arange(n)-window//2, 0, count-1)
+        return window_scores[starts]
+
     @log.log_function
     def sentiment(self, word_in):
         """
@@ -82,7 +257,7 @@ class WordSet(object):
         """
         try:
 
-            b = tx.TextBlob(word_in)
+            b = startup.textblob().TextBlob(word_in)
             # Take first element as most common meaning.
             polarity = b.sentiment.polarity
             obj = b.sentiment.subjectivity